@@ -1,72 +1,84 @@
 import numpy as np
+from Environment import ACTIONS, ACTION_INDEX
+from QTable import QTable
+from Policy import RandomStream, policy_epsilon, select_action
 
 class Agent:
-    def __init__(self, initial_position, learning_rate, discount_factor):
-        # Initializing the Agent class with its initial position, learning rate, discount factor, an empty Q-table, and not carrying any block.
+    def __init__(self, initial_position, learning_rate, discount_factor, grid_size=(5, 5), exploit_probability=0.8):
+        # Initializing the Agent class with its initial position, learning rate, discount factor, an empty dense Q-table, and not carrying any block.
+        # exploit_probability is the probability of the 'exploit' policy taking the best action; the random stream is created on first use.
         self.position = initial_position
         self.learning_rate = learning_rate
         self.discount_factor = discount_factor
-        self.q_table = {}
+        self.exploit_probability = exploit_probability
+        self.q_table = QTable()
+        self.random = None
         self.carrying_block = False
-        self.position_frequency = [[0 for j in range(0, 5)] for i in range(0, 5)]
+        self.reset_position_freq(grid_size)
 
     # Resetting the agent's state by setting it to not carrying any block.
     def reset(self):
         self.carrying_block = False
 
-    # Choosing an action for the agent based on a given policy.
+    # Seeding the agent's own random stream (otherwise it is seeded from np.random the first time the agent chooses an action).
+    def seed(self, seed):
+        self.random = RandomStream(np.random.default_rng(seed))
+
+    # Choosing an action for the agent based on a given policy: 'random' (PRANDOM), 'greedy' (PGREEDY), 'exploit' (PEXPLOIT)
+    # or an exploration rate epsilon, e.g. from an epsilon schedule. Every decision uses two numbers of the agent's random stream.
     def choose_action(self, environment, policy):
+        if self.random is None:
+            self.random = RandomStream()
         state = environment.get_state(self)  # Get the current state of the agent from the environment.
-        available_actions = environment.get_available_actions(self)  # Get the available actions for the agent.
-
-        # If the current state is not in the Q-table, initialize it with zero Q-values for each available action.
-        if state not in self.q_table:
-            self.q_table[state] = {action: 0.0 for action in available_actions}
-
-        # Actions based on the specified policy.
-        if policy == 'random':  # PRANDOM
-            return np.random.choice(available_actions)
-        elif policy == 'greedy':  # PGREEDY
-            max_q_value = max(self.q_table[state].values())
-            best_actions = [action for action, q_value in self.q_table[state].items() if q_value == max_q_value]
-            return np.random.choice(best_actions)  # Randomly choose among the best actions (in case of ties).
-        elif policy == 'exploit':  # PEXPLOIT
-            if np.random.random() < 0.8:  # With 80% probability, exploit the best action.
-                max_q_value = max(self.q_table[state].values())
-                best_actions = [action for action, q_value in self.q_table[state].items() if q_value == max_q_value]
-                return np.random.choice(best_actions)  # Randomly choose among the best actions (in case of ties).
-            else:  # With 20% probability, explore by choosing randomly from available actions.
-                return np.random.choice(available_actions)
+        mask = environment.get_action_mask(self)  # Bitmask of the available actions for the agent.
+        row = self.q_table.index(state)  # Dense Q-value row for the state (allocated with zeros the first time it is seen).
+        epsilon = policy_epsilon(policy, self.exploit_probability)
+        return ACTIONS[select_action(self.q_table.values[row], mask, epsilon, self.random.uniform(), self.random.uniform())]
 
-           
-    # Updating the Q-table based on the state, action, reward, and the next state.
+    # Updating the Q-table based on the state, action, reward, and the next state; returns the change of the Q-value.
     def update_q_table(self, state, action, reward, next_state, learning_rate):
-        if state not in self.q_table:
-            self.q_table[state] = {a: 0.0 for a in ['up', 'down', 'left', 'right', 'pickup', 'dropoff']}
-        if next_state not in self.q_table:
-            self.q_table[next_state] = {a: 0.0 for a in ['up', 'down', 'left', 'right', 'pickup', 'dropoff']}
+        row = self.q_table.index(state)
+        next_row = self.q_table.index(next_state)
+        q_values = self.q_table.values  # Fetched after indexing since allocating new rows may grow the array.
+        column = ACTION_INDEX[action]
 
-        old_value = self.q_table[state].get(action, 0.0)  # Retrieving the old Q-value, defaulting to 0.0 if not found
-        next_max = max(self.q_table[next_state].values())  # Finding the maximum Q-value for the next state
+        old_value = q_values[row, column]  # Retrieving the old Q-value
+        next_max = q_values[next_row].max()  # Finding the maximum Q-value for the next state
 
         # Updating the Q-value using the Q-learning algorithm
         new_value = (1 - learning_rate) * old_value + learning_rate * (reward + self.discount_factor * next_max)
-        self.q_table[state][action] = new_value  # Assigning the new Q-value to the Q-table
+        q_values[row, column] = new_value  # Assigning the new Q-value to the Q-table
+        return new_value - old_value
 
+    # Updating the Q-table with the SARSA rule; returns the change of the Q-value.
     def update_q_table_sarsa(self, state, action, reward, next_state, next_action):
-            if state not in self.q_table:
-                self.q_table[state] = {a: 0.0 for a in ['up', 'down', 'left', 'right', 'pickup', 'dropoff']}
-            if next_state not in self.q_table:
-                self.q_table[next_state] = {a: 0.0 for a in ['up', 'down', 'left', 'right', 'pickup', 'dropoff']}
+        row = self.q_table.index(state)
+        next_row = self.q_table.index(next_state)
+        q_values = self.q_table.values
+        column = ACTION_INDEX[action]
+
+        old_value = q_values[row, column]  # Retrieving the old Q-value
+        next_value = q_values[next_row, ACTION_INDEX[next_action]]  # Retrieving the Q-value for the next state and next action
+
+        # Updating the Q-value using the SARSA algorithm
+        new_value = (1 - self.learning_rate) * old_value + self.learning_rate * (reward + self.discount_factor * next_value)
+        q_values[row, column] = new_value  # Assigning the new Q-value to the Q-table
+        return new_value - old_value
+
+    # Moving the Q-value of (state, action) towards target by the learning rate (for multi-step learners); returns the change of the Q-value.
+    def update_q_value(self, state, action, target, learning_rate):
+        row = self.q_table.index(state)
+        column = ACTION_INDEX[action]
+        old_value = self.q_table.values[row, column]
+        new_value = (1 - learning_rate) * old_value + learning_rate * target
+        self.q_table.values[row, column] = new_value
+        return new_value - old_value
 
-            old_value = self.q_table[state][action]  # Retrieving the old Q-value
-            next_value = self.q_table[next_state][next_action]  # Retrieving the Q-value for the next state and next action
+    # Function to reset the position frequency matrix to a zeroed uint32 array of the grid's size
+    def reset_position_freq(self, grid_size):
+        self.position_frequency = np.zeros(grid_size, dtype=np.uint32)
 
-            # Updating the Q-value using the SARSA algorithm
-            new_value = (1 - self.learning_rate) * old_value + self.learning_rate * (reward + self.discount_factor * next_value)
-            self.q_table[state][action] = new_value  # Assigning the new Q-value to the Q-table 
-    
     # Function to update position frequency matrix after each agent action
     def update_position_freq(self):
-        self.position_frequency[self.position[0]][self.position[1]] += 1
+        self.position_frequency[self.position] += 1
 
@@ -0,0 +1,182 @@
+import numpy as np
+from Environment import ACTIONS, ACTION_INDEX, DEFAULT_CAPACITY, resolve_moves, site_capacity, transition_table
+from Policy import RandomStream, policy_epsilon, select_actions
+
+PICKUP = ACTION_INDEX['pickup']
+DROPOFF = ACTION_INDEX['dropoff']
+
+class BatchEnvironment:
+    def __init__(self, num_worlds, grid_size, pickup_locations, dropoff_locations, initial_agent_positions, pickup_capacity=DEFAULT_CAPACITY,
+                 dropoff_capacity=DEFAULT_CAPACITY, obstacles=()):
+        # Initializing N independent copies of the PD world, all sharing the same layout, stored as stacked NumPy arrays.
+        # Capacities and obstacles are given as for Environment.
+        self.pickup_capacity = pickup_capacity
+        self.dropoff_capacity = dropoff_capacity
+        self.num_worlds = num_worlds
+        self.grid_size = grid_size
+        self.pickup_locations = list(pickup_locations)
+        self.dropoff_locations = list(dropoff_locations)
+        self.initial_agent_positions = np.array(initial_agent_positions, dtype=int)
+        self.num_agents = len(initial_agent_positions)
+        self.obstacles = [tuple(location) for location in obstacles]
+
+        # Transition table with the obstacles folded in (as in Environment), so moves are one lookup per agent.
+        self.next_cell = transition_table(grid_size, self.obstacles)[0]
+
+        # Lookup map from grid cell to dropoff index (-1 where there is no dropoff location), the capacity of every dropoff location
+        # and the blocks every cell starts with.
+        self.dropoff_index = np.full(grid_size, -1, dtype=int)
+        for i, location in enumerate(self.dropoff_locations):
+            self.dropoff_index[location] = i
+        self.dropoff_capacities = np.array([site_capacity(dropoff_capacity, location) for location in self.dropoff_locations], dtype=int)
+        self.stock = np.zeros(grid_size, dtype=int)
+        for location in self.pickup_locations:
+            self.stock[location] = site_capacity(pickup_capacity, location)
+        if self.stock.sum() < self.dropoff_capacities.sum():
+            raise ValueError(f"The pickup locations hold {self.stock.sum()} blocks, fewer than the {self.dropoff_capacities.sum()} the dropoff locations accept")
+
+        self.positions = np.zeros((num_worlds, self.num_agents, 2), dtype=int)
+        self.carrying = np.zeros((num_worlds, self.num_agents), dtype=bool)
+        self.grid = np.zeros((num_worlds,) + tuple(grid_size), dtype=int)
+        self.dropoff_counts = np.zeros((num_worlds, len(self.dropoff_locations)), dtype=int)
+        self.occupancy = np.zeros((num_worlds,) + tuple(grid_size), dtype=bool)  # Occupied cells per world, so collision checks are O(1).
+        self.worlds = np.arange(num_worlds)
+        self.layout_offset = 0  # Offset of this layout's block of states, matching Environment.get_state.
+        self.reset()
+
+    # Building a batch that replicates the layout of an existing Environment.
+    @classmethod
+    def from_environment(cls, environment, num_worlds, initial_agent_positions):
+        batch = cls(num_worlds, environment.grid_size, environment.pickup_locations, environment.dropoff_locations, initial_agent_positions,
+                    environment.pickup_capacity, environment.dropoff_capacity, environment.obstacles)
+        batch.layout_offset = environment.layout_offset
+        return batch
+
+    # Resetting the given worlds (a boolean mask or index array; all worlds when omitted) to their initial configuration.
+    def reset(self, worlds=None):
+        if worlds is None:
+            worlds = self.worlds
+        self.positions[worlds] = self.initial_agent_positions
+        self.carrying[worlds] = False
+        self.grid[worlds] = self.stock
+        self.dropoff_counts[worlds] = 0
+        self.occupancy[worlds] = False
+        for x, y in self.initial_agent_positions:
+            self.occupancy[worlds, x, y] = True
+
+    # Returning the (worlds, agents) array of integer states, encoded as in Environment.get_state.
+    def get_states(self):
+        cells = self.positions[..., 0] * self.grid_size[1] + self.positions[..., 1]
+        return self.layout_offset + cells * 2 + self.carrying
+
+    # Returning a (worlds, agents, actions) boolean mask of the available actions, mirroring Environment.get_available_actions.
+    def get_available_actions_mask(self):
+        x, y = self.positions[..., 0], self.positions[..., 1]
+        mask = np.zeros((self.num_worlds, self.num_agents, len(ACTIONS)), dtype=bool)
+        mask[..., :PICKUP] = True
+        mask[..., PICKUP] = (self.grid[self.worlds[:, None], x, y] > 0) & ~self.carrying
+        mask[..., DROPOFF] = self.carrying & self._open_dropoff(self.worlds[:, None], x, y)
+        return mask
+
+    # Choosing one action per agent per world with epsilon-greedy selection over the agents' Q-tables, all worlds at once (Policy.select_actions).
+    # As in Agent.choose_action, every decision takes two numbers of the agent's random stream, so a batch of one world chooses exactly
+    # what the agents would choose in the matching Environment. Returns the (worlds, agents) action indices for step or step_synchronous.
+    def choose_actions(self, agents, policy):
+        states = self.get_states()
+        masks = self.get_available_actions_mask()
+        actions = np.empty((self.num_worlds, self.num_agents), dtype=np.int64)
+        for i, agent in enumerate(agents):
+            if agent.random is None:
+                agent.random = RandomStream()
+            q_table = agent.q_table
+            q_table.reserve(int(states[:, i].max()) + 1)
+            q_table.visited[states[:, i]] = True
+            uniforms = agent.random.reserve(2 * self.num_worlds).reshape(self.num_worlds, 2)
+            epsilon = policy_epsilon(policy, agent.exploit_probability)
+            actions[:, i] = select_actions(q_table.values[states[:, i]], masks[:, i], epsilon, uniforms[:, 0], uniforms[:, 1])
+        return actions
+
+    # Applying one action per agent per world (an integer array of shape (worlds, agents)) and returning the rewards.
+    # Agents move in turn as in Environment.execute_action, so each agent sees the positions of the agents that moved before it.
+    def step(self, actions):
+        rewards = np.zeros((self.num_worlds, self.num_agents))
+        worlds = self.worlds
+        columns = self.grid_size[1]
+        for i in range(self.num_agents):
+            action = actions[:, i]
+            x, y = self.positions[:, i, 0], self.positions[:, i, 1]
+            new_x, new_y = np.divmod(self.next_cell[x * columns + y, action], columns)
+
+            # Moving only inside the grid, never into an obstacle and only into cells not occupied by any agent.
+            moved = ((new_x != x) | (new_y != y)) & ~self.occupancy[worlds, new_x, new_y]
+            moved_worlds = worlds[moved]
+            self.occupancy[moved_worlds, x[moved], y[moved]] = False
+            self.occupancy[moved_worlds, new_x[moved], new_y[moved]] = True
+            self.positions[moved, i, 0] = new_x[moved]
+            self.positions[moved, i, 1] = new_y[moved]
+
+            # Executing pickup and dropoff actions at the cell the agent acted from.
+            carrying = self.carrying[:, i]
+            pickup = (action == PICKUP) & (self.grid[worlds, x, y] > 0) & ~carrying
+            self.grid[worlds[pickup], x[pickup], y[pickup]] -= 1
+            dropoff = (action == DROPOFF) & carrying & self._open_dropoff(worlds, x, y)
+            self.dropoff_counts[worlds[dropoff], self.dropoff_index[x[dropoff], y[dropoff]]] += 1
+            self.carrying[pickup, i] = True
+            self.carrying[dropoff, i] = False
+
+            rewards[:, i] = self._calculate_rewards(i)
+        return rewards
+
+    # Applying one synchronous step, as in Environment.step_synchronous: every agent of every world acts on the same snapshot, the moves are
+    # resolved with resolve_moves and the whole step is applied as one array update. Returns the (worlds, agents) rewards.
+    def step_synchronous(self, actions):
+        worlds = self.worlds[:, None]
+        columns = self.grid_size[1]
+        x, y = self.positions[..., 0], self.positions[..., 1]
+        current = x * columns + y
+        new_cells = resolve_moves(current, self.next_cell[current, actions])
+
+        # Pickups and dropoffs at the cells the agents acted from; no two agents share a cell, so no cell is updated twice.
+        pickup = (actions == PICKUP) & (self.grid[worlds, x, y] > 0) & ~self.carrying
+        dropoff = (actions == DROPOFF) & self.carrying & self._open_dropoff(worlds, x, y)
+        pickup_worlds = np.nonzero(pickup)[0]
+        self.grid[pickup_worlds, x[pickup], y[pickup]] -= 1
+        dropoff_worlds = np.nonzero(dropoff)[0]
+        self.dropoff_counts[dropoff_worlds, self.dropoff_index[x[dropoff], y[dropoff]]] += 1
+        self.carrying[pickup] = True
+        self.carrying[dropoff] = False
+
+        self.occupancy[worlds, x, y] = False
+        new_x, new_y = np.divmod(new_cells, columns)
+        self.occupancy[worlds, new_x, new_y] = True
+        self.positions[..., 0] = new_x
+        self.positions[..., 1] = new_y
+        return self._calculate_rewards()
+
+    # Calculating the reward of agent i (all agents when omitted) in every world from its current position and state, as in Environment.calculate_reward.
+    def _calculate_rewards(self, i=None):
+        agents = slice(None) if i is None else i
+        worlds = self.worlds if i is not None else self.worlds[:, None]
+        x, y = self.positions[:, agents, 0], self.positions[:, agents, 1]
+        carrying = self.carrying[:, agents]
+        rewards = np.zeros(carrying.shape)
+        rewards[~carrying & (self.grid[worlds, x, y] > 0)] = 1.0  # Reward for successful pickup
+        rewards[carrying & self._open_dropoff(worlds, x, y)] = 10.0  # Reward for successful dropoff
+        return rewards
+
+    # Checking whether the cells are dropoff locations that can still accept blocks.
+    def _open_dropoff(self, worlds, x, y):
+        index = self.dropoff_index[x, y]
+        valid = np.maximum(index, 0)
+        return (index >= 0) & (self.dropoff_counts[worlds, valid] < self.dropoff_capacities[valid])
+
+    # Returning a boolean mask of the worlds where all dropoff locations are full.
+    def is_terminal_state(self):
+        return (self.dropoff_counts == self.dropoff_capacities).all(axis=1)
+
+    # Resetting every world that reached a terminal state and returning the mask of those worlds.
+    def reset_terminal_worlds(self):
+        terminal = self.is_terminal_state()
+        if terminal.any():
+            self.reset(terminal)
+        return terminal
@@ -0,0 +1,205 @@
+import argparse
+import json
+import platform
+import random
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from Experiments import Experiments, build_world, spec_label
+from Metrics import FleetMetrics
+
+# Experiments timed by default (Experiment 3 with a single learning rate, it shares its loop with Experiment 1).
+BENCHMARK_SPECS = [
+    {'experiment': '1a'},
+    {'experiment': '1c'},
+    {'experiment': '2'},
+    {'experiment': '3', 'learning_rate': 0.15},
+    {'experiment': '4'},
+]
+
+# Building a world of the given size: pickups along the right edge, dropoffs along the left edge and num_agents agents at random free cells
+# (placed by build_world with Fleet.spawn_positions, so never on a site; seed the global RNG first for a reproducible placement).
+def benchmark_world(grid_size, num_agents):
+    rows, columns = grid_size
+    pickup_locations = [(0, columns - 1), (rows // 4, columns - 2), (rows - 1, 1)]
+    dropoff_locations = [(0, 0), (rows // 2, 0), (3 * rows // 4, columns - 1)]
+    free_cells = rows * columns - len(set(pickup_locations + dropoff_locations))
+    if num_agents > free_cells:
+        raise ValueError(f"Cannot place {num_agents} agents on the {free_cells} free cells of a {rows}x{columns} grid")
+    return {
+        'grid_size': grid_size,
+        'pickup_locations': pickup_locations,
+        'dropoff_locations': dropoff_locations,
+        'initial_agent_positions': [],
+        'num_agents': num_agents,
+        'learning_rate': 0.3,
+        'discount_factor': 0.5,
+    }
+
+# Building a fleet world: benchmark_world with site capacities scaled with the fleet, so that an episode lasts about as many deliveries per
+# agent whatever the fleet size.
+def fleet_world(grid_size, num_agents):
+    capacity = 5 * max(1, -(-num_agents // 3))
+    return dict(benchmark_world(grid_size, num_agents), pickup_capacity=capacity, dropoff_capacity=capacity)
+
+# Measuring how throughput and learning quality scale with the fleet size: one run of Experiment 1c (Q-learning with the exploit policy)
+# per agent count, timed and summarized by a FleetMetrics collector.
+def run_fleet_scaling(grid_size, agent_counts, num_steps, seed=0):
+    rows = []
+    for num_agents in agent_counts:
+        np.random.seed(seed)
+        random.seed(seed)
+        environment, agents, initial_agent_positions = build_world(fleet_world(grid_size, num_agents))
+        metrics = FleetMetrics()
+        start = time.perf_counter()
+        Experiments([metrics]).run_experiment1c(environment, agents, num_steps, initial_agent_positions)
+        elapsed = time.perf_counter() - start
+        row = {'grid_size': list(grid_size), 'seconds': elapsed, 'steps_per_sec': metrics.steps / elapsed,
+               'agent_steps_per_sec': metrics.steps * num_agents / elapsed}
+        row.update(metrics.summary())
+        del row['run']
+        rows.append(row)
+    return rows
+
+# Timing one experiment run; returns wall time in seconds and the number of steps actually run.
+def time_experiment(world, spec, num_steps, seed):
+    np.random.seed(seed)
+    random.seed(seed)
+    environment, agents, initial_agent_positions = build_world(world)
+    start = time.perf_counter()
+    rows = Experiments().run_spec(environment, agents, num_steps, initial_agent_positions, spec)
+    elapsed = time.perf_counter() - start
+    steps = sum(row['steps'] for row in rows if row['agent'] == 1)  # Experiment 4 may stop early and reports steps per phase.
+    return elapsed, steps
+
+# Measuring the peak traced Python memory of one experiment run (tracemalloc slows the run down, so it is not used for timing).
+def peak_memory(world, spec, num_steps, seed):
+    np.random.seed(seed)
+    random.seed(seed)
+    tracemalloc.start()
+    environment, agents, initial_agent_positions = build_world(world)
+    Experiments().run_spec(environment, agents, num_steps, initial_agent_positions, spec)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+# Measuring the mean latency of the core Environment/Agent calls on a world that has been warmed up with random moves.
+def time_core_calls(world, calls, seed):
+    np.random.seed(seed)
+    random.seed(seed)
+    environment, agents, initial_agent_positions = build_world(world)
+    environment.reset_environment(initial_agent_positions)
+    agent = agents[0]
+    for _ in range(100):
+        environment.execute_action(agent, agent.choose_action(environment, 'random'))
+    state = environment.get_state(agent)
+
+    latencies = {}
+    start = time.perf_counter()
+    for _ in range(calls):
+        environment.get_state(agent)
+    latencies['get_state'] = (time.perf_counter() - start) / calls
+
+    start = time.perf_counter()
+    for _ in range(calls):
+        agent.choose_action(environment, 'exploit')
+    latencies['choose_action'] = (time.perf_counter() - start) / calls
+
+    actions = [agent.choose_action(environment, 'random') for _ in range(calls)]
+    start = time.perf_counter()
+    for action in actions:
+        environment.execute_action(agent, action)
+    latencies['execute_action'] = (time.perf_counter() - start) / calls
+
+    next_state = environment.get_state(agent)
+    start = time.perf_counter()
+    for action in actions:
+        agent.update_q_table(state, action, 1.0, next_state, agent.learning_rate)
+    latencies['update_q_table'] = (time.perf_counter() - start) / calls
+    return latencies
+
+# Running every combination of grid size, agent count, step budget and experiment and returning the benchmark report.
+def run_benchmarks(grid_sizes, agent_counts, step_budgets, specs=BENCHMARK_SPECS, calls=10000, seed=0, measure_memory=True):
+    experiments = []
+    core_calls = []
+    for grid_size in grid_sizes:
+        for num_agents in agent_counts:
+            try:
+                world = benchmark_world(grid_size, num_agents)
+            except ValueError as error:
+                print(f"Skipping: {error}")
+                continue
+            latencies = time_core_calls(world, calls, seed)
+            core_calls.extend({'grid_size': list(grid_size), 'agents': num_agents, 'call': call, 'latency_us': latency * 1e6}
+                              for call, latency in latencies.items())
+            for num_steps in step_budgets:
+                for spec in specs:
+                    elapsed, steps = time_experiment(world, spec, num_steps, seed)
+                    result = {
+                        'experiment': spec_label(spec),
+                        'grid_size': list(grid_size),
+                        'agents': num_agents,
+                        'step_budget': num_steps,
+                        'steps': steps,
+                        'seconds': elapsed,
+                        'steps_per_sec': steps / elapsed,
+                        'agent_steps_per_sec': steps * num_agents / elapsed,
+                    }
+                    if measure_memory:
+                        result['peak_memory_bytes'] = peak_memory(world, spec, num_steps, seed)
+                    experiments.append(result)
+    return {
+        'metadata': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'seed': seed,
+        },
+        'experiments': experiments,
+        'core_calls': core_calls,
+    }
+
+# Parsing a grid size given as ROWSxCOLUMNS (or a single number for a square grid).
+def parse_grid_size(text):
+    parts = text.lower().split('x')
+    if len(parts) == 1:
+        parts = parts * 2
+    return int(parts[0]), int(parts[1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark steps/sec, per-call latency and peak memory of the experiments.")
+    parser.add_argument('--grid-sizes', nargs='+', type=parse_grid_size, default=[(5, 5), (20, 20)], help="Grid sizes, e.g. 5x5 20x20")
+    parser.add_argument('--agents', nargs='+', type=int, default=[3], help="Agent counts")
+    parser.add_argument('--steps', nargs='+', type=int, default=[2000], help="Step budgets")
+    parser.add_argument('--experiments', nargs='+', default=None, help="Experiments to time (1a 1b 1c 2 3 4)")
+    parser.add_argument('--calls', type=int, default=10000, help="Calls per core-call latency measurement")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', action='store_true', help="Skip the (slower) peak memory measurement")
+    parser.add_argument('--fleet', nargs='+', type=int, default=None, help="Also measure fleet scaling with these agent counts, e.g. 3 10 50 100 250 500")
+    parser.add_argument('--fleet-grid', type=parse_grid_size, default=(40, 40), help="Grid size of the fleet scaling runs")
+    parser.add_argument('--fleet-steps', type=int, default=1000, help="Steps of every fleet scaling run")
+    parser.add_argument('--output', default='benchmark.json', help="Path of the JSON report")
+    args = parser.parse_args()
+
+    specs = BENCHMARK_SPECS
+    if args.experiments is not None:
+        specs = [{'experiment': name, 'learning_rate': 0.15} if name == '3' else {'experiment': name} for name in args.experiments]
+
+    report = run_benchmarks(args.grid_sizes, args.agents, args.steps, specs, args.calls, args.seed, not args.no_memory)
+    if args.fleet is not None:
+        report['fleet'] = run_fleet_scaling(args.fleet_grid, args.fleet, args.fleet_steps, args.seed)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(pd.DataFrame(report['experiments']).to_string(index=False))
+    print()
+    print(pd.DataFrame(report['core_calls']).to_string(index=False))
+    if 'fleet' in report:
+        print()
+        print(pd.DataFrame(report['fleet']).to_string(index=False, float_format=lambda value: f"{value:.4f}"))
+    print(f"\nBenchmark report written to {args.output}")
+
+if __name__ == "__main__":
+    main()
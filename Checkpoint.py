@@ -0,0 +1,99 @@
+import json
+import os
+import random
+import numpy as np
+from QTable import QTable
+from Policy import RandomStream
+
+# A checkpoint is a directory of plain .npy arrays (memory-mappable) plus a small JSON file with everything else:
+#   agent_<i>_q_values.npy, agent_<i>_visited.npy, agent_<i>_position_frequency.npy, agent_<i>_random_block.npy, rng_keys.npy, checkpoint.json
+
+# Writing an array to a temporary file that then replaces filename. The Q-tables of a resumed run may be memory-mapped from the very
+# files a new checkpoint overwrites, and truncating a mapped file in place would zero the arrays being saved; the replaced file stays
+# alive for as long as it is mapped.
+def save_array(filename, array):
+    with open(filename + '.tmp', 'wb') as f:
+        np.save(f, array)
+    os.replace(filename + '.tmp', filename)
+
+# Saving the agents' Q-tables, position frequencies, positions and random streams, the environment's layout ids and both global RNG states to the directory at path.
+def save_checkpoint(path, agents, environment=None, metadata=None):
+    os.makedirs(path, exist_ok=True)
+    agent_info = []
+    for i, agent in enumerate(agents):
+        visited = agent.q_table.visited
+        size = int(np.flatnonzero(visited)[-1]) + 1 if visited.any() else 0  # Only rows up to the last seen state are stored.
+        save_array(os.path.join(path, f"agent_{i}_q_values.npy"), agent.q_table.values[:size])
+        save_array(os.path.join(path, f"agent_{i}_visited.npy"), visited[:size])
+        save_array(os.path.join(path, f"agent_{i}_position_frequency.npy"), agent.position_frequency)
+        agent_info.append({
+            'position': list(agent.position),
+            'carrying_block': bool(agent.carrying_block),
+            'learning_rate': agent.learning_rate,
+            'discount_factor': agent.discount_factor,
+            'exploit_probability': agent.exploit_probability,
+        })
+        if agent.random is not None:
+            random_state, rest = agent.random.get_state()
+            save_array(os.path.join(path, f"agent_{i}_random_block.npy"), rest)
+            agent_info[-1]['random_state'] = random_state
+
+    name, keys, position, has_gauss, cached_gaussian = np.random.get_state()
+    save_array(os.path.join(path, "rng_keys.npy"), keys)
+    info = {
+        'metadata': metadata or {},
+        'agents': agent_info,
+        'numpy_rng': {'name': name, 'position': int(position), 'has_gauss': int(has_gauss), 'cached_gaussian': float(cached_gaussian)},
+        'python_rng': random.getstate(),
+    }
+    if environment is not None:
+        # State ids embed layout ids, so the layout registry has to be restored for the Q-tables to keep their meaning.
+        # Layouts are listed by id, with None for the ids of retired layouts.
+        layouts = [None] * (max(environment.layouts.values(), default=-1) + 1)
+        for layout, layout_id in environment.layouts.items():
+            layouts[layout_id] = [[list(location) for location in locations] for locations in layout]
+        info['layouts'] = layouts
+    with open(os.path.join(path, "checkpoint.json"), 'w') as f:
+        json.dump(info, f)
+
+# Loading a checkpoint into existing agents (and environment). With mmap_mode the Q-values are memory-mapped copy-on-write instead of read into memory.
+# restore_state=False only warm-starts the Q-tables: positions, position frequencies and RNG states are left untouched.
+def load_checkpoint(path, agents, environment=None, mmap_mode='c', restore_state=True):
+    with open(os.path.join(path, "checkpoint.json")) as f:
+        info = json.load(f)
+    if len(info['agents']) != len(agents):
+        raise ValueError(f"Checkpoint has {len(info['agents'])} agents, got {len(agents)}")
+
+    if environment is not None and 'layouts' in info:
+        for layout_id, layout in enumerate(info['layouts']):
+            if layout is None:
+                continue
+            key = tuple(tuple(tuple(location) for location in locations) for locations in layout)
+            if environment.layouts.get(key) != layout_id:
+                if key in environment.layouts or layout_id in environment.layouts.values():
+                    raise ValueError("The environment's layout ids do not match the checkpoint's")
+                environment.layouts[key] = layout_id
+        environment.update_layout()
+
+    for i, (agent, agent_info) in enumerate(zip(agents, info['agents'])):
+        visited = np.load(os.path.join(path, f"agent_{i}_visited.npy"))
+        values = np.load(os.path.join(path, f"agent_{i}_q_values.npy"), mmap_mode=mmap_mode if visited.size else None)  # Empty files cannot be mapped.
+        agent.q_table = QTable.from_arrays(values, visited)
+        if restore_state:
+            agent.position_frequency = np.load(os.path.join(path, f"agent_{i}_position_frequency.npy"))
+            agent.position = tuple(agent_info['position'])
+            agent.carrying_block = agent_info['carrying_block']
+            if 'random_state' in agent_info:
+                bit_generator = getattr(np.random, agent_info['random_state']['bit_generator'])()
+                agent.random = RandomStream(np.random.Generator(bit_generator))
+                agent.random.set_state(agent_info['random_state'], np.load(os.path.join(path, f"agent_{i}_random_block.npy")))
+
+    if restore_state:
+        if environment is not None:
+            environment.rebuild_occupancy()
+        numpy_rng = info['numpy_rng']
+        keys = np.load(os.path.join(path, "rng_keys.npy"))
+        np.random.set_state((numpy_rng['name'], keys, numpy_rng['position'], numpy_rng['has_gauss'], numpy_rng['cached_gaussian']))
+        version, internal_state, gauss_next = info['python_rng']
+        random.setstate((version, tuple(internal_state), gauss_next))
+    return info['metadata']
@@ -0,0 +1,232 @@
+import numpy as np
+
+# Manhattan distance between two grid positions.
+def calculate_distance(position1, position2):
+    return abs(position1[0] - position2[0]) + abs(position1[1] - position2[1])
+
+
+class PolicySchedule:
+    def __init__(self, policy, warmup_steps=500, warmup_policy='random'):
+        # Using warmup_policy for the first warmup_steps steps (exploration phase) and policy afterwards.
+        self.policy = policy
+        self.warmup_steps = warmup_steps
+        self.warmup_policy = warmup_policy
+
+    def __call__(self, step):
+        if step < self.warmup_steps:
+            return self.warmup_policy
+        return self.policy
+
+
+class Collector:
+    # Base class for metric collectors; the engine calls these methods and subclasses override the ones they need.
+    def start(self, agents):
+        pass
+
+    # Called after every agent move with the observed transition, the distance moved and the change of the updated Q-value.
+    def collect(self, step, i, agent, state, action, reward, next_state, distance, delta):
+        pass
+
+    # Called once all agents have moved in a step, before the terminal check; returning True ends the run after this step.
+    def end_step(self, step):
+        return False
+
+    # Called after the environment is reset because it reached its terminal_count-th terminal state.
+    def on_terminal(self, terminal_count):
+        pass
+
+    # Called once when the run ends.
+    def finish(self):
+        pass
+
+
+class TotalsCollector(Collector):
+    # Accumulating total reward, distance and successes (steps with a positive reward) per agent.
+    def start(self, agents):
+        self.total_rewards = [0] * len(agents)
+        self.total_distances = [0] * len(agents)
+        self.total_successes = [0] * len(agents)
+
+    def collect(self, step, i, agent, state, action, reward, next_state, distance, delta):
+        self.total_rewards[i] += reward
+        if reward > 0:
+            self.total_successes[i] += 1
+        self.total_distances[i] += distance
+
+    def results(self):
+        return self.total_rewards, self.total_distances, self.total_successes
+
+
+class PhasedTotalsCollector(Collector):
+    def __init__(self, split_after):
+        # Accumulating separate totals and step counts before and after the split_after-th terminal state.
+        self.split_after = split_after
+
+    def start(self, agents):
+        self.phases = [TotalsCollector(), TotalsCollector()]
+        for phase in self.phases:
+            phase.start(agents)
+        self.total_steps = [0, 0]
+        self.phase = 0
+
+    def collect(self, step, i, agent, state, action, reward, next_state, distance, delta):
+        self.phases[self.phase].collect(step, i, agent, state, action, reward, next_state, distance, delta)
+
+    def end_step(self, step):
+        self.total_steps[self.phase] += 1
+        return False
+
+    def on_terminal(self, terminal_count):
+        if terminal_count >= self.split_after:
+            self.phase = 1
+
+    # Returning the totals of both phases in the order used by Experiments.run_experiment4.
+    def results(self):
+        before = self.phases[0].results() + (self.total_steps[0],)
+        after = self.phases[1].results() + (self.total_steps[1],)
+        return before + after
+
+
+# Moving the environment to a new layout and adapting the Q-tables of its agents. A state is its layout's block offset plus a local part
+# (cell, carrying) that means the same in every layout, so with carry_over the block of a layout seen for the first time starts from a copy
+# of the old layout's block instead of from zero. With evict the old layout is retired: its block is cleared and its id is reused by the next
+# new layout, so the tables keep a fixed size however often the layout changes. obstacles and restock are passed on to Environment.change_layout.
+# The change is checked before the old layout is retired, so a rejected change leaves the layouts and the Q-tables as they were.
+def change_layout(environment, pickup_locations=None, dropoff_locations=None, obstacles=None, carry_over=True, evict=True, restock=True):
+    environment.check_change(pickup_locations, dropoff_locations, obstacles)
+    size = environment.states_per_layout
+    old_offset = environment.layout_offset
+    if evict:
+        environment.retire_layout(environment.layout_id)
+    num_layouts = len(environment.layouts)
+    environment.change_layout(pickup_locations, dropoff_locations, obstacles, restock)
+    new_layout = len(environment.layouts) > num_layouts
+    new_offset = environment.layout_offset
+
+    tables = list({id(agent.q_table): agent.q_table for agent in environment.agents}.values())  # Shared tables are adapted once.
+    for table in tables:
+        if new_offset == old_offset:
+            if new_layout and not carry_over:
+                table.clear_block(new_offset, size)  # The retired block was reused, but the new layout starts from zero.
+            continue
+        if new_layout and carry_over:
+            table.copy_block(old_offset, new_offset, size)
+        if evict:
+            table.clear_block(old_offset, size)
+
+
+class LayoutSchedule:
+    def __init__(self, changes, carry_over=True, evict=True, restock=True, stop_after=None):
+        # Terminal hook that changes the layout at given terminal states and stops the run after the stop_after-th.
+        # changes maps a terminal count to the keyword arguments of change_layout, e.g. {3: {'pickup_locations': [(4, 2), (3, 3)]}}.
+        self.changes = changes
+        self.carry_over = carry_over
+        self.evict = evict
+        self.restock = restock
+        self.stop_after = stop_after
+
+    def __call__(self, environment, terminal_count):
+        change = self.changes.get(terminal_count)
+        if change is not None:
+            change_layout(environment, carry_over=self.carry_over, evict=self.evict, restock=self.restock, **change)
+        return terminal_count == self.stop_after
+
+
+class RandomLayoutChanges:
+    def __init__(self, probability, move=('pickup_locations',), carry_over=True, evict=True, stop_after=None, generator=None):
+        # Terminal hook that, with the given probability at every terminal state, moves the locations named in move ('pickup_locations'
+        # and/or 'dropoff_locations') to as many distinct random cells, never onto another pickup or dropoff location or an obstacle.
+        self.probability = probability
+        self.move = move
+        self.carry_over = carry_over
+        self.evict = evict
+        self.stop_after = stop_after
+        self.generator = generator if generator is not None else np.random.default_rng(np.random.randint(2 ** 32, dtype=np.uint64))
+        self.changes = 0
+
+    def __call__(self, environment, terminal_count):
+        if self.generator.random() < self.probability:
+            locations = {'pickup_locations': environment.pickup_locations, 'dropoff_locations': environment.dropoff_locations}
+            taken = {environment.cell_of(location) for name in locations if name not in self.move for location in locations[name]}
+            taken.update(environment.cell_of(location) for location in environment.obstacles)
+            free = np.array([cell for cell in range(environment.num_cells) if cell not in taken])
+            cells = iter(self.generator.permutation(free).tolist())
+            change = {name: [environment.cell_positions[next(cells)] for _ in locations[name]] for name in self.move}
+            change_layout(environment, carry_over=self.carry_over, evict=self.evict, **change)
+            self.changes += 1
+        return terminal_count == self.stop_after
+
+
+class RelocatePickups(LayoutSchedule):
+    def __init__(self, pickup_locations, after, stop_after=None, carry_over=False, evict=False):
+        # Terminal hook that moves the pickup locations after the after-th terminal state and stops the run after the stop_after-th.
+        # The new locations are not restocked, so they only get blocks at the next terminal reset (the behaviour Experiment 4 was run with).
+        super().__init__({after: {'pickup_locations': pickup_locations}}, carry_over, evict, restock=False, stop_after=stop_after)
+
+
+class ExperimentEngine:
+    def __init__(self, learner, schedule, terminal_hooks=(), collectors=(), synchronous=False):
+        # Initializing the engine with a learner (QLearner or SarsaLearner), a policy schedule, terminal hooks and metric collectors.
+        # With synchronous, all agents act on the same snapshot every step (Environment.step_synchronous) instead of moving in turn.
+        self.learner = learner
+        self.synchronous = synchronous
+        self.schedule = schedule
+        self.terminal_hooks = list(terminal_hooks)
+        self.collectors = list(collectors)
+        self.steps_run = 0
+        self.terminal_count = 0
+
+    # Running num_steps steps in which every agent moves once; collectors (from end_step) and terminal hooks may return True to end the run early.
+    def run(self, environment, agents, num_steps, initial_agent_positions):
+        learner = self.learner
+        collectors = self.collectors
+        environment.reset_environment(initial_agent_positions)
+        for collector in collectors:
+            collector.start(agents)
+        learner.reset(environment, agents)
+        self.steps_run = 0
+        self.terminal_count = 0
+
+        for step in range(num_steps):
+            policy = self.schedule(step)
+
+            if self.synchronous:
+                # Executing the actions of all agents as one step.
+                positions = [agent.position for agent in agents]
+                transitions = learner.act_synchronous(agents, environment, policy)
+                for i, (agent, (state, action, reward, next_state, delta)) in enumerate(zip(agents, transitions)):
+                    distance = calculate_distance(positions[i], agent.position)
+                    for collector in collectors:
+                        collector.collect(step, i, agent, state, action, reward, next_state, distance, delta)
+            else:
+                # Iterating over agents and executing actions.
+                for i, agent in enumerate(agents):
+                    position = agent.position
+                    state, action, reward, next_state, delta = learner.act(i, agent, environment, policy)
+                    distance = calculate_distance(position, agent.position)
+                    for collector in collectors:
+                        collector.collect(step, i, agent, state, action, reward, next_state, distance, delta)
+
+            stop = False
+            for collector in collectors:
+                stop = collector.end_step(step) or stop
+            self.steps_run = step + 1
+
+            # Resetting the environment if it reaches a terminal state.
+            if environment.is_terminal_state():
+                self.terminal_count += 1
+                learner.flush(agents)  # Before the terminal hooks, which may move the world to another layout.
+                environment.reset(initial_agent_positions)
+                for collector in collectors:
+                    collector.on_terminal(self.terminal_count)
+                for hook in self.terminal_hooks:
+                    stop = hook(environment, self.terminal_count) or stop
+                learner.reset(environment, agents)
+
+            if stop:
+                break
+
+        learner.flush(agents)  # Updating the transitions still waiting for their return (e.g. the last n - 1 of n-step Q-learning).
+        for collector in collectors:
+            collector.finish()
+        return self
@@ -1,40 +1,256 @@
 import numpy as np 
 import matplotlib.pyplot as plt  # For visualization
 from matplotlib.colors import ListedColormap
+from matplotlib.figure import Figure
+from matplotlib.patches import Rectangle
+
+# Fixed action order shared by the environment and the Q-tables (the column order of every Q-table).
+ACTIONS = ('up', 'down', 'left', 'right', 'pickup', 'dropoff')
+ACTION_INDEX = {action: i for i, action in enumerate(ACTIONS)}
+PICKUP = ACTION_INDEX['pickup']
+DROPOFF = ACTION_INDEX['dropoff']
+
+# Row/column offsets of the four move actions.
+MOVES = ((-1, 0), (1, 0), (0, -1), (0, 1))
+MOVE_BITS = (1 << len(MOVES)) - 1
+PICKUP_BIT = 1 << PICKUP
+DROPOFF_BIT = 1 << DROPOFF
+
+# Number of blocks a pickup location starts with and a dropoff location accepts, unless given otherwise.
+DEFAULT_CAPACITY = 5
+
+# Every action bitmask mapped to its tuple of action names, so available actions are a lookup instead of a new list per call.
+ACTION_SETS = tuple(tuple(action for i, action in enumerate(ACTIONS) if mask & (1 << i)) for mask in range(1 << len(ACTIONS)))
+
+# Resolving simultaneous moves: current and proposed are (..., agents) arrays of cells, one row of agents per world.
+# Returns the cells the agents end up in, with the conflicting moves turned into staying put. Rules, applied until nothing changes:
+#   1. a move into a cell that stays occupied (its agent does not move) fails;
+#   2. two agents swapping cells both stay;
+#   3. when several agents move into the same cell, the lowest-indexed one moves and the others stay.
+# Rule 3 is only applied once rules 1 and 2 block nothing more, so an agent only loses a contest to an agent that is still moving.
+# Agents may follow each other (moving into a cell that is being vacated), including around a cycle of three or more.
+def resolve_moves(current, proposed):
+    current = np.asarray(current)
+    target = np.array(proposed)
+    earlier = np.tri(current.shape[-1], k=-1, dtype=bool)  # earlier[i, j]: agent j has a lower index than agent i.
+    while True:
+        moving = target != current
+        enters = target[..., :, None] == current[..., None, :]  # enters[..., i, j]: agent i moves into agent j's cell.
+        blocked = (enters & ~moving[..., None, :]).any(axis=-1)
+        blocked |= (enters & (current[..., :, None] == target[..., None, :])).any(axis=-1)
+        blocked &= moving
+        if not blocked.any():
+            blocked = moving & ((target[..., :, None] == target[..., None, :]) & moving[..., None, :] & earlier).any(axis=-1)
+            if not blocked.any():
+                return target
+        target = np.where(blocked, current, target)
+
+# The capacity of one site, from either one number for every site or a dict from location to number (DEFAULT_CAPACITY for the others).
+def site_capacity(capacity, location):
+    if isinstance(capacity, dict):
+        return capacity.get(tuple(location), DEFAULT_CAPACITY)
+    return capacity
+
+# The capacities once the sites at old_locations have moved to new_locations (paired in order): a dict of per-site capacities follows its
+# sites, so a relocated site keeps its capacity instead of falling back to DEFAULT_CAPACITY; one number for every site stays as it is.
+def moved_capacity(capacity, old_locations, new_locations):
+    if not isinstance(capacity, dict):
+        return capacity
+    if len(new_locations) != len(old_locations):
+        raise ValueError(f"Per-site capacities cannot follow {len(old_locations)} sites to {len(new_locations)} new locations")
+    moved = {location: count for location, count in capacity.items() if location not in set(map(tuple, old_locations))}
+    for old_location, new_location in zip(old_locations, new_locations):
+        moved[tuple(new_location)] = site_capacity(capacity, old_location)
+    return moved
+
+# Precomputing the transition table next_cell[cell, action] (cell = row * width + column) and the move masks of a grid with obstacles.
+# A move that would leave the grid or enter an obstacle maps a cell to itself; pickup and dropoff never change the cell.
+def transition_table(grid_size, obstacles=()):
+    rows, columns = grid_size
+    num_cells = rows * columns
+    blocked = {tuple(location) for location in obstacles}
+    next_cell = np.repeat(np.arange(num_cells)[:, None], len(ACTIONS), axis=1)
+    move_mask = np.zeros(num_cells, dtype=int)
+    for cell in range(num_cells):
+        x, y = divmod(cell, columns)
+        for action, (dx, dy) in enumerate(MOVES):
+            new_x, new_y = x + dx, y + dy
+            if 0 <= new_x < rows and 0 <= new_y < columns and (new_x, new_y) not in blocked:
+                next_cell[cell, action] = new_x * columns + new_y
+                move_mask[cell] |= 1 << action
+    return next_cell, move_mask
 
 class Environment:
-    def __init__(self, grid_size, pickup_locations, dropoff_locations):
+    def __init__(self, grid_size, pickup_locations, dropoff_locations, pickup_capacity=DEFAULT_CAPACITY, dropoff_capacity=DEFAULT_CAPACITY,
+                 mask_invalid_moves=False, obstacles=()):
         # Initializing the Environment class with grid size, pickup and dropoff locations, an empty grid, and an empty list of agents.
+        # pickup_capacity is the number of blocks each pickup location starts with and dropoff_capacity the number each dropoff location accepts,
+        # either one number for every location or a dict from location to number. obstacles are cells (walls, racks) no agent can enter.
+        # With mask_invalid_moves, moves that would leave the grid or enter an obstacle are not offered as available actions (by default they are, and simply fail).
         self.grid_size = grid_size
+        self.pickup_capacity = pickup_capacity
+        self.dropoff_capacity = dropoff_capacity
+        self.mask_invalid_moves = mask_invalid_moves
+        self.obstacles = [tuple(location) for location in obstacles]
+        self.build_transitions()
+        self.layouts = {}  # Every (pickup, dropoff, obstacle) layout seen so far, mapped to its layout id.
+        self._pickup_locations = self._dropoff_locations = None
         self.pickup_locations = pickup_locations
         self.dropoff_locations = dropoff_locations
         self.grid = np.zeros(grid_size, dtype=int)
         self.agents = []
+        self.occupancy = [0] * self.num_cells  # Number of agents on every cell, kept up to date so collision checks are O(1).
         self.dropoff_counts = {location: 0 for location in dropoff_locations}  
 
+    # Precomputing the transition table and the static move masks with the obstacles folded in, so walls cost nothing per step,
+    # and the walls layer (True on obstacle cells) kept alongside the grid.
+    def build_transitions(self):
+        rows, columns = self.grid_size
+        self.num_cells = rows * columns
+        self.cell_positions = [(x, y) for x in range(rows) for y in range(columns)]
+        self.walls = np.zeros(self.grid_size, dtype=bool)
+        for location in self.obstacles:
+            self.walls[location] = True
+        self.next_cell, self.move_mask = transition_table(self.grid_size, self.obstacles)
+        self.next_cell_list = self.next_cell.tolist()  # Plain lists are faster than NumPy scalars for single lookups.
+        self.move_mask_list = self.move_mask.tolist() if self.mask_invalid_moves else [MOVE_BITS] * self.num_cells
+        self.states_per_layout = 2 * self.num_cells  # Every cell, with and without a block.
+
+    # Pickup and dropoff locations are properties so the per-cell lookups and the cached layout id stay in sync when they are reassigned (e.g. in Experiment 4).
+    @property
+    def pickup_locations(self):
+        return self._pickup_locations
+
+    @pickup_locations.setter
+    def pickup_locations(self, locations):
+        if self._dropoff_locations is not None:
+            self.check_layout(locations, self._dropoff_locations, self.obstacles)
+        self._pickup_locations = locations
+        self.pickup_cells = set(locations)
+        self.update_layout()
+
+    @property
+    def dropoff_locations(self):
+        return self._dropoff_locations
+
+    @dropoff_locations.setter
+    def dropoff_locations(self, locations):
+        if self._pickup_locations is not None:
+            self.check_layout(self._pickup_locations, locations, self.obstacles)
+        self._dropoff_locations = locations
+        self.dropoff_cells = set(locations)
+        self.update_layout()
+
+    # Caching the current layout, its id and the offset of its block of states. A layout seen for the first time takes the lowest free id,
+    # so layouts get consecutive ids in the order they are first seen until one is retired, and then reuse the retired ids.
+    def update_layout(self):
+        if self._pickup_locations is None or self._dropoff_locations is None:
+            return
+        self.layout = (tuple(sorted(self._pickup_locations)), tuple(sorted(self._dropoff_locations)), tuple(sorted(self.obstacles)))
+        layout_id = self.layouts.get(self.layout)
+        if layout_id is None:
+            layout_id = min(set(range(len(self.layouts) + 1)) - set(self.layouts.values()))
+            self.layouts[self.layout] = layout_id
+        self.layout_id = layout_id
+        self.layout_offset = layout_id * self.states_per_layout
+        self.build_sites()
+
+    # Checking a layout before any of it is applied: no site on an obstacle, and the pickup locations holding at least as many blocks as
+    # the dropoff locations accept, since otherwise the terminal state is never reached. Capacities default to the environment's.
+    def check_layout(self, pickup_locations, dropoff_locations, obstacles, pickup_capacity=None, dropoff_capacity=None):
+        pickup_capacity = self.pickup_capacity if pickup_capacity is None else pickup_capacity
+        dropoff_capacity = self.dropoff_capacity if dropoff_capacity is None else dropoff_capacity
+        blocked = {tuple(location) for location in obstacles}
+        if any(tuple(location) in blocked for location in list(pickup_locations) + list(dropoff_locations)):
+            raise ValueError("Pickup and dropoff locations cannot be obstacles")
+        stock = sum(site_capacity(pickup_capacity, location) for location in pickup_locations)
+        capacity = sum(site_capacity(dropoff_capacity, location) for location in dropoff_locations)
+        if stock < capacity:
+            raise ValueError(f"The pickup locations hold {stock} blocks, fewer than the {capacity} the dropoff locations accept")
+
+    # Building the per-site state kept alongside the grid: stock holds the blocks every pickup location starts with (0 elsewhere) and
+    # dropoff_limits the number of blocks every dropoff location accepts, as a dict for the lookups of every step.
+    def build_sites(self):
+        self.stock = np.zeros(self.grid_size, dtype=int)
+        for location in self._pickup_locations:
+            self.stock[tuple(location)] = site_capacity(self.pickup_capacity, location)
+        self.dropoff_limits = {location: site_capacity(self.dropoff_capacity, location) for location in self._dropoff_locations}
+
+    # Forgetting a layout so that its id, and with it its block of Q-table rows, is taken by the next new layout.
+    def retire_layout(self, layout_id):
+        self.layouts = {layout: i for layout, i in self.layouts.items() if i != layout_id}
+
+    # Checking a layout change (arguments as for change_layout) without applying any of it. Returns the new pickup locations, dropoff
+    # locations and obstacles, with the current ones in place of None, and the capacities after the move (see moved_capacity).
+    def check_change(self, pickup_locations=None, dropoff_locations=None, obstacles=None):
+        pickup_locations = self._pickup_locations if pickup_locations is None else list(pickup_locations)
+        dropoff_locations = self._dropoff_locations if dropoff_locations is None else list(dropoff_locations)
+        pickup_capacity = moved_capacity(self.pickup_capacity, self._pickup_locations, pickup_locations)
+        dropoff_capacity = moved_capacity(self.dropoff_capacity, self._dropoff_locations, dropoff_locations)
+        if obstacles is not None:
+            obstacles = [tuple(location) for location in obstacles]
+            if any(agent.position in obstacles for agent in self.agents):
+                raise ValueError("An agent stands on one of the new obstacles")
+        self.check_layout(pickup_locations, dropoff_locations, self.obstacles if obstacles is None else obstacles, pickup_capacity, dropoff_capacity)
+        return pickup_locations, dropoff_locations, obstacles, pickup_capacity, dropoff_capacity
+
+    # Moving the pickup and/or dropoff locations and replacing the obstacles (None keeps them) as one layout change. With restock, the new
+    # pickup locations are filled and the dropoff counts start over, as after a reset; without it the grid is left as it is and only the new
+    # dropoff locations start empty. Per-site capacities move with their sites. The new layout is checked first, so a change that fails
+    # leaves the environment as it was.
+    def change_layout(self, pickup_locations=None, dropoff_locations=None, obstacles=None, restock=True):
+        pickup_locations, dropoff_locations, obstacles, pickup_capacity, dropoff_capacity = self.check_change(pickup_locations, dropoff_locations, obstacles)
+        self.pickup_capacity = pickup_capacity
+        self.dropoff_capacity = dropoff_capacity
+        if obstacles is not None:
+            self.obstacles = obstacles
+            self.build_transitions()
+        self._pickup_locations = pickup_locations
+        self.pickup_cells = set(pickup_locations)
+        self._dropoff_locations = dropoff_locations
+        self.dropoff_cells = set(dropoff_locations)
+        self.update_layout()
+        if restock:
+            self.grid = self.stock.copy()
+            self.dropoff_counts = {location: 0 for location in self.dropoff_locations}
+        else:
+            self.dropoff_counts = {location: self.dropoff_counts.get(location, 0) for location in self.dropoff_locations}
+
     # Method that adds an agent to the environment.
     def add_agent(self, agent):
+        if self.walls[agent.position]:
+            raise ValueError(f"Agent position {agent.position} is an obstacle")
         self.agents.append(agent)
+        agent.reset_position_freq(self.grid_size)
+        self.occupancy[self.cell_of(agent.position)] += 1
+
+    # Converting a (row, column) position into its flat cell index.
+    def cell_of(self, position):
+        return position[0] * self.grid_size[1] + position[1]
+
+    # Rebuilding the occupancy map from the agents' positions (needed only when positions are assigned from outside execute_action).
+    def rebuild_occupancy(self):
+        self.occupancy = [0] * self.num_cells
+        for agent in self.agents:
+            self.occupancy[self.cell_of(agent.position)] += 1
 
     # Method for resetting the environment between experiments
     def reset_environment(self, initial_agent_positions):
-        self.grid = np.zeros(self.grid_size, dtype=int)
-        for pickup_location in self.pickup_locations:
-            self.grid[pickup_location] = 5  
+        self.grid = self.stock.copy()
         for i, agent in enumerate(self.agents):
             agent.position = initial_agent_positions[i]
             agent.carrying_block = False  # Reset the carrying_block attribute
-            agent.position_frequency = [[0 for j in range(0, 5)] for i in range(0, 5)]
+            agent.reset_position_freq(self.grid_size)
+        self.rebuild_occupancy()
         self.dropoff_counts = {location: 0 for location in self.dropoff_locations}  
 
     # Method for resetting the environment if terminal state reached by placing pickup locations, agents, and resetting agents' states.
     def reset(self, initial_agent_positions):
-        self.grid = np.zeros(self.grid_size, dtype=int)
-        for pickup_location in self.pickup_locations:
-            self.grid[pickup_location] = 5  
+        self.grid = self.stock.copy()
         for i, agent in enumerate(self.agents):
             agent.position = initial_agent_positions[i]
             agent.carrying_block = False  # Reset the carrying_block attribute
+        self.rebuild_occupancy()
         self.dropoff_counts = {location: 0 for location in self.dropoff_locations}  
 
     # Method for executing one step in the environment for each agent.
@@ -47,28 +263,21 @@ class Environment:
     # Method for executing an action for the given agent and updating the environment accordingly.
     def execute_action(self, agent, action):
         x, y = agent.position
+        cell = x * self.grid_size[1] + y
+        action_index = ACTION_INDEX[action]
 
-        # Determining the new position based on the action.
-        if action == 'up':
-            new_x, new_y = x - 1, y
-        elif action == 'down':
-            new_x, new_y = x + 1, y
-        elif action == 'left':
-            new_x, new_y = x, y - 1
-        elif action == 'right':
-            new_x, new_y = x, y + 1
-        else:
-            new_x, new_y = x, y
-
-        # Updating the agent's position if the new position is valid.
-        if self.is_valid_position(new_x, new_y):
-            agent.position = (new_x, new_y)
+        # Determining the new position from the precomputed transition table and moving there if the cell is free.
+        new_cell = self.next_cell_list[cell][action_index]
+        if new_cell != cell and self.occupancy[new_cell] == 0:
+            self.occupancy[cell] -= 1
+            self.occupancy[new_cell] += 1
+            agent.position = self.cell_positions[new_cell]
 
         # Executing pickup and dropoff actions and calculating reward.
-        if action == 'pickup' and self.grid[x, y] > 0 and not agent.carrying_block:  
-            self.grid[x, y] -= 1  # Change this line
+        if action_index == PICKUP and self.grid[x, y] > 0 and not agent.carrying_block:  
+            self.grid[x, y] -= 1
             agent.carrying_block = True
-        elif action == 'dropoff' and (x, y) in self.dropoff_locations and agent.carrying_block and self.dropoff_counts[(x, y)] < 5:  # Change this line
+        elif action_index == DROPOFF and agent.carrying_block and self.is_open_dropoff((x, y)):
             agent.carrying_block = False
             self.dropoff_counts[(x, y)] += 1  
         
@@ -78,86 +287,138 @@ class Environment:
         reward = self.calculate_reward(agent)
         return reward
 
+    # Method for executing one synchronous step: all agents act on the same snapshot, with actions given in self.agents order.
+    # Moves are resolved together by resolve_moves, pickups and dropoffs happen at the cells the agents acted from (never shared, since
+    # agents never share a cell) and rewards are calculated once the whole step has been applied. Returns the rewards in agent order.
+    def step_synchronous(self, actions):
+        columns = self.grid_size[1]
+        current = [x * columns + y for x, y in (agent.position for agent in self.agents)]
+        action_indices = [ACTION_INDEX[action] for action in actions]
+        proposed = [self.next_cell_list[cell][action_index] for cell, action_index in zip(current, action_indices)]
+        if proposed != current:
+            new_cells = resolve_moves(current, proposed).tolist()
+        else:
+            new_cells = current
+
+        for agent, cell, new_cell, action_index in zip(self.agents, current, new_cells, action_indices):
+            position = agent.position
+            if action_index == PICKUP and self.grid[position] > 0 and not agent.carrying_block:
+                self.grid[position] -= 1
+                agent.carrying_block = True
+            elif action_index == DROPOFF and agent.carrying_block and self.is_open_dropoff(position):
+                agent.carrying_block = False
+                self.dropoff_counts[position] += 1
+            if new_cell != cell:
+                self.occupancy[cell] -= 1
+                self.occupancy[new_cell] += 1
+                agent.position = self.cell_positions[new_cell]
+            agent.update_position_freq()
+
+        return [self.calculate_reward(agent) for agent in self.agents]
+
     # Checks if the position (x, y) is valid within the grid boundaries and not occupied by another agent.
     def is_valid_position(self, x, y):
         if x < 0 or x >= self.grid_size[0] or y < 0 or y >= self.grid_size[1]:
             return False
-        for agent in self.agents:
-            if agent.position == (x, y):
-                return False
-        return True
+        return self.occupancy[x * self.grid_size[1] + y] == 0 and not self.walls[x, y]
 
     # Calculates the reward for the agent's current position and state.
     def calculate_reward(self, agent):
-        x, y = agent.position
+        position = agent.position
 
-        if agent.carrying_block and (x, y) in self.dropoff_locations and self.dropoff_counts[(x, y)] < 5:  # Change this line
+        if agent.carrying_block and self.is_open_dropoff(position):
             return 10.0   # Reward for successful dropoff
-        elif not agent.carrying_block and (x, y) in self.pickup_locations and self.grid[x, y] > 0:
+        elif not agent.carrying_block and position in self.pickup_cells and self.grid[position] > 0:
             return 1.0  # Reward for successful pickup
         else:
             return 0.0  # No reward or penalty for other steps
 
-    # Gets the state representation for a given agent.
+    # Gets the state representation for a given agent: one integer packing the layout, the agent's cell and whether it carries a block, so it can index a Q-table row directly.
     def get_state(self, agent):
-        agent_position = agent.position
-        pickup_locations = tuple(sorted(self.pickup_locations))
-        dropoff_locations = tuple(sorted(self.dropoff_locations))
-        return (agent_position, pickup_locations, dropoff_locations)
-
-    # Gets available actions for the given agent based on its current position and state.
-    def get_available_actions(self, agent):
-        actions = ['up', 'down', 'left', 'right']
         x, y = agent.position
+        return self.layout_offset + (x * self.grid_size[1] + y) * 2 + agent.carrying_block
+
+    # Decodes a state from get_state into the agent's position, its carrying flag and the layout id.
+    def decode_state(self, state):
+        layout_id, state = divmod(state, self.states_per_layout)
+        cell, carrying = divmod(state, 2)
+        return self.cell_positions[cell], bool(carrying), layout_id
+
+    # Checks if the position is a dropoff location that can still accept blocks.
+    def is_open_dropoff(self, position):
+        return position in self.dropoff_cells and self.dropoff_counts[position] < self.dropoff_limits[position]
 
-        if self.grid[x, y] > 0 and not agent.carrying_block:
-            actions.append('pickup')
-        if agent.carrying_block and (x, y) in self.dropoff_locations and self.dropoff_counts[(x, y)] < 5:  # Change this line
-            actions.append('dropoff')
+    # Gets the bitmask of available actions (bit i set for ACTIONS[i]) by combining the static move mask with the pickup/dropoff state.
+    def get_action_mask(self, agent):
+        x, y = agent.position
+        mask = self.move_mask_list[x * self.grid_size[1] + y]
+        if agent.carrying_block:
+            if self.is_open_dropoff((x, y)):
+                mask |= DROPOFF_BIT
+        elif self.grid[x, y] > 0:
+            mask |= PICKUP_BIT
+        return mask
 
-        return actions
+    # Gets available actions for the given agent based on its current position and state.
+    def get_available_actions(self, agent):
+        return ACTION_SETS[self.get_action_mask(agent)]
 
     # Checks if the environment has reached a terminal state where all pickups are delivered.
     def is_terminal_state(self):
-        if all(count == 5 for count in self.dropoff_counts.values()):  
+        if all(count == self.dropoff_limits[location] for location, count in self.dropoff_counts.items()):
             return True
         return False
 
 
     # Visualizes the environment grid, pickup locations, drop-off locations, and agent positions from the environment class.
-    def visualize(self):
-        # Define the color map for the grid
-        cmap = ListedColormap(['white'])
-        
-        # Create a figure and axis with a specified size
+    # The plot is shown interactively, or written to path without opening a window when a path is given.
+    def visualize(self, path=None):
+        plot_environment(self.grid_size, self.pickup_locations, self.dropoff_locations, [agent.position for agent in self.agents], path, self.obstacles)
+
+
+# Plots an environment snapshot; a module-level function so it can also run in a background worker process.
+def plot_environment(grid_size, pickup_locations, dropoff_locations, agent_positions, path=None, obstacles=()):
+    # Create a figure and axis with a specified size (a standalone Agg figure when saving, so no display is needed)
+    if path is None:
         fig, ax = plt.subplots(figsize=(8, 8))
-        
-        # Plot the grid with custom color maps
-        ax.matshow(self.grid, cmap=cmap)
-        
-        # Loop over the data dimensions and create text annotations
-        for pickup_location in self.pickup_locations:
-            ax.text(pickup_location[1], pickup_location[0], 'Pickup', ha='center', va='center', color='blue', fontsize=12, weight='bold')
+    else:
+        fig = Figure(figsize=(8, 8))
+        ax = fig.subplots()
 
-        for dropoff_location in self.dropoff_locations:
-            ax.text(dropoff_location[1], dropoff_location[0], 'Dropoff', ha='center', va='center', color='green', fontsize=12, weight='bold')
+    # Define the color map for the grid
+    cmap = ListedColormap(['white'])
 
-        for agent in self.agents:
-            x, y = agent.position
-            ax.text(y, x, 'Agent', ha='center', va='center', color='red', fontsize=12, weight='bold')
-        
-        # Draw grid lines
-        ax.set_xticks(np.arange(-0.5, self.grid_size[1], 1), minor=True)
-        ax.set_yticks(np.arange(-0.5, self.grid_size[0], 1), minor=True)
-        ax.grid(which='minor', color='black', linestyle='-', linewidth=2)
-        ax.grid(which='major', color='white', linestyle='', linewidth=0)
-        
-        # Hide the major tick labels
-        ax.tick_params(which='both', bottom=False, left=False, labelbottom=False, labelleft=False)
+    # Plot the grid with custom color maps
+    ax.matshow(np.zeros(grid_size), cmap=cmap)
+    
+    # Shade the obstacle cells
+    for x, y in obstacles:
+        ax.add_patch(Rectangle((y - 0.5, x - 0.5), 1, 1, color='dimgray'))
 
-        # Set the title
-        ax.set_title('Environment', fontsize=16, weight='bold')
+    # Loop over the data dimensions and create text annotations
+    for pickup_location in pickup_locations:
+        ax.text(pickup_location[1], pickup_location[0], 'Pickup', ha='center', va='center', color='blue', fontsize=12, weight='bold')
 
-        # Display the plot
-        plt.show()
+    for dropoff_location in dropoff_locations:
+        ax.text(dropoff_location[1], dropoff_location[0], 'Dropoff', ha='center', va='center', color='green', fontsize=12, weight='bold')
 
+    for x, y in agent_positions:
+        ax.text(y, x, 'Agent', ha='center', va='center', color='red', fontsize=12, weight='bold')
+    
+    # Draw grid lines
+    ax.set_xticks(np.arange(-0.5, grid_size[1], 1), minor=True)
+    ax.set_yticks(np.arange(-0.5, grid_size[0], 1), minor=True)
+    ax.grid(which='minor', color='black', linestyle='-', linewidth=2)
+    ax.grid(which='major', color='white', linestyle='', linewidth=0)
+    
+    # Hide the major tick labels
+    ax.tick_params(which='both', bottom=False, left=False, labelbottom=False, labelleft=False)
+
+    # Set the title
+    ax.set_title('Environment', fontsize=16, weight='bold')
+
+    # Display the plot or save it
+    if path is None:
+        plt.show()
+    else:
+        fig.savefig(path)
@@ -1,45 +1,173 @@
 import numpy as np
+import pandas as pd
+import random
+from concurrent.futures import ProcessPoolExecutor
+from Environment import Environment
+from Agent import Agent
+from Engine import ExperimentEngine, PolicySchedule, TotalsCollector, PhasedTotalsCollector, RelocatePickups, RandomLayoutChanges, calculate_distance
+from Learners import QLearner, SarsaLearner, NStepQLearner, SarsaLambdaLearner, WatkinsQLambdaLearner
+from Replay import ReplayLearner
+from Kernels import run_q_learning
+from Fleet import spawn_positions
+
+# The PD world used by main.py; the parallel runners build a fresh copy of it in every worker.
+DEFAULT_WORLD = {
+    'grid_size': (5, 5),
+    'pickup_locations': [(0, 4), (1, 3), (4, 1)],
+    'dropoff_locations': [(0, 0), (2, 0), (3, 4)],
+    'initial_agent_positions': [(0, 2), (2, 2), (4, 2)],
+    'pickup_capacity': 5,
+    'dropoff_capacity': 5,
+    'learning_rate': 0.3,
+    'discount_factor': 0.5,
+}
+
+# The experiment schedule run by main.py, as specs understood by Experiments.run_spec.
+DEFAULT_SPECS = [
+    {'experiment': '1a'},
+    {'experiment': '1b'},
+    {'experiment': '1c'},
+    {'experiment': '2'},
+    {'experiment': '3', 'learning_rate': 0.15},
+    {'experiment': '3', 'learning_rate': 0.45},
+    {'experiment': '4'},
+]
+
+# The cells Experiment 4 moves the pickup locations to.
+EXPERIMENT4_PICKUP_LOCATIONS = [(4, 2), (3, 3), (2, 4)]
+
+# Building the environment of a world description, without agents.
+def build_environment(world):
+    return Environment(world['grid_size'], list(world['pickup_locations']), list(world['dropoff_locations']),
+                       pickup_capacity=world.get('pickup_capacity', 5), dropoff_capacity=world.get('dropoff_capacity', 5),
+                       obstacles=world.get('obstacles', ()))
+
+# Checking before any training that a world can run the experiment specs: its layout must be valid and, for Experiment 4, so must the
+# layout with the pickup locations moved to EXPERIMENT4_PICKUP_LOCATIONS. Raises ValueError otherwise.
+def check_world(world, specs):
+    environment = build_environment(world)
+    if any(spec['experiment'] == '4' for spec in specs):
+        try:
+            environment.check_change(pickup_locations=EXPERIMENT4_PICKUP_LOCATIONS)
+        except ValueError as error:
+            raise ValueError(f"Experiment 4 cannot move the pickup locations to {EXPERIMENT4_PICKUP_LOCATIONS}: {error}") from error
+
+# Building an environment and its agents from a world description such as DEFAULT_WORLD. With num_agents, that many agents are built:
+# the first ones at initial_agent_positions and the rest at random free cells (see Fleet.spawn_positions).
+def build_world(world):
+    environment = build_environment(world)
+    initial_agent_positions = list(world.get('initial_agent_positions', []))
+    num_agents = world.get('num_agents', len(initial_agent_positions))
+    initial_agent_positions = initial_agent_positions[:num_agents]
+    if len(initial_agent_positions) < num_agents:
+        initial_agent_positions += spawn_positions(environment, num_agents - len(initial_agent_positions), initial_agent_positions)
+    agents = [Agent(position, learning_rate=world['learning_rate'], discount_factor=world['discount_factor']) for position in initial_agent_positions]
+    for agent in agents:
+        environment.add_agent(agent)
+    return environment, agents, initial_agent_positions
+
+# Label used for an experiment spec in result tables, e.g. '1a' or '3 (lr=0.15)'.
+def spec_label(spec):
+    if 'label' in spec:
+        return spec['label']
+    if 'learning_rate' in spec:
+        return f"{spec['experiment']} (lr={spec['learning_rate']})"
+    return spec['experiment']
+
+# Worker entry point: seeding this process's RNGs, building a fresh world and running the experiment specs on it in order, so every
+# experiment continues from the Q-tables of the ones before it, as in main.py. The RNGs are seeded again after the world is built
+# (which may place agents at random), so the experiments draw the same random numbers as main.py does for this seed. options are the
+# constructor arguments of the Experiments instance that started the run (see Experiments.options).
+def run_seed(seed, specs, num_steps, world, options):
+    np.random.seed(seed)
+    random.seed(seed)
+    environment, agents, initial_agent_positions = build_world(world)
+    np.random.seed(seed)
+    random.seed(seed)
+    experiments = Experiments(**options)
+    rows = []
+    for spec in specs:
+        rows.extend(experiments.run_spec(environment, agents, num_steps, initial_agent_positions, spec))
+    for row in rows:
+        row['seed'] = seed
+    return rows
 
 class Experiments:
-    def run_experiment1(self, environment, agents, num_steps, policy, initial_agent_positions):
-        learning_rate = agents[0].learning_rate
-        discount_factor = agents[0].discount_factor
-        total_rewards = [0] * len(agents)
-        total_successes = [0] * len(agents)
-        total_distances = [0] * len(agents)
-
-        environment.reset_environment(initial_agent_positions)
-
-        for step in range(num_steps):
-            # Switching between exploration and exploitation phases based on step count.
-            if step < 500:
-                policy_to_use = 'random'
-            else:
-                policy_to_use = policy
-
-            # Iterating over agents and executing actions.
-            for i, agent in enumerate(agents):
-                state = environment.get_state(agent)
-                action = agent.choose_action(environment, policy_to_use)
-                reward = environment.execute_action(agent, action)
-                next_state = environment.get_state(agent)
-
-                # Updating total rewards, successes, and distances.
-                total_rewards[i] += reward
-                if reward > 0:
-                    total_successes[i] += 1
+    def __init__(self, collectors=(), synchronous=False, warmup_steps=500, n_step=1, trace_lambda=None, replay_batch=0, prioritized_replay=False,
+                 backend='python', layout_change_probability=0.0, carry_over=False, evict_layouts=False):
+        # Extra collectors (e.g. a TrajectoryRecorder or ConvergenceMonitor) attached to every experiment run, on top of each experiment's own totals.
+        # With synchronous, every experiment uses the simultaneous-move step mode of the engine.
+        # warmup_steps is the length of the random exploration phase at the start of every experiment.
+        # With n_step > 1 the Q-learning experiments use n-step returns; with trace_lambda they use Watkins's Q(lambda) and
+        # Experiment 2 uses SARSA(lambda) instead of the one-step rules. With replay_batch > 0 the Q-learning experiments also replay a
+        # batch of that many stored transitions after every step, sampled by TD error with prioritized_replay.
+        # With backend='kernel', runs that the compiled kernel supports (one-step Q-learning without terminal hooks, extra collectors or
+        # synchronous steps) use Kernels.run_q_learning, which gives the same results; all other runs use the engine.
+        # With layout_change_probability > 0, the pickup locations move to random cells with that probability at every terminal state of every
+        # experiment. carry_over and evict_layouts set how the Q-tables follow these changes and the relocation of Experiment 4 (see Engine.change_layout).
+        # steps_run holds the number of steps the last experiment actually ran, which is less than num_steps when a collector stopped it early.
+        self.collectors = list(collectors)
+        self.synchronous = synchronous
+        self.warmup_steps = warmup_steps
+        self.n_step = n_step
+        self.trace_lambda = trace_lambda
+        self.replay_batch = replay_batch
+        self.prioritized_replay = prioritized_replay
+        self.backend = backend
+        self.layout_change_probability = layout_change_probability
+        self.carry_over = carry_over
+        self.evict_layouts = evict_layouts
+        self.steps_run = 0
+
+    # The constructor arguments of this instance except the collectors, which belong to the process that attached them, as a picklable dict
+    # from which a worker builds an Experiments configured the same way.
+    def options(self):
+        return {
+            'synchronous': self.synchronous,
+            'warmup_steps': self.warmup_steps,
+            'n_step': self.n_step,
+            'trace_lambda': self.trace_lambda,
+            'replay_batch': self.replay_batch,
+            'prioritized_replay': self.prioritized_replay,
+            'backend': self.backend,
+            'layout_change_probability': self.layout_change_probability,
+            'carry_over': self.carry_over,
+            'evict_layouts': self.evict_layouts,
+        }
+
+    # Running one experiment through the engine with its totals collector plus the extra collectors.
+    def run_engine(self, learner, schedule, totals, environment, agents, num_steps, initial_agent_positions, terminal_hooks=()):
+        if self.layout_change_probability > 0:
+            terminal_hooks = list(terminal_hooks) + [RandomLayoutChanges(self.layout_change_probability, carry_over=self.carry_over, evict=self.evict_layouts)]
+        if (self.backend == 'kernel' and type(learner) is QLearner and type(totals) is TotalsCollector and not terminal_hooks
+                and not self.collectors and not self.synchronous):
+            self.steps_run = num_steps
+            return run_q_learning(environment, agents, num_steps, initial_agent_positions, schedule, learner.learning_rate)
+        engine = ExperimentEngine(learner, schedule, terminal_hooks=terminal_hooks, collectors=[totals] + self.collectors, synchronous=self.synchronous)
+        engine.run(environment, agents, num_steps, initial_agent_positions)
+        self.steps_run = engine.steps_run
+        return totals.results()
+
+    # The learning rule of the Q-learning experiments (1, 3 and 4).
+    def q_learner(self, learning_rate):
+        if self.trace_lambda is not None:
+            learner = WatkinsQLambdaLearner(self.trace_lambda, learning_rate)
+        elif self.n_step > 1:
+            learner = NStepQLearner(self.n_step, learning_rate)
+        else:
+            learner = QLearner(learning_rate)
+        if self.replay_batch > 0:
+            learner = ReplayLearner(learner, learning_rate, batch_size=self.replay_batch, prioritized=self.prioritized_replay)
+        return learner
+
+    # The learning rule of the SARSA experiment (2).
+    def sarsa_learner(self):
+        if self.trace_lambda is not None:
+            return SarsaLambdaLearner(self.trace_lambda)
+        return SarsaLearner()
 
-                distance = self.calculate_distance(state[0], next_state[0])
-                total_distances[i] += distance
-
-                # Updating the Q-table based on the observed state-action-reward transition.
-                agent.update_q_table(state, action, reward, next_state, learning_rate)
-
-            # Resetting the environment if it reaches a terminal state.
-            if environment.is_terminal_state():
-                environment.reset(initial_agent_positions)
-
-        return total_rewards, total_distances, total_successes
+    def run_experiment1(self, environment, agents, num_steps, policy, initial_agent_positions):
+        return self.run_engine(self.q_learner(agents[0].learning_rate), PolicySchedule(policy, self.warmup_steps), TotalsCollector(), environment, agents, num_steps, initial_agent_positions)
 
     def run_experiment1a(self, environment, agents, num_steps, initial_agent_positions):
         return self.run_experiment1(environment, agents, num_steps, 'random', initial_agent_positions)
@@ -51,177 +179,70 @@ class Experiments:
         return self.run_experiment1(environment, agents, num_steps, 'exploit', initial_agent_positions)
 
     def run_experiment2(self, environment, agents, num_steps, initial_agent_positions):
-        learning_rate = agents[0].learning_rate
-        discount_factor = agents[0].discount_factor
-        total_rewards = [0] * len(agents)
-        total_successes = [0] * len(agents)
-        total_distances = [0] * len(agents)
-
-        environment.reset_environment(initial_agent_positions)
-
-        # Initialize state and action for each agent
-        states = []
-        actions = []
-        for agent in agents:
-            state = environment.get_state(agent)
-            action = agent.choose_action(environment, 'random')
-            states.append(state)
-            actions.append(action)
-
-        for step in range(num_steps):
-            # Switching between exploration and exploitation phases based on step count.
-            if step < 500:
-                policy_to_use = 'random'
-            else:
-                policy_to_use = 'exploit'
-
-            # Iterating over agents and executing actions.
-            for i, agent in enumerate(agents):
-                state = states[i]
-                action = actions[i]
-                reward = environment.execute_action(agent, action)
-                next_state = environment.get_state(agent)
-
-                # Choose next action using the specified policy
-                next_action = agent.choose_action(environment, policy_to_use)
-
-                # Updating total rewards, successes, and distances.
-                total_rewards[i] += reward
-                if reward > 0:
-                    total_successes[i] += 1
-
-                distance = self.calculate_distance(state[0], next_state[0])
-                total_distances[i] += distance
-
-                # Updating the Q-table based on the observed state-action-reward-next_state-next_action transition.
-                agent.update_q_table_sarsa(state, action, reward, next_state, next_action)
-
-                # Update state and action for the next iteration
-                states[i] = next_state
-                actions[i] = next_action
-
-            # Resetting the environment if it reaches a terminal state.
-            if environment.is_terminal_state():
-                environment.reset(initial_agent_positions)
-                # Reset state and action for each agent
-                states = []
-                actions = []
-                for agent in agents:
-                    state = environment.get_state(agent)
-                    action = agent.choose_action(environment, 'random')
-                    states.append(state)
-                    actions.append(action)
-
-        return total_rewards, total_distances, total_successes
+        return self.run_engine(self.sarsa_learner(), PolicySchedule('exploit', self.warmup_steps), TotalsCollector(), environment, agents, num_steps, initial_agent_positions)
 
     def run_experiment3(self, environment, agents, num_steps, initial_agent_positions, learning_rate):
-        discount_factor = agents[0].discount_factor
-        total_rewards = [0] * len(agents)
-        total_successes = [0] * len(agents)
-        total_distances = [0] * len(agents)
-
-        environment.reset_environment(initial_agent_positions)
-
-        for step in range(num_steps):
-            # Switching between exploration and exploitation phases based on step count.
-            if step < 500:
-                policy_to_use = 'random'
-            else:
-                policy_to_use = 'exploit'
-
-            # Iterating over agents and executing actions.
-            for i, agent in enumerate(agents):
-                state = environment.get_state(agent)
-                action = agent.choose_action(environment, policy_to_use)
-                reward = environment.execute_action(agent, action)
-                next_state = environment.get_state(agent)
-
-                # Updating total rewards, successes, and distances.
-                total_rewards[i] += reward
-                if reward > 0:
-                    total_successes[i] += 1
-
-                distance = self.calculate_distance(state[0], next_state[0])
-                total_distances[i] += distance
-
-                # Updating the Q-table based on the observed state-action-reward transition.
-                agent.update_q_table(state, action, reward, next_state, learning_rate)
-
-            # Resetting the environment if it reaches a terminal state.
-            if environment.is_terminal_state():
-                environment.reset(initial_agent_positions)
-
-        return total_rewards, total_distances, total_successes
+        return self.run_engine(self.q_learner(learning_rate), PolicySchedule('exploit', self.warmup_steps), TotalsCollector(), environment, agents, num_steps, initial_agent_positions)
 
     def run_experiment4(self, environment, agents, num_steps, initial_agent_positions):
-        learning_rate = agents[0].learning_rate
-        discount_factor = agents[0].discount_factor
-        total_rewards_before = [0] * len(agents)
-        total_successes_before = [0] * len(agents)
-        total_distances_before = [0] * len(agents)
-        total_steps_before = 0
-
-        total_rewards_after = [0] * len(agents)
-        total_successes_after = [0] * len(agents)
-        total_distances_after = [0] * len(agents)
-        total_steps_after = 0
-
-        terminal_state_count = 0
-        environment.reset_environment(initial_agent_positions)
-
-        for step in range(num_steps):
-            # Switching between exploration and exploitation phases based on step count.
-            if step < 500:
-                policy_to_use = 'random'
-            else:
-                policy_to_use = 'exploit'
-
-            # Iterating over agents and executing actions.
-            for i, agent in enumerate(agents):
-                state = environment.get_state(agent)
-                action = agent.choose_action(environment, policy_to_use)
-                reward = environment.execute_action(agent, action)
-                next_state = environment.get_state(agent)
-
-                # Updating total rewards, successes, and distances.
-                if terminal_state_count < 3:
-                    total_rewards_before[i] += reward
-                    if reward > 0:
-                        total_successes_before[i] += 1
-                    distance = self.calculate_distance(state[0], next_state[0])
-                    total_distances_before[i] += distance
-                else:
-                    total_rewards_after[i] += reward
-                    if reward > 0:
-                        total_successes_after[i] += 1
-                    distance = self.calculate_distance(state[0], next_state[0])
-                    total_distances_after[i] += distance
-
-                # Updating the Q-table based on the observed state-action-reward transition.
-                agent.update_q_table(state, action, reward, next_state, learning_rate)
-
-            # Updating step counts
-            if terminal_state_count < 3:
-                total_steps_before += 1
-            else:
-                total_steps_after += 1
-
-            # Resetting the environment if it reaches a terminal state.
-            if environment.is_terminal_state():
-                terminal_state_count += 1
-                environment.reset(initial_agent_positions)
-
-                if terminal_state_count == 3:
-                    # Changing pickup locations after reaching the terminal state for the third time.
-                    environment.pickup_locations = [(4, 2), (3, 3), (2, 4)]
-
-                if terminal_state_count == 6:
-                    break
-
-        return (
-            total_rewards_before, total_distances_before, total_successes_before, total_steps_before,
-            total_rewards_after, total_distances_after, total_successes_after, total_steps_after,
-        )
+        # Changing pickup locations after the third terminal state and stopping after the sixth.
+        relocate = RelocatePickups(EXPERIMENT4_PICKUP_LOCATIONS, after=3, stop_after=6, carry_over=self.carry_over, evict=self.evict_layouts)
+        return self.run_engine(self.q_learner(agents[0].learning_rate), PolicySchedule('exploit', self.warmup_steps), PhasedTotalsCollector(split_after=3),
+                               environment, agents, num_steps, initial_agent_positions, terminal_hooks=[relocate])
 
     def calculate_distance(self, position1, position2):
-        return abs(position1[0] - position2[0]) + abs(position1[1] - position2[1]) 
\ No newline at end of file
+        return calculate_distance(position1, position2)
+
+    # Running one experiment spec and returning one row per agent (and per phase for Experiment 4) with totals and per-step rates.
+    def run_spec(self, environment, agents, num_steps, initial_agent_positions, spec):
+        experiment = spec['experiment']
+        if experiment in ('1a', '1b', '1c'):
+            policy = {'1a': 'random', '1b': 'greedy', '1c': 'exploit'}[experiment]
+            phases = [('all',) + self.run_experiment1(environment, agents, num_steps, policy, initial_agent_positions) + (self.steps_run,)]
+        elif experiment == '2':
+            phases = [('all',) + self.run_experiment2(environment, agents, num_steps, initial_agent_positions) + (self.steps_run,)]
+        elif experiment == '3':
+            phases = [('all',) + self.run_experiment3(environment, agents, num_steps, initial_agent_positions, spec['learning_rate']) + (self.steps_run,)]
+        elif experiment == '4':
+            results = self.run_experiment4(environment, agents, num_steps, initial_agent_positions)
+            phases = [('before',) + results[:4], ('after',) + results[4:]]
+        else:
+            raise ValueError(f"Unknown experiment: {experiment}")
+
+        rows = []
+        for phase, total_rewards, total_distances, total_successes, steps in phases:
+            for i in range(len(agents)):
+                rows.append({
+                    'experiment': spec_label(spec),
+                    'phase': phase,
+                    'agent': i + 1,
+                    'steps': steps,
+                    'total_reward': total_rewards[i],
+                    'total_success': total_successes[i],
+                    'total_distance': total_distances[i],
+                    'reward_per_step': total_rewards[i] / steps if steps else np.nan,
+                    'success_per_step': total_successes[i] / steps if steps else np.nan,
+                    'distance_per_step': total_distances[i] / steps if steps else np.nan,
+                })
+        return rows
+
+    # Running every seed in its own worker process (the whole list of specs, in order, on one world per seed, with this instance's options)
+    # and returning one DataFrame with a row per seed, spec and agent.
+    def run_seeds(self, seeds, specs=DEFAULT_SPECS, num_steps=9000, world=DEFAULT_WORLD, max_workers=None):
+        rows = []
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(run_seed, seed, specs, num_steps, world, self.options()) for seed in seeds]
+            for future in futures:
+                rows.extend(future.result())
+        return pd.DataFrame(rows)
+
+    # Aggregating per-seed results into mean, standard deviation and a normal-approximation confidence interval per experiment, phase and agent.
+    def aggregate_seed_results(self, results, z=1.96):
+        metrics = ['total_reward', 'total_success', 'total_distance', 'reward_per_step', 'success_per_step', 'distance_per_step']
+        grouped = results.groupby(['experiment', 'phase', 'agent'], sort=False)[metrics]
+        mean = grouped.mean()
+        half_width = z * grouped.std(ddof=1).fillna(0.0) / np.sqrt(grouped.count())
+        table = pd.concat({'mean': mean, 'ci_low': mean - half_width, 'ci_high': mean + half_width}, axis=1)
+        table = table.swaplevel(axis=1).reindex(columns=metrics, level=0)
+        table.insert(0, ('seeds', ''), grouped.size())
+        return table
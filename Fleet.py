@@ -0,0 +1,26 @@
+import json
+import numpy as np
+
+# Drawing num_agents distinct start positions uniformly from the free cells of the environment: never an obstacle, a pickup or dropoff
+# location, an agent's current cell or one of the taken positions. Uses the global NumPy RNG, so a seeded run places the same fleet.
+def spawn_positions(environment, num_agents, taken=()):
+    blocked = set(map(tuple, environment.obstacles)) | environment.pickup_cells | environment.dropoff_cells | set(map(tuple, taken))
+    blocked.update(agent.position for agent in environment.agents)
+    free = [position for position in environment.cell_positions if position not in blocked]
+    if num_agents > len(free):
+        raise ValueError(f"Cannot place {num_agents} agents on the {len(free)} free cells of a {environment.grid_size[0]}x{environment.grid_size[1]} grid")
+    return [free[index] for index in np.random.permutation(len(free))[:num_agents]]
+
+# Reading a world description (see Experiments.DEFAULT_WORLD) from a JSON file. Locations are [row, column] lists; per-site capacities
+# are given as [row, column, count] lists, and num_agents asks for that many agents, the ones without initial_agent_positions placed at random.
+def load_world(path):
+    with open(path) as f:
+        world = json.load(f)
+    world['grid_size'] = tuple(world['grid_size'])
+    for name in ('pickup_locations', 'dropoff_locations', 'initial_agent_positions', 'obstacles'):
+        if name in world:
+            world[name] = [tuple(location) for location in world[name]]
+    for name in ('pickup_capacity', 'dropoff_capacity'):
+        if isinstance(world.get(name), list):
+            world[name] = {(x, y): count for x, y, count in world[name]}
+    return world
@@ -0,0 +1,201 @@
+import numpy as np
+from Environment import PICKUP, DROPOFF, PICKUP_BIT, DROPOFF_BIT
+from Policy import RandomStream, policy_epsilon
+
+# Numba is optional: without it the kernels run as plain Python (same results, interpreter speed).
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda function: function
+
+# Running a chunk of steps of one-step Q-learning with every agent moving in turn, on the array-encoded world of run_q_learning.
+# Mirrors ExperimentEngine + QLearner + TotalsCollector operation by operation (the same epsilon-greedy choice as Policy.select_action
+# from the same pre-drawn uniforms, the same Q-update formula), so the results are bit-for-bit those of the reference loop.
+# dropoff_capacity holds the capacity of every dropoff location (by dropoff index) and pickup_stock the blocks of every pickup cell.
+@njit(cache=True)
+def q_learning_chunk(num_steps, epsilons, uniforms, learning_rate, discount_factors, q_values, visited, table_of, layout_offset,
+                     next_cell, move_masks, pickup, dropoff_index, grid, dropoff_counts, dropoff_capacity, occupancy, cells, carrying,
+                     initial_cells, pickup_cells, pickup_stock, columns, frequencies, total_rewards, total_distances, total_successes):
+    num_agents = cells.shape[0]
+    num_actions = q_values.shape[2]
+    for step in range(num_steps):
+        for i in range(num_agents):
+            table = table_of[i]
+            cell = cells[i]
+            carried = carrying[i]
+            state = layout_offset + cell * 2 + carried
+            visited[table, state] = True
+
+            # Available actions, as in Environment.get_action_mask.
+            mask = move_masks[cell]
+            if carried:
+                index = dropoff_index[cell]
+                if index >= 0 and dropoff_counts[index] < dropoff_capacity[index]:
+                    mask |= DROPOFF_BIT
+            elif grid[cell] > 0:
+                mask |= PICKUP_BIT
+
+            # Epsilon-greedy choice, as in Policy.select_action.
+            explore = uniforms[i, 2 * step]
+            pick = uniforms[i, 2 * step + 1]
+            count = 0
+            for action in range(num_actions):
+                if (mask >> action) & 1:
+                    count += 1
+            greedy = explore >= epsilons[step, i] and count > 1
+            best = -np.inf
+            if greedy:
+                for action in range(num_actions):
+                    if (mask >> action) & 1 and q_values[table, state, action] > best:
+                        best = q_values[table, state, action]
+                count = 0
+                for action in range(num_actions):
+                    if (mask >> action) & 1 and q_values[table, state, action] == best:
+                        count += 1
+            remaining = int(pick * count)
+            chosen = 0
+            for action in range(num_actions):
+                if (mask >> action) & 1 and (not greedy or q_values[table, state, action] == best):
+                    if remaining == 0:
+                        chosen = action
+                        break
+                    remaining -= 1
+
+            # Executing the action, as in Environment.execute_action.
+            new_cell = next_cell[cell, chosen]
+            if new_cell != cell and occupancy[new_cell] == 0:
+                occupancy[cell] -= 1
+                occupancy[new_cell] += 1
+                cells[i] = new_cell
+            if chosen == PICKUP and grid[cell] > 0 and not carried:
+                grid[cell] -= 1
+                carrying[i] = True
+            elif chosen == DROPOFF and carried:
+                index = dropoff_index[cell]
+                if index >= 0 and dropoff_counts[index] < dropoff_capacity[index]:
+                    carrying[i] = False
+                    dropoff_counts[index] += 1
+            new_cell = cells[i]
+            frequencies[i, new_cell] += 1
+
+            # Reward, as in Environment.calculate_reward.
+            reward = 0.0
+            if carrying[i]:
+                index = dropoff_index[new_cell]
+                if index >= 0 and dropoff_counts[index] < dropoff_capacity[index]:
+                    reward = 10.0
+            elif pickup[new_cell] and grid[new_cell] > 0:
+                reward = 1.0
+
+            # Q-learning update, as in Agent.update_q_table.
+            next_state = layout_offset + new_cell * 2 + carrying[i]
+            visited[table, next_state] = True
+            old_value = q_values[table, state, chosen]
+            next_max = q_values[table, next_state, 0]
+            for action in range(1, num_actions):
+                if q_values[table, next_state, action] > next_max:
+                    next_max = q_values[table, next_state, action]
+            q_values[table, state, chosen] = (1 - learning_rate) * old_value + learning_rate * (reward + discount_factors[i] * next_max)
+
+            total_rewards[i] += reward
+            if reward > 0:
+                total_successes[i] += 1
+            total_distances[i] += abs(cell // columns - new_cell // columns) + abs(cell % columns - new_cell % columns)
+
+        # Resetting the world once every dropoff location is full, as in Environment.reset.
+        terminal = True
+        for index in range(dropoff_counts.shape[0]):
+            if dropoff_counts[index] != dropoff_capacity[index]:
+                terminal = False
+        if terminal:
+            grid[:] = 0
+            for k in range(pickup_cells.shape[0]):
+                grid[pickup_cells[k]] = pickup_stock[k]
+            occupancy[:] = 0
+            for i in range(num_agents):
+                cells[i] = initial_cells[i]
+                carrying[i] = False
+                occupancy[cells[i]] += 1
+            dropoff_counts[:] = 0
+
+# Running num_steps steps of one-step Q-learning for the agents in the environment's current layout with the compiled kernel, in chunks
+# of chunk_size steps, and writing the world, the agents and their Q-tables back afterwards. Equivalent to
+# ExperimentEngine(QLearner(learning_rate), schedule, collectors=[TotalsCollector()]).run(...) for the same seed, without terminal hooks
+# or further collectors. Returns the total rewards, distances and successes per agent, like TotalsCollector.results.
+def run_q_learning(environment, agents, num_steps, initial_agent_positions, schedule, learning_rate, chunk_size=4096):
+    environment.reset_environment(initial_agent_positions)
+    num_agents = len(agents)
+    columns = environment.grid_size[1]
+    num_states = environment.layout_offset + environment.states_per_layout
+
+    # Q-tables shared by several agents are stacked once, so their updates stay shared.
+    tables = []
+    table_of = np.zeros(num_agents, dtype=np.int64)
+    for i, agent in enumerate(agents):
+        for k, table in enumerate(tables):
+            if table is agent.q_table:
+                table_of[i] = k
+                break
+        else:
+            table_of[i] = len(tables)
+            tables.append(agent.q_table)
+    for table in tables:
+        table.reserve(num_states)
+    q_values = np.stack([table.values[:num_states] for table in tables])
+    visited = np.stack([table.visited[:num_states] for table in tables])
+
+    # The world as flat per-cell arrays, with the obstacles already folded into next_cell and the move masks.
+    next_cell = np.ascontiguousarray(environment.next_cell, dtype=np.int64)
+    move_masks = np.array(environment.move_mask_list, dtype=np.int64)
+    pickup = np.zeros(environment.num_cells, dtype=np.bool_)
+    pickup_cells = np.array([environment.cell_of(location) for location in environment.pickup_locations], dtype=np.int64)
+    pickup[pickup_cells] = True
+    pickup_stock = environment.stock.ravel()[pickup_cells]
+    dropoff_index = np.full(environment.num_cells, -1, dtype=np.int64)
+    for index, location in enumerate(environment.dropoff_locations):
+        dropoff_index[environment.cell_of(location)] = index
+    grid = environment.grid.ravel().astype(np.int64)
+    dropoff_counts = np.array([environment.dropoff_counts[location] for location in environment.dropoff_locations], dtype=np.int64)
+    dropoff_capacity = np.array([environment.dropoff_limits[location] for location in environment.dropoff_locations], dtype=np.int64)
+    occupancy = np.array(environment.occupancy, dtype=np.int64)
+    cells = np.array([environment.cell_of(agent.position) for agent in agents], dtype=np.int64)
+    carrying = np.array([agent.carrying_block for agent in agents], dtype=np.bool_)
+    initial_cells = np.array([environment.cell_of(position) for position in initial_agent_positions], dtype=np.int64)
+    frequencies = np.stack([agent.position_frequency.ravel() for agent in agents])
+    discount_factors = np.array([agent.discount_factor for agent in agents], dtype=np.float64)
+    total_rewards = np.zeros(num_agents)
+    total_distances = np.zeros(num_agents, dtype=np.int64)
+    total_successes = np.zeros(num_agents, dtype=np.int64)
+
+    # Random streams are created in agent order, as the first steps of the reference loop would.
+    for agent in agents:
+        if agent.random is None:
+            agent.random = RandomStream()
+
+    for start in range(0, num_steps, chunk_size):
+        steps = min(chunk_size, num_steps - start)
+        epsilons = np.array([[policy_epsilon(schedule(step), agent.exploit_probability) for agent in agents]
+                             for step in range(start, start + steps)], dtype=np.float64)
+        uniforms = np.stack([agent.random.reserve(2 * steps) for agent in agents])
+        q_learning_chunk(steps, epsilons, uniforms, float(learning_rate), discount_factors, q_values, visited, table_of,
+                         environment.layout_offset, next_cell, move_masks, pickup, dropoff_index, grid, dropoff_counts,
+                         dropoff_capacity, occupancy, cells, carrying, initial_cells, pickup_cells,
+                         pickup_stock, columns, frequencies, total_rewards, total_distances, total_successes)
+
+    for k, table in enumerate(tables):
+        table.values[:num_states] = q_values[k]
+        table.visited[:num_states] = visited[k]
+    environment.grid = grid.reshape(environment.grid_size)
+    environment.dropoff_counts = {location: int(dropoff_counts[index]) for index, location in enumerate(environment.dropoff_locations)}
+    for i, agent in enumerate(agents):
+        agent.position = environment.cell_positions[cells[i]]
+        agent.carrying_block = bool(carrying[i])
+        agent.position_frequency = frequencies[i].reshape(environment.grid_size)
+    environment.rebuild_occupancy()
+    return total_rewards.tolist(), total_distances.tolist(), total_successes.tolist()
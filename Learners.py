@@ -0,0 +1,269 @@
+from collections import deque
+import numpy as np
+from Environment import ACTION_INDEX
+
+class QLearner:
+    def __init__(self, learning_rate):
+        # Initializing the one-step Q-learning rule with the learning rate used for every update.
+        self.learning_rate = learning_rate
+
+    # Nothing to prepare at the start of a run or after a terminal reset.
+    def reset(self, environment, agents):
+        pass
+
+    # Nothing is pending at a terminal state or at the end of a run.
+    def flush(self, agents):
+        pass
+
+    # Choosing and executing an action for agent i, then updating its Q-table from the observed transition.
+    # Returns the transition and the change of the updated Q-value.
+    def act(self, i, agent, environment, policy):
+        state = environment.get_state(agent)
+        action = agent.choose_action(environment, policy)
+        reward = environment.execute_action(agent, action)
+        next_state = environment.get_state(agent)
+        delta = agent.update_q_table(state, action, reward, next_state, self.learning_rate)
+        return state, action, reward, next_state, delta
+
+    # Synchronous variant of act: every agent chooses from the same snapshot, the actions are applied as one step, then every agent updates.
+    # Returns one transition per agent, in agent order.
+    def act_synchronous(self, agents, environment, policy):
+        states = [environment.get_state(agent) for agent in agents]
+        actions = [agent.choose_action(environment, policy) for agent in agents]
+        rewards = environment.step_synchronous(actions)
+        transitions = []
+        for agent, state, action, reward in zip(agents, states, actions, rewards):
+            next_state = environment.get_state(agent)
+            delta = agent.update_q_table(state, action, reward, next_state, self.learning_rate)
+            transitions.append((state, action, reward, next_state, delta))
+        return transitions
+
+
+class SarsaLearner:
+    def __init__(self, initial_policy='random'):
+        # Initializing the SARSA rule; the first action of every episode is chosen with initial_policy.
+        self.initial_policy = initial_policy
+        self.states = []
+        self.actions = []
+
+    # The pending actions are replaced at the reset.
+    def flush(self, agents):
+        pass
+
+    # Choosing the first state and action of every agent at the start of a run and after a terminal reset.
+    def reset(self, environment, agents):
+        self.states = []
+        self.actions = []
+        for agent in agents:
+            self.states.append(environment.get_state(agent))
+            self.actions.append(agent.choose_action(environment, self.initial_policy))
+
+    # Executing agent i's pending action, choosing its next action with the policy and applying the SARSA update.
+    def act(self, i, agent, environment, policy):
+        state = self.states[i]
+        action = self.actions[i]
+        reward = environment.execute_action(agent, action)
+        next_state = environment.get_state(agent)
+        next_action = agent.choose_action(environment, policy)
+        delta = agent.update_q_table_sarsa(state, action, reward, next_state, next_action)
+        self.states[i] = next_state
+        self.actions[i] = next_action
+        return state, action, reward, next_state, delta
+
+    # Synchronous variant of act: the pending actions of all agents are applied as one step, then every agent chooses its next action
+    # from the resulting snapshot and applies the SARSA update. Returns one transition per agent, in agent order.
+    def act_synchronous(self, agents, environment, policy):
+        rewards = environment.step_synchronous(self.actions)
+        next_states = [environment.get_state(agent) for agent in agents]
+        next_actions = [agent.choose_action(environment, policy) for agent in agents]
+        transitions = []
+        for i, agent in enumerate(agents):
+            delta = agent.update_q_table_sarsa(self.states[i], self.actions[i], rewards[i], next_states[i], next_actions[i])
+            transitions.append((self.states[i], self.actions[i], rewards[i], next_states[i], delta))
+        self.states = next_states
+        self.actions = next_actions
+        return transitions
+
+
+class NStepQLearner:
+    def __init__(self, n, learning_rate):
+        # Initializing n-step Q-learning: every update uses the discounted rewards of the next n steps plus the discounted best
+        # Q-value of the state reached after them, so rewards propagate n states back per update. n=1 is one-step Q-learning.
+        self.n = n
+        self.learning_rate = learning_rate
+        self.pending = []
+
+    # Flushing the transitions still waiting for their n-step return (with the shorter return available) and starting new windows.
+    def reset(self, environment, agents):
+        self.flush(agents)
+        self.pending = [deque() for _ in agents]
+
+    # Updating every transition still waiting for its n-step return with the shorter return available, at a terminal state (before the
+    # reset, so no return runs into the next episode) and at the end of a run.
+    def flush(self, agents):
+        if len(self.pending) == len(agents):
+            for agent, pending in zip(agents, self.pending):
+                while pending:
+                    self.update(agent, pending, pending[-1][3])
+
+    def act(self, i, agent, environment, policy):
+        state = environment.get_state(agent)
+        action = agent.choose_action(environment, policy)
+        reward = environment.execute_action(agent, action)
+        next_state = environment.get_state(agent)
+        delta = self.learn(agent, self.pending[i], state, action, reward, next_state)
+        return state, action, reward, next_state, delta
+
+    def act_synchronous(self, agents, environment, policy):
+        states = [environment.get_state(agent) for agent in agents]
+        actions = [agent.choose_action(environment, policy) for agent in agents]
+        rewards = environment.step_synchronous(actions)
+        transitions = []
+        for agent, pending, state, action, reward in zip(agents, self.pending, states, actions, rewards):
+            next_state = environment.get_state(agent)
+            delta = self.learn(agent, pending, state, action, reward, next_state)
+            transitions.append((state, action, reward, next_state, delta))
+        return transitions
+
+    # Adding a transition to the agent's window and, once the window holds n transitions, updating its oldest one.
+    # Returns the change of the updated Q-value (0.0 while the window is filling).
+    def learn(self, agent, pending, state, action, reward, next_state):
+        pending.append((state, action, reward, next_state))
+        if len(pending) < self.n:
+            return 0.0
+        return self.update(agent, pending, next_state)
+
+    # Updating the oldest transition of the window towards its return up to next_state, then dropping it from the window.
+    def update(self, agent, pending, next_state):
+        target = 0.0
+        discount = 1.0
+        for _, _, reward, _ in pending:
+            target += discount * reward
+            discount *= agent.discount_factor
+        target += discount * agent.q_table.row(next_state).max()
+        state, action, _, _ = pending.popleft()
+        return agent.update_q_value(state, action, target, self.learning_rate)
+
+
+class EligibilityTraces:
+    def __init__(self, capacity=256, min_trace=1e-3):
+        # Replacing eligibility traces of one agent, kept as parallel (row, column, trace) arrays of fixed capacity. Traces that decay
+        # below min_trace are dropped, so only the last few state-actions are ever updated and the cost per step stays bounded.
+        self.rows = np.zeros(capacity, dtype=np.int64)
+        self.columns = np.zeros(capacity, dtype=np.int64)
+        self.traces = np.zeros(capacity)
+        self.min_trace = min_trace
+        self.count = 0
+
+    # Setting the trace of a state-action to 1 (replacing, not accumulating). When full, the weakest trace makes room.
+    def replace(self, row, column):
+        count = self.count
+        match = np.flatnonzero((self.rows[:count] == row) & (self.columns[:count] == column))
+        if match.size:
+            slot = match[0]
+        elif count < self.traces.shape[0]:
+            slot = count
+            self.count += 1
+        else:
+            slot = self.traces.argmin()
+        self.rows[slot] = row
+        self.columns[slot] = column
+        self.traces[slot] = 1.0
+
+    # Adding step times each trace to the traced Q-values (every traced state-action appears once).
+    def apply(self, q_values, step):
+        count = self.count
+        q_values[self.rows[:count], self.columns[:count]] += step * self.traces[:count]
+
+    # Multiplying all traces by factor and dropping the ones that fell below min_trace.
+    def decay(self, factor):
+        count = self.count
+        self.traces[:count] *= factor
+        keep = np.flatnonzero(self.traces[:count] >= self.min_trace)
+        if keep.size < count:
+            self.count = keep.size
+            self.rows[:keep.size] = self.rows[keep]
+            self.columns[:keep.size] = self.columns[keep]
+            self.traces[:keep.size] = self.traces[keep]
+
+    def clear(self):
+        self.count = 0
+
+
+class SarsaLambdaLearner:
+    def __init__(self, trace_lambda, learning_rate=None, initial_policy='random', min_trace=1e-3, max_traces=256):
+        # Initializing SARSA(lambda) with replacing traces: every TD error updates all recently visited state-actions, weighted by traces
+        # that decay by discount_factor * trace_lambda per step. Without a learning rate the agent's own is used, as in SarsaLearner.
+        self.trace_lambda = trace_lambda
+        self.learning_rate = learning_rate
+        self.initial_policy = initial_policy
+        self.min_trace = min_trace
+        self.max_traces = max_traces
+        self.states = []
+        self.actions = []
+        self.traces = []
+
+    # The traces are cleared at the reset.
+    def flush(self, agents):
+        pass
+
+    # Choosing the first state and action of every agent and clearing the traces at the start of a run and after a terminal reset.
+    def reset(self, environment, agents):
+        self.states = [environment.get_state(agent) for agent in agents]
+        self.actions = [agent.choose_action(environment, self.initial_policy) for agent in agents]
+        self.traces = [EligibilityTraces(self.max_traces, self.min_trace) for _ in agents]
+
+    def act(self, i, agent, environment, policy):
+        state = self.states[i]
+        action = self.actions[i]
+        reward = environment.execute_action(agent, action)
+        next_state = environment.get_state(agent)
+        next_action = agent.choose_action(environment, policy)
+        delta = self.learn(agent, self.traces[i], state, action, reward, next_state, next_action)
+        self.states[i] = next_state
+        self.actions[i] = next_action
+        return state, action, reward, next_state, delta
+
+    def act_synchronous(self, agents, environment, policy):
+        rewards = environment.step_synchronous(self.actions)
+        next_states = [environment.get_state(agent) for agent in agents]
+        next_actions = [agent.choose_action(environment, policy) for agent in agents]
+        transitions = []
+        for i, agent in enumerate(agents):
+            delta = self.learn(agent, self.traces[i], self.states[i], self.actions[i], rewards[i], next_states[i], next_actions[i])
+            transitions.append((self.states[i], self.actions[i], rewards[i], next_states[i], delta))
+        self.states = next_states
+        self.actions = next_actions
+        return transitions
+
+    # Applying the TD error of one transition to every traced state-action; returns the change of the Q-value of (state, action).
+    def learn(self, agent, traces, state, action, reward, next_state, next_action):
+        q_table = agent.q_table
+        row = q_table.index(state)
+        next_row = q_table.index(next_state)
+        q_values = q_table.values  # Fetched after indexing since allocating new rows may grow the array.
+        column = ACTION_INDEX[action]
+        next_column = ACTION_INDEX[next_action]
+        next_value, keep_traces = self.bootstrap(q_values[next_row], next_column)
+
+        old_value = q_values[row, column]
+        error = reward + agent.discount_factor * next_value - old_value
+        traces.replace(row, column)
+        traces.apply(q_values, (self.learning_rate or agent.learning_rate) * error)
+        if keep_traces:
+            traces.decay(agent.discount_factor * self.trace_lambda)
+        else:
+            traces.clear()
+        return q_values[row, column] - old_value
+
+    # Value bootstrapped from the next state and whether the traces survive the step: SARSA follows the action actually chosen.
+    def bootstrap(self, next_q_values, next_column):
+        return next_q_values[next_column], True
+
+
+class WatkinsQLambdaLearner(SarsaLambdaLearner):
+    # Watkins's Q(lambda): bootstraps from the best next Q-value like Q-learning and, since the traces only follow greedy behaviour,
+    # cuts them whenever the chosen next action is exploratory (not among the best ones).
+    def bootstrap(self, next_q_values, next_column):
+        best = next_q_values.max()
+        return best, next_q_values[next_column] == best
@@ -0,0 +1,240 @@
+from collections import deque
+import numpy as np
+import pandas as pd
+from Engine import Collector
+from Environment import ACTION_INDEX, PICKUP
+
+class MetricsCollector(Collector):
+    def __init__(self, window=100, sample_every=100):
+        # Keeping windowed statistics over the last `window` steps, updated in O(1) per step, and sampling a learning-curve row every
+        # `sample_every` steps. Rows of every run the collector is attached to are kept, with a run number, and exported once.
+        self.window = window
+        self.sample_every = sample_every
+        self.rows = []
+        self.episode_rows = []
+        self.run = -1
+
+    def start(self, agents):
+        self.run += 1
+        self.num_agents = len(agents)
+        self.cumulative_rewards = np.zeros(self.num_agents)
+        self.cumulative_successes = np.zeros(self.num_agents, dtype=int)
+        # Ring buffers of per-step totals, with running sums so the windowed means never rescan the window.
+        self.reward_window = np.zeros(self.window)
+        self.delta_window = np.zeros(self.window)
+        self.reward_sum = 0.0
+        self.delta_sum = 0.0
+        self.step_reward = 0.0
+        self.step_delta = 0.0
+        self.steps_seen = 0
+        self.episodes = 0
+        self.episode_start = 0
+        self.last_episode_length = np.nan
+
+    def collect(self, step, i, agent, state, action, reward, next_state, distance, delta):
+        self.cumulative_rewards[i] += reward
+        if reward > 0:
+            self.cumulative_successes[i] += 1
+        self.step_reward += reward
+        delta = abs(delta)
+        if delta > self.step_delta:
+            self.step_delta = delta
+
+    def end_step(self, step):
+        slot = self.steps_seen % self.window
+        self.reward_sum += self.step_reward - self.reward_window[slot]
+        self.delta_sum += self.step_delta - self.delta_window[slot]
+        self.reward_window[slot] = self.step_reward
+        self.delta_window[slot] = self.step_delta
+        self.step_reward = 0.0
+        self.step_delta = 0.0
+        self.steps_seen += 1
+        if self.steps_seen % self.sample_every == 0:
+            self.sample(step)
+        return False
+
+    def on_terminal(self, terminal_count):
+        self.last_episode_length = self.steps_seen - self.episode_start
+        self.episode_start = self.steps_seen
+        self.episodes = terminal_count
+        self.episode_rows.append((self.run, terminal_count, self.steps_seen, self.last_episode_length))
+
+    # Appending one learning-curve row: windowed reward rate and Q-update size, episode statistics and cumulative per-agent totals.
+    def sample(self, step):
+        filled = min(self.steps_seen, self.window)
+        row = {
+            'run': self.run,
+            'step': step + 1,
+            'reward_rate': self.reward_sum / filled,
+            'mean_max_abs_q_delta': self.delta_sum / filled,
+            'max_abs_q_delta': self.delta_window[:filled].max(),  # O(window) every sample_every steps, so O(1) amortized when sample_every >= window.
+            'episodes': self.episodes,
+            'last_episode_length': self.last_episode_length,
+        }
+        for i in range(self.num_agents):
+            row[f'agent_{i + 1}_reward'] = self.cumulative_rewards[i]
+            row[f'agent_{i + 1}_success'] = self.cumulative_successes[i]
+        self.rows.append(row)
+
+    # Learning curve of every run as one DataFrame.
+    def to_dataframe(self):
+        return pd.DataFrame(self.rows)
+
+    # Length (in steps) of every completed episode as one DataFrame.
+    def episodes_dataframe(self):
+        return pd.DataFrame(self.episode_rows, columns=['run', 'episode', 'step', 'length'])
+
+    # Writing the learning curve to a Parquet file (needs pyarrow or fastparquet) or, for any other extension, a CSV file.
+    def export(self, path):
+        frame = self.to_dataframe()
+        if path.endswith('.parquet'):
+            frame.to_parquet(path, index=False)
+        else:
+            frame.to_csv(path, index=False)
+
+
+class ConvergenceMonitor(Collector):
+    def __init__(self, tolerance=1e-3, window=500, criterion='max', episode_tolerance=None, episodes=3, min_steps=0):
+        # Stopping the run once the largest (criterion='max') or mean (criterion='mean') absolute Q-update over the last `window` steps is at most
+        # `tolerance`. With episode_tolerance, the lengths of the last `episodes` episodes must also lie within that fraction of their mean.
+        # No check happens before min_steps steps (e.g. during the random warmup).
+        if criterion not in ('max', 'mean'):
+            raise ValueError(f"Unknown convergence criterion: {criterion}")
+        self.tolerance = tolerance
+        self.window = window
+        self.criterion = criterion
+        self.episode_tolerance = episode_tolerance
+        self.episodes = episodes
+        self.min_steps = min_steps
+        self.converged_step = None
+
+    def start(self, agents):
+        self.deltas = np.zeros(self.window)
+        self.delta_sum = 0.0
+        self.window_max = deque()  # Monotonically decreasing (step, delta) pairs: the window maximum is always at the front.
+        self.step_delta = 0.0
+        self.steps_seen = 0
+        self.episode_start = 0
+        self.episode_lengths = deque(maxlen=self.episodes)
+        self.converged_step = None
+
+    def collect(self, step, i, agent, state, action, reward, next_state, distance, delta):
+        delta = abs(delta)
+        if delta > self.step_delta:
+            self.step_delta = delta
+
+    def end_step(self, step):
+        delta = self.step_delta
+        self.step_delta = 0.0
+        slot = self.steps_seen % self.window
+        self.delta_sum += delta - self.deltas[slot]
+        self.deltas[slot] = delta
+        while self.window_max and self.window_max[-1][1] <= delta:
+            self.window_max.pop()
+        self.window_max.append((self.steps_seen, delta))
+        if self.window_max[0][0] <= self.steps_seen - self.window:
+            self.window_max.popleft()
+        self.steps_seen += 1
+
+        if self.steps_seen < max(self.window, self.min_steps) or not self.episodes_stable():
+            return False
+        if self.criterion == 'max':
+            size = self.window_max[0][1]
+        else:
+            size = self.delta_sum / self.window
+        if size <= self.tolerance:
+            self.converged_step = step + 1
+            return True
+        return False
+
+    def on_terminal(self, terminal_count):
+        self.episode_lengths.append(self.steps_seen - self.episode_start)
+        self.episode_start = self.steps_seen
+
+    # Checking that the recent episode lengths are stable (always true when episode stability is not required).
+    def episodes_stable(self):
+        if self.episode_tolerance is None:
+            return True
+        if len(self.episode_lengths) < self.episodes:
+            return False
+        lengths = np.array(self.episode_lengths)
+        return lengths.max() - lengths.min() <= self.episode_tolerance * lengths.mean()
+
+
+class FleetMetrics(Collector):
+    def __init__(self):
+        # Keeping per-agent totals as NumPy arrays (one entry per agent) rather than per-agent objects, and one fleet-level summary row per run
+        # that compares across fleet sizes: throughput (deliveries per step), reward per agent-step, the share of moves blocked by other
+        # agents or walls, and Jain's fairness index of the agents' rewards.
+        self.rows = []
+        self.run = -1
+
+    def start(self, agents):
+        self.run += 1
+        num_agents = len(agents)
+        self.rewards = np.zeros(num_agents)
+        self.successes = np.zeros(num_agents, dtype=int)
+        self.deliveries = np.zeros(num_agents, dtype=int)
+        self.distances = np.zeros(num_agents, dtype=int)
+        self.moves = np.zeros(num_agents, dtype=int)
+        self.blocked = np.zeros(num_agents, dtype=int)
+        self.steps = 0
+        self.episodes = 0
+
+    def collect(self, step, i, agent, state, action, reward, next_state, distance, delta):
+        self.rewards[i] += reward
+        if reward > 0:
+            self.successes[i] += 1
+        self.distances[i] += distance
+        if ACTION_INDEX[action] < PICKUP:
+            self.moves[i] += 1
+            if distance == 0:
+                self.blocked[i] += 1
+        elif state % 2 and not next_state % 2:  # The carrying bit of the state was cleared by a dropoff.
+            self.deliveries[i] += 1
+
+    def end_step(self, step):
+        self.steps += 1
+        return False
+
+    def on_terminal(self, terminal_count):
+        self.episodes = terminal_count
+
+    def finish(self):
+        self.rows.append(self.summary())
+
+    # Fleet-level statistics of the current run.
+    def summary(self):
+        num_agents = len(self.rewards)
+        steps = max(self.steps, 1)
+        reward_rates = self.rewards / steps
+        squares = (self.rewards ** 2).sum()
+        return {
+            'run': self.run,
+            'agents': num_agents,
+            'steps': self.steps,
+            'episodes': self.episodes,
+            'total_reward': float(self.rewards.sum()),
+            'deliveries': int(self.deliveries.sum()),
+            'deliveries_per_step': float(self.deliveries.sum() / steps),
+            'reward_per_agent_step': float(reward_rates.mean()),
+            'reward_rate_std': float(reward_rates.std()),
+            'blocked_rate': float(self.blocked.sum() / max(self.moves.sum(), 1)),
+            'fairness': float(self.rewards.sum() ** 2 / (num_agents * squares)) if squares > 0 else 1.0,
+        }
+
+    # Per-agent totals of the current run, one row per agent.
+    def agent_dataframe(self):
+        return pd.DataFrame({
+            'agent': np.arange(1, len(self.rewards) + 1),
+            'reward': self.rewards,
+            'successes': self.successes,
+            'deliveries': self.deliveries,
+            'distance': self.distances,
+            'blocked_moves': self.blocked,
+            'reward_per_step': self.rewards / max(self.steps, 1),
+        })
+
+    # Fleet-level summary of every finished run as one DataFrame.
+    def to_dataframe(self):
+        return pd.DataFrame(self.rows)
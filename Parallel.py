@@ -0,0 +1,112 @@
+import argparse
+import multiprocessing
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+import numpy as np
+import pandas as pd
+from Engine import Collector
+from Experiments import Experiments, DEFAULT_WORLD, build_world
+from QTable import SharedQTable, share_q_table
+
+PARALLEL_MODES = ('hogwild', 'sync')
+
+# Lock guarding the merges of the 'sync' mode, handed to every worker process by the pool initializer.
+_lock = None
+
+def _init_worker(lock):
+    global _lock
+    _lock = lock
+
+
+class QTableSync(Collector):
+    def __init__(self, shared, local, every=500, lock=None, weight=1.0):
+        # Periodically merging a worker's private Q-table into the shared one: every `every` steps (and at the end of the run) the changes
+        # made since the last merge, scaled by weight, are added to the shared table under the lock, and the worker continues from the merged values.
+        # With weight = 1 / number of workers the shared table moves by the average of the workers' changes (model averaging), which keeps
+        # the workers from overshooting when they all update the same states.
+        self.shared = shared
+        self.local = local
+        self.every = every
+        self.lock = lock
+        self.weight = weight
+        self.base = local.values.copy()
+
+    def end_step(self, step):
+        if (step + 1) % self.every == 0:
+            self.sync()
+        return False
+
+    def finish(self):
+        self.sync()
+
+    # Merging the local changes into the shared table and pulling the other workers' changes back. The local table grows when the worker
+    # reaches a layout the shared table has no room for, and then the two cannot be merged.
+    def sync(self):
+        if self.local.values.shape != self.shared.values.shape or self.base.shape != self.shared.values.shape:
+            raise ValueError(f"The local Q-table has {len(self.local.values)} states but the shared Q-table {len(self.shared.values)}; "
+                             f"size the shared table for every layout the workers reach")
+        with self.lock if self.lock is not None else nullcontext():
+            self.shared.values += self.weight * (self.local.values - self.base)
+            self.shared.visited |= self.local.visited
+            self.local.values[:] = self.shared.values  # In place, so the agents keep using the same table.
+            self.local.visited[:] = self.shared.visited
+        self.base[:] = self.local.values
+
+
+# Running one worker: a fresh copy of the world whose agents all learn the shared table, directly ('hogwild': lock-free, possibly
+# losing concurrent updates) or through a private copy merged every sync_every steps ('sync'). Returns one row per agent (and phase).
+def run_worker(worker, seed, q_table, spec, num_steps, world, mode, sync_every, sync_weight=1.0):
+    np.random.seed(seed)
+    random.seed(seed)
+    environment, agents, initial_agent_positions = build_world(world)
+    collectors = []
+    if mode == 'hogwild':
+        share_q_table(agents, q_table)
+    else:
+        local = share_q_table(agents, q_table.copy())
+        collectors.append(QTableSync(q_table, local, sync_every, _lock, sync_weight))
+    rows = Experiments(collectors).run_spec(environment, agents, num_steps, initial_agent_positions, spec)
+    for row in rows:
+        row['worker'] = worker
+        row['seed'] = seed
+    return rows
+
+# Running one worker process per seed, all learning a single Q-table in shared memory (room for max_layouts layouts of the world).
+# Returns a private copy of the learned Q-table and a DataFrame with the results of every worker.
+def run_parallel(seeds, spec={'experiment': '1c'}, num_steps=9000, world=DEFAULT_WORLD, mode='hogwild', sync_every=500, max_layouts=2, max_workers=None):
+    if mode not in PARALLEL_MODES:
+        raise ValueError(f"Unknown parallel mode: {mode}")
+    environment = build_world(world)[0]
+    q_table = SharedQTable.for_environment(environment, max_layouts)
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers or len(seeds), initializer=_init_worker, initargs=(multiprocessing.Lock(),)) as executor:
+            futures = [executor.submit(run_worker, worker, seed, q_table, spec, num_steps, world, mode, sync_every, 1.0 / len(seeds)) for worker, seed in enumerate(seeds)]
+            rows = [row for future in futures for row in future.result()]
+        return q_table.copy(), pd.DataFrame(rows)
+    finally:
+        q_table.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Train one shared Q-table with several worker processes running independent episodes.")
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(), help="Number of worker processes (one seed each)")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the first worker; the others use the following seeds")
+    parser.add_argument('--experiment', default='1c', choices=['1a', '1b', '1c', '2', '3', '4'], help="Experiment every worker runs")
+    parser.add_argument('--steps', type=int, default=9000, help="Number of steps per worker")
+    parser.add_argument('--mode', choices=PARALLEL_MODES, default='hogwild', help="Lock-free updates or periodic synchronized merges")
+    parser.add_argument('--sync-every', type=int, default=500, help="Steps between merges in sync mode")
+    args = parser.parse_args()
+
+    spec = {'experiment': args.experiment, 'learning_rate': 0.15} if args.experiment == '3' else {'experiment': args.experiment}
+    seeds = list(range(args.seed, args.seed + args.workers))
+    start = time.perf_counter()
+    q_table, results = run_parallel(seeds, spec, args.steps, mode=args.mode, sync_every=args.sync_every)
+    elapsed = time.perf_counter() - start
+
+    print(results[['worker', 'seed', 'phase', 'agent', 'steps', 'total_reward', 'total_success', 'reward_per_step']].to_string(index=False))
+    steps = results.loc[results['agent'] == 1, 'steps'].sum()
+    print(f"\n{args.workers} workers, {steps} steps in {elapsed:.2f}s ({steps / elapsed:.0f} steps/sec), {len(q_table)} states learned")
+
+if __name__ == "__main__":
+    main()
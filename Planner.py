@@ -0,0 +1,65 @@
+import numpy as np
+from Environment import ACTIONS, PICKUP, DROPOFF, MOVES
+
+# The planner works on the single-agent model of the environment's current layout: one local state per (cell, carrying) pair,
+# numbered as in Environment.get_state without the layout offset. Other agents and the remaining stock of the pickup and dropoff
+# locations are not part of the model, so its values are those of an agent alone in a world that never runs out of blocks.
+
+# Building the deterministic model: next_states[s, a] and rewards[s, a] of every local state and action, and the mask of available actions.
+# Rewards follow Environment.calculate_reward: they depend on the state the action leads to.
+def build_model(environment):
+    num_states = environment.states_per_layout
+    cells = np.arange(environment.num_cells)
+    columns = environment.grid_size[1]
+    pickup = np.zeros(environment.num_cells, dtype=bool)
+    pickup[[x * columns + y for x, y in environment.pickup_locations]] = True
+    dropoff = np.zeros(environment.num_cells, dtype=bool)
+    dropoff[[x * columns + y for x, y in environment.dropoff_locations]] = True
+
+    if environment.mask_invalid_moves:
+        moves = (environment.move_mask[:, None] >> np.arange(len(MOVES))) & 1 == 1
+    else:
+        moves = np.ones((environment.num_cells, len(MOVES)), dtype=bool)  # Moves off the grid are available and leave the agent in place.
+
+    next_states = np.empty((num_states, len(ACTIONS)), dtype=np.int64)
+    available = np.zeros((num_states, len(ACTIONS)), dtype=bool)
+    for carrying in (0, 1):
+        states = cells * 2 + carrying
+        next_states[states, :len(MOVES)] = environment.next_cell[:, :len(MOVES)] * 2 + carrying
+        available[states, :len(MOVES)] = moves
+        next_states[states, PICKUP] = cells * 2 + 1  # Unavailable while carrying, so always leads to carrying.
+        next_states[states, DROPOFF] = cells * 2  # Unavailable while not carrying, so always leads to not carrying.
+    available[0::2, PICKUP] = pickup
+    available[1::2, DROPOFF] = dropoff
+
+    next_cells, next_carrying = np.divmod(next_states, 2)
+    rewards = np.where(next_carrying == 1, np.where(dropoff[next_cells], 10.0, 0.0), np.where(pickup[next_cells], 1.0, 0.0))
+    return next_states, rewards, available
+
+# Solving the model of the environment's current layout with vectorized value iteration, sweeping all states and actions at once
+# until no value changes by more than tolerance. Returns the optimal values V[s], the action values Q[s, a] (-inf for unavailable
+# actions), the greedy policy (an action index per state) and the number of sweeps.
+def value_iteration(environment, discount_factor, tolerance=1e-8, max_iterations=10000):
+    next_states, rewards, available = build_model(environment)
+    values = np.zeros(next_states.shape[0])
+    for iteration in range(1, max_iterations + 1):
+        q_values = np.where(available, rewards + discount_factor * values[next_states], -np.inf)
+        new_values = q_values.max(axis=1)
+        change = np.abs(new_values - values).max()
+        values = new_values
+        if change <= tolerance:
+            break
+    q_values = np.where(available, rewards + discount_factor * values[next_states], -np.inf)
+    return values, q_values, q_values.argmax(axis=1), iteration
+
+# Writing planned action values into the agent's Q-table rows of the environment's current layout (available actions only; the
+# others keep their values, which Q-learning never updates either). By default the layout is solved with the agent's discount factor.
+def initialize_q_table(agent, environment, q_values=None):
+    if q_values is None:
+        q_values = value_iteration(environment, agent.discount_factor)[1]
+    offset = environment.layout_offset
+    agent.q_table.index(offset + q_values.shape[0] - 1)  # Growing the table to hold the whole layout first.
+    agent.q_table.visited[offset:offset + q_values.shape[0]] = True
+    rows = agent.q_table.values[offset:offset + q_values.shape[0]]
+    planned = np.isfinite(q_values)
+    rows[planned] = q_values[planned]
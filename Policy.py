@@ -0,0 +1,111 @@
+import numpy as np
+from Environment import ACTIONS
+
+# Exploration rate of each named policy; 'exploit' explores with probability 1 - exploit_probability.
+POLICY_EPSILON = {'random': 1.0, 'greedy': 0.0}
+
+# Action indices (in ACTIONS order) of every action bitmask.
+MASK_INDICES = tuple(tuple(i for i in range(len(ACTIONS)) if mask & (1 << i)) for mask in range(1 << len(ACTIONS)))
+
+class RandomStream:
+    def __init__(self, generator=None, block_size=4096):
+        # Handing out uniform [0, 1) numbers from blocks pre-drawn from a np.random.Generator, so a decision never pays for a generator call.
+        # Without a generator, one is seeded from the global np.random state, so np.random.seed keeps runs reproducible.
+        if generator is None:
+            generator = np.random.default_rng(np.random.randint(2 ** 32, dtype=np.uint64))
+        self.generator = generator
+        self.block_size = block_size
+        self.block = np.empty(0)
+        self.cursor = 0
+
+    # Next uniform number of the stream.
+    def uniform(self):
+        if self.cursor == self.block.shape[0]:
+            self.refill(1)
+        value = self.block_list[self.cursor]
+        self.cursor += 1
+        return value
+
+    # Next n uniform numbers of the stream as an array (the same numbers n calls to uniform() would return).
+    def reserve(self, n):
+        if self.block.shape[0] - self.cursor < n:
+            self.refill(n)
+        values = self.block[self.cursor:self.cursor + n]
+        self.cursor += n
+        return values
+
+    # Drawing a new block that starts with the unconsumed rest of the current one and holds at least n numbers.
+    def refill(self, n):
+        rest = self.block[self.cursor:]
+        self.block = np.concatenate([rest, self.generator.random(max(self.block_size, n - rest.shape[0]))])
+        self.block_list = self.block.tolist()  # Indexing a list returns Python floats, much faster than indexing the array.
+        self.cursor = 0
+
+    # Generator state and unconsumed numbers, enough to continue the stream exactly (see Checkpoint.py).
+    def get_state(self):
+        return self.generator.bit_generator.state, self.block[self.cursor:].copy()
+
+    def set_state(self, state, rest):
+        self.generator.bit_generator.state = state
+        self.block = np.asarray(rest, dtype=float)
+        self.block_list = self.block.tolist()
+        self.cursor = 0
+
+
+class LinearEpsilon:
+    def __init__(self, start=1.0, end=0.05, decay_steps=5000, warmup_steps=0):
+        # Exploration rate falling linearly from start to end over decay_steps steps, after warmup_steps steps at start.
+        # Usable as an ExperimentEngine schedule: agents accept an exploration rate wherever they accept a policy name.
+        self.start = start
+        self.end = end
+        self.decay_steps = decay_steps
+        self.warmup_steps = warmup_steps
+
+    def __call__(self, step):
+        progress = min(max(step - self.warmup_steps, 0) / self.decay_steps, 1.0)
+        return self.start + (self.end - self.start) * progress
+
+
+class ExponentialEpsilon:
+    def __init__(self, start=1.0, end=0.05, decay=0.999, warmup_steps=0):
+        # Exploration rate decaying geometrically from start towards end by the factor decay per step, after warmup_steps steps at start.
+        self.start = start
+        self.end = end
+        self.decay = decay
+        self.warmup_steps = warmup_steps
+
+    def __call__(self, step):
+        return self.end + (self.start - self.end) * self.decay ** max(step - self.warmup_steps, 0)
+
+
+# Exploration rate of a policy, given either as a name or directly as a number.
+def policy_epsilon(policy, exploit_probability=0.8):
+    if policy == 'exploit':
+        return 1.0 - exploit_probability
+    if isinstance(policy, str):
+        try:
+            return POLICY_EPSILON[policy]
+        except KeyError:
+            raise ValueError(f"Unknown policy: {policy}") from None
+    return policy
+
+# Epsilon-greedy choice of an action index among the actions of the bitmask mask.
+# explore < epsilon explores, otherwise the choice is among the available actions with the highest Q-value; pick then selects uniformly
+# among the candidates in ACTIONS order. Both draws are always consumed, so the random stream does not depend on the Q-values.
+def select_action(q_values, mask, epsilon, explore, pick):
+    candidates = MASK_INDICES[mask]
+    if explore >= epsilon and len(candidates) > 1:
+        values = q_values.tolist()
+        best = max(values[i] for i in candidates)
+        candidates = [i for i in candidates if values[i] == best]
+    return candidates[int(pick * len(candidates))]
+
+# Vectorized select_action over many decisions: q_values (..., 6), masks (..., 6) booleans, epsilon a scalar or (...) array,
+# explore and pick (...) arrays of uniforms. Returns the (...) array of action indices, identical to calling select_action on each row.
+def select_actions(q_values, masks, epsilon, explore, pick):
+    masked = np.where(masks, q_values, -np.inf)
+    best = masks & (masked == masked.max(axis=-1, keepdims=True))  # Masked argmax keeping every tie.
+    candidates = np.where((np.asarray(explore) < epsilon)[..., None], masks, best)
+    counts = candidates.sum(axis=-1)
+    chosen = (np.asarray(pick) * counts).astype(np.int64)
+    return (np.cumsum(candidates, axis=-1) > chosen[..., None]).argmax(axis=-1)
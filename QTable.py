@@ -0,0 +1,188 @@
+import numpy as np
+from multiprocessing import shared_memory
+from Environment import ACTIONS, ACTION_INDEX
+
+class QRow:
+    # Initializing a mapping view over one row of a QTable so existing code can keep using q_table[state][action].
+    def __init__(self, table, row):
+        self.table = table
+        self.row = row
+
+    def __getitem__(self, action):
+        return float(self.table.values[self.row, ACTION_INDEX[action]])
+
+    def __setitem__(self, action, value):
+        self.table.values[self.row, ACTION_INDEX[action]] = value
+
+    def __contains__(self, action):
+        return action in ACTION_INDEX
+
+    def __iter__(self):
+        return iter(ACTIONS)
+
+    def __len__(self):
+        return len(ACTIONS)
+
+    def get(self, action, default=None):
+        if action not in ACTION_INDEX:
+            return default
+        return self[action]
+
+    def keys(self):
+        return list(ACTIONS)
+
+    def values(self):
+        return self.table.values[self.row].tolist()
+
+    def items(self):
+        return list(zip(ACTIONS, self.values()))
+
+    def to_dict(self):
+        return dict(self.items())
+
+
+class QTable:
+    def __init__(self, capacity=64, dtype=np.float64):
+        # Initializing a dense Q-table: integer states from Environment.get_state index rows directly, actions index columns,
+        # and all Q-values live in one preallocated array that grows to fit the largest state seen.
+        self.values = np.zeros((capacity, len(ACTIONS)), dtype=dtype)
+        self.visited = np.zeros(capacity, dtype=bool)  # Rows that have been allocated (seen at least once).
+
+    def __len__(self):
+        return int(self.visited.sum())
+
+    def __contains__(self, state):
+        return state < self.visited.shape[0] and self.visited[state]
+
+    def __iter__(self):
+        return iter(self.states)
+
+    def __getitem__(self, state):
+        if state not in self:
+            raise KeyError(state)
+        return QRow(self, state)
+
+    # Assigning a whole row from a dict of action -> Q-value; actions that are not given are set to 0.0.
+    def __setitem__(self, state, actions):
+        row = self.index(state)
+        self.values[row] = 0.0
+        for action, q_value in actions.items():
+            self.values[row, ACTION_INDEX[action]] = q_value
+
+    # Returning the row index of a state (the state itself), growing the table and marking the row as seen when needed.
+    def index(self, state):
+        if state >= self.visited.shape[0]:
+            self._grow(state + 1)
+        self.visited[state] = True
+        return state
+
+    # Making room for capacity states without marking any of them as seen (e.g. before handing the arrays to a compiled kernel).
+    def reserve(self, capacity):
+        if capacity > self.visited.shape[0]:
+            self._grow(capacity)
+
+    # Copying the size rows starting at state source over the size rows starting at state target (e.g. one layout's block onto another's).
+    def copy_block(self, source, target, size):
+        self.reserve(max(source, target) + size)
+        self.values[target:target + size] = self.values[source:source + size]
+        self.visited[target:target + size] = self.visited[source:source + size]
+
+    # Zeroing the size rows starting at state start and marking them as unseen (e.g. the block of a retired layout).
+    def clear_block(self, start, size):
+        self.values[start:start + size] = 0.0
+        self.visited[start:start + size] = False
+
+    # Returning the array of Q-values for a state (a view, so writes go straight into the table).
+    def row(self, state):
+        row = self.index(state)  # Indexing first, since it may replace self.values with a larger array.
+        return self.values[row]
+
+    # States that have been seen, in increasing order.
+    @property
+    def states(self):
+        return np.flatnonzero(self.visited).tolist()
+
+    def items(self):
+        for state in self.states:
+            yield state, QRow(self, state)
+
+    # Returning the Q-values of the seen states, in the order of self.states.
+    def to_array(self):
+        return self.values[self.visited]
+
+    # Building a table around existing arrays (e.g. memory-mapped from a checkpoint) without copying them.
+    @classmethod
+    def from_arrays(cls, values, visited):
+        table = cls(capacity=0, dtype=values.dtype)
+        table.values = values
+        table.visited = np.array(visited, dtype=bool)
+        return table
+
+    def copy(self):
+        table = QTable(capacity=self.values.shape[0], dtype=self.values.dtype)
+        table.values[:] = self.values
+        table.visited[:] = self.visited
+        return table
+
+    # Growing the table (at least doubling it) so that it has room for min_capacity states.
+    def _grow(self, min_capacity):
+        capacity = max(min_capacity, 2 * self.values.shape[0])
+        values = np.zeros((capacity, self.values.shape[1]), dtype=self.values.dtype)
+        values[:self.values.shape[0]] = self.values
+        visited = np.zeros(capacity, dtype=bool)
+        visited[:self.visited.shape[0]] = self.visited
+        self.values = values
+        self.visited = visited
+
+
+class SharedQTable(QTable):
+    def __init__(self, capacity, dtype=np.float64, name=None):
+        # Initializing a fixed-capacity Q-table whose values and visited flags live in one multiprocessing.shared_memory block.
+        # Without a name a new zeroed block is created; with a name the existing block is attached. Pickling a SharedQTable
+        # (e.g. to send it to a worker process) attaches to the same block instead of copying it, so updates are seen by every process.
+        dtype = np.dtype(dtype)
+        values_size = capacity * len(ACTIONS) * dtype.itemsize
+        self.capacity = capacity
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=max(values_size + capacity, 1))
+        self.values = np.ndarray((capacity, len(ACTIONS)), dtype=dtype, buffer=self.shm.buf)
+        self.visited = np.ndarray((capacity,), dtype=bool, buffer=self.shm.buf, offset=values_size)
+        if self.owner:
+            self.values[:] = 0.0
+            self.visited[:] = False
+
+    # Room for every state of max_layouts layouts of the environment (states embed the layout id, see Environment.get_state).
+    @classmethod
+    def for_environment(cls, environment, max_layouts=1, dtype=np.float64):
+        return cls(environment.states_per_layout * max_layouts, dtype)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def __reduce__(self):
+        return SharedQTable, (self.capacity, self.values.dtype, self.name)
+
+    # A private, ordinary QTable with the current contents.
+    def copy(self):
+        return QTable.from_arrays(self.values.copy(), self.visited)
+
+    # Detaching this process from the block; the owner also frees it.
+    def close(self):
+        self.values = self.visited = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    # The block cannot be resized, so a state beyond the capacity is an error instead of a reallocation.
+    def _grow(self, min_capacity):
+        raise ValueError(f"State {min_capacity - 1} does not fit in the shared Q-table of {self.capacity} states")
+
+
+# Making the agents learn one common Q-table (a new dense one when none is given), e.g. for a homogeneous fleet.
+def share_q_table(agents, q_table=None):
+    if q_table is None:
+        q_table = QTable()
+    for agent in agents:
+        agent.q_table = q_table
+    return q_table
@@ -0,0 +1,122 @@
+import numpy as np
+from Environment import ACTION_INDEX
+
+class ReplayBuffer:
+    def __init__(self, capacity=10000, prioritized=False, alpha=0.6, beta=0.4, epsilon=1e-3):
+        # Initializing a fixed-capacity ring buffer of transitions in preallocated arrays; once full, the oldest transition is overwritten.
+        # With prioritized, transitions are sampled with probability proportional to priority ** alpha, where the priority is the last
+        # absolute TD error plus epsilon (new transitions get the highest priority so far), and beta sets the importance-sampling correction.
+        self.capacity = capacity
+        self.prioritized = prioritized
+        self.alpha = alpha
+        self.beta = beta
+        self.epsilon = epsilon
+        self.states = np.zeros(capacity, dtype=np.int64)
+        self.actions = np.zeros(capacity, dtype=np.int64)
+        self.rewards = np.zeros(capacity)
+        self.next_states = np.zeros(capacity, dtype=np.int64)
+        self.priorities = np.zeros(capacity)
+        self.max_priority = 1.0
+        self.size = 0
+        self.position = 0
+
+    def __len__(self):
+        return self.size
+
+    # Storing one transition (action given as its index in ACTIONS).
+    def add(self, state, action, reward, next_state):
+        position = self.position
+        self.states[position] = state
+        self.actions[position] = action
+        self.rewards[position] = reward
+        self.next_states[position] = next_state
+        self.priorities[position] = self.max_priority
+        self.position = (position + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    # Sampling batch_size transition indices with the generator; returns them with their importance-sampling weights (all 1 when uniform).
+    def sample(self, batch_size, generator):
+        if not self.prioritized:
+            return generator.integers(0, self.size, batch_size), np.ones(batch_size)
+        probabilities = self.priorities[:self.size] ** self.alpha
+        cumulative = np.cumsum(probabilities)
+        indices = np.searchsorted(cumulative, generator.random(batch_size) * cumulative[-1], side='right')
+        indices = np.minimum(indices, self.size - 1)
+        weights = (self.size * probabilities[indices] / cumulative[-1]) ** -self.beta
+        return indices, weights / weights.max()
+
+    # Setting the priorities of replayed transitions from their TD errors.
+    def update_priorities(self, indices, errors):
+        priorities = np.abs(errors) + self.epsilon
+        self.priorities[indices] = priorities
+        self.max_priority = max(self.max_priority, priorities.max())
+
+
+# Replaying a batch of transitions with one vectorized Q-learning update of the table: every sampled (state, action) moves towards
+# reward + discount_factor * max Q(next_state), scaled by its weight. Repeated samples of the same pair add up (np.add.at).
+# Returns the TD errors of the batch (before the update).
+def replay_update(q_table, buffer, indices, learning_rate, discount_factor, weights=None):
+    states = buffer.states[indices]
+    actions = buffer.actions[indices]
+    q_values = q_table.values
+    errors = buffer.rewards[indices] + discount_factor * q_values[buffer.next_states[indices]].max(axis=1) - q_values[states, actions]
+    steps = learning_rate * errors if weights is None else learning_rate * weights * errors
+    np.add.at(q_values, (states, actions), steps)
+    return errors
+
+
+class ReplayLearner:
+    def __init__(self, learner, learning_rate=None, capacity=10000, batch_size=32, replay_every=1, prioritized=False, alpha=0.6, beta=0.4):
+        # Wrapping a Q-learning rule (QLearner, NStepQLearner or WatkinsQLambdaLearner) so that every transition is also stored in the
+        # agent's replay buffer, and every replay_every steps of an agent a batch of its stored transitions is replayed. Without a
+        # learning rate the agent's own is used. Buffers are kept across terminal resets for the whole run.
+        self.learner = learner
+        self.learning_rate = learning_rate
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.replay_every = replay_every
+        self.prioritized = prioritized
+        self.alpha = alpha
+        self.beta = beta
+        self.generator = np.random.default_rng(np.random.randint(2 ** 32, dtype=np.uint64))
+        self.buffers = []
+        self.steps = []
+        self.layout = None
+
+    # Starting new buffers for a new set of agents or when the world moved to another layout, whose states the stored transitions
+    # do not describe (a retired layout's rows may even be reused by the new one).
+    def reset(self, environment, agents):
+        self.learner.reset(environment, agents)
+        if len(self.buffers) != len(agents) or environment.layout != self.layout:
+            self.buffers = [ReplayBuffer(self.capacity, self.prioritized, self.alpha, self.beta) for _ in agents]
+            self.steps = [0] * len(agents)
+            self.layout = environment.layout
+
+    def flush(self, agents):
+        self.learner.flush(agents)
+
+    def act(self, i, agent, environment, policy):
+        transition = self.learner.act(i, agent, environment, policy)
+        self.store(i, agent, transition)
+        return transition
+
+    def act_synchronous(self, agents, environment, policy):
+        transitions = self.learner.act_synchronous(agents, environment, policy)
+        for i, (agent, transition) in enumerate(zip(agents, transitions)):
+            self.store(i, agent, transition)
+        return transitions
+
+    # Storing agent i's transition and replaying a batch when it is due. The replayed rows must exist in the Q-table, which the wrapped
+    # rule may not have grown to them yet (NStepQLearner only indexes a transition once its n-step return is known).
+    def store(self, i, agent, transition):
+        state, action, reward, next_state, delta = transition
+        agent.q_table.reserve(max(state, next_state) + 1)
+        buffer = self.buffers[i]
+        buffer.add(state, ACTION_INDEX[action], reward, next_state)
+        self.steps[i] += 1
+        if self.steps[i] % self.replay_every == 0:
+            indices, weights = buffer.sample(self.batch_size, self.generator)
+            errors = replay_update(agent.q_table, buffer, indices, self.learning_rate or agent.learning_rate, agent.discount_factor,
+                                   weights if buffer.prioritized else None)
+            if buffer.prioritized:
+                buffer.update_priorities(indices, errors)
@@ -1,165 +1,227 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import seaborn as sns
+from Environment import ACTIONS, plot_environment
+
+# Colour names of the first three agents used in plots and printed output
+AGENT_NAMES = ['Black', 'Red', 'Blue']
+
+# Plots one agent's position frequency heatmap; a module-level function so it can also run in a background worker process
+def plot_position_freq(position_frequency, title, path=None):
+    # Cell annotations are only readable on small grids
+    annotate = position_frequency.size <= 100
+    if path is None:
+        plt.figure()
+        plt.title(title)
+        sns.heatmap(position_frequency, annot=annotate, fmt='g')
+        plt.show()
+    else:
+        # A standalone Agg figure, so no display is needed
+        fig = Figure()
+        ax = fig.subplots()
+        ax.set_title(title)
+        sns.heatmap(position_frequency, annot=annotate, fmt='g', ax=ax)
+        fig.savefig(path)
+
 class ResultPrinter:
-    def print_results(self, agents, total_rewards, total_distances, total_successes, num_steps):
+    def __init__(self, output_dir=None, max_workers=1, fleet=False):
+        # Without an output directory figures are shown interactively (blocking). With one, figures are rendered headless to PNG files
+        # by a background process pool, so training continues while they are drawn; call close() to wait for them.
+        # With fleet, results are summarized over the agents (one table of per-agent statistics, Q-table sizes, one fleet heatmap)
+        # instead of printed and plotted agent by agent.
+        self.fleet = fleet
+        self.output_dir = output_dir
+        self.executor = None
+        self.pending = []
+        self.figure_count = 0
+        if output_dir is not None:
+            os.makedirs(output_dir, exist_ok=True)
+            self.executor = ProcessPoolExecutor(max_workers=max_workers)
+
+    def print_results(self, agents, total_rewards, total_distances, total_successes, num_steps, environment=None):
         # Print experiment results for each agent
         print("Experiment Results:")
-        for i, agent in enumerate(agents):
-            print(f"Agent {i + 1}:")
-            print(f"  Total Reward: {total_rewards[i]:.2f}")
-            print(f"  Total Success: {total_successes[i]}")
-            print(f"  Total Distance: {total_distances[i]}")
-            print(f"  Average Reward per Step: {total_rewards[i] / num_steps:.4f}")
-            print(f"  Average Success per Step: {total_successes[i] / num_steps:.4f}")
-            print(f"  Average Distance per Step: {total_distances[i] / num_steps:.2f}")
-            print()
+        self.print_totals(agents, total_rewards, total_distances, total_successes, num_steps)
 
         # Print final Q-tables for each agent
         print("Final Q-Tables:")
-        for i, agent in enumerate(agents):
-            print(f"Agent {i + 1}:")
-            q_table_dict = {}
-            for state, actions in agent.q_table.items():
-                agent_pos, pickup_pos, dropoff_pos = state
-                state_str = f"Agent: {agent_pos}"
-                q_table_dict[state_str] = actions
-
-            q_table_df = pd.DataFrame.from_dict(q_table_dict, orient='index')
-            q_table_df.index.name = 'State'
-            q_table_df = q_table_df.apply(lambda x: x.apply(lambda y: '{:.3f}'.format(y)))
-            q_table_df.sort_index(inplace=True)
-            print(q_table_df.to_string(index=True))
-            print()
+        self.print_q_tables(agents, environment)
 
-    def print_results_experiment2(self, agents, total_rewards, total_distances, total_successes, num_steps):
+    def print_results_experiment2(self, agents, total_rewards, total_distances, total_successes, num_steps, environment=None):
         # Print experiment 2 results
         print("Experiment 2 Results:")
-        for i, agent in enumerate(agents):
-            print(f"Agent {i + 1}:")
-            print(f"  Total Reward: {total_rewards[i]:.2f}")
-            print(f"  Total Success: {total_successes[i]}")
-            print(f"  Total Distance: {total_distances[i]}")
-            print(f"  Average Reward per Step: {total_rewards[i] / num_steps:.4f}")
-            print(f"  Average Success per Step: {total_successes[i] / num_steps:.4f}")
-            print(f"  Average Distance per Step: {total_distances[i] / num_steps:.2f}")
-            print()
+        self.print_totals(agents, total_rewards, total_distances, total_successes, num_steps)
 
         # Print final Q-tables for experiment 2
         print("Final Q-Tables for Experiment 2:")
-        for i, agent in enumerate(agents):
-            print(f"Agent {i + 1}:")
-            q_table_dict = {}
-            for state, actions in agent.q_table.items():
-                agent_pos, pickup_pos, dropoff_pos = state
-                state_str = f"Agent: {agent_pos}"
-                q_table_dict[state_str] = actions
-
-            q_table_df = pd.DataFrame.from_dict(q_table_dict, orient='index')
-            q_table_df.index.name = 'State'
-            q_table_df = q_table_df.apply(lambda x: x.apply(lambda y: '{:.3f}'.format(y)))
-            q_table_df.sort_index(inplace=True)
-            print(q_table_df.to_string(index=True))
-            print()
+        self.print_q_tables(agents, environment)
 
-    def print_results_experiment3(self, agents, total_rewards, total_distances, total_successes, num_steps, learning_rate):
+    def print_results_experiment3(self, agents, total_rewards, total_distances, total_successes, num_steps, learning_rate, environment=None):
         # Print experiment 3 results with learning rate
         print(f"Experiment 3 Results (Learning Rate: {learning_rate}):")
-        for i, agent in enumerate(agents):
-            print(f"Agent {i + 1}:")
-            print(f"  Total Reward: {total_rewards[i]:.2f}")
-            print(f"  Total Success: {total_successes[i]}")
-            print(f"  Total Distance: {total_distances[i]}")
-            print(f"  Average Reward per Step: {total_rewards[i] / num_steps:.4f}")
-            print(f"  Average Success per Step: {total_successes[i] / num_steps:.4f}")
-            print(f"  Average Distance per Step: {total_distances[i] / num_steps:.2f}")
-            print()
+        self.print_totals(agents, total_rewards, total_distances, total_successes, num_steps)
 
         # Print final Q-tables for experiment 3 with learning rate
         print(f"Final Q-Tables for Experiment 3 (Learning Rate: {learning_rate}):")
-        for i, agent in enumerate(agents):
-            print(f"Agent {i + 1}:")
-            q_table_dict = {}
-            for state, actions in agent.q_table.items():
-                agent_pos, pickup_pos, dropoff_pos = state
-                state_str = f"Agent: {agent_pos}"
-                q_table_dict[state_str] = actions
-
-            q_table_df = pd.DataFrame.from_dict(q_table_dict, orient='index')
-            q_table_df.index.name = 'State'
-            q_table_df = q_table_df.apply(lambda x: x.apply(lambda y: '{:.3f}'.format(y)))
-            q_table_df.sort_index(inplace=True)
-            print(q_table_df.to_string(index=True))
-            print()
+        self.print_q_tables(agents, environment)
 
-    def print_results_experiment4(self, agents, total_rewards_before, total_distances_before, total_successes_before, total_steps_before, total_rewards_after, total_distances_after, total_successes_after, total_steps_after):
+    def print_results_experiment4(self, agents, total_rewards_before, total_distances_before, total_successes_before, total_steps_before, total_rewards_after, total_distances_after, total_successes_after, total_steps_after, environment=None):
         # Print experiment 4 results
         print("Experiment 4 Results:")
         print("Before changing pickup locations:")
-        for i, agent in enumerate(agents):
-            print(f"Agent {i + 1}:")
-            print(f"  Total Reward: {total_rewards_before[i]:.2f}")
-            print(f"  Total Success: {total_successes_before[i]}")
-            print(f"  Total Distance: {total_distances_before[i]}")
-            if total_steps_before != 0:
-                print(f"  Average Reward per Step: {total_rewards_before[i] / total_steps_before:.4f}")
-                print(f"  Average Success per Step: {total_successes_before[i] / total_steps_before:.4f}")
-                print(f"  Average Distance per Step: {total_distances_before[i] / total_steps_before:.2f}")
-            else:
-                print("  Average Reward per Step: N/A")
-                print("  Average Success per Step: N/A")
-                print("  Average Distance per Step: N/A")
-            print()
+        self.print_totals(agents, total_rewards_before, total_distances_before, total_successes_before, total_steps_before)
 
         print("After changing pickup locations:")
+        self.print_totals(agents, total_rewards_after, total_distances_after, total_successes_after, total_steps_after)
+
+        # Print final Q-tables for experiment 4
+        print("Final Q-Tables for Experiment 4:")
+        self.print_q_tables(agents, environment)
+
+    # Print the totals and per-step averages of each agent (averages are N/A when no steps were run)
+    def print_totals(self, agents, total_rewards, total_distances, total_successes, num_steps):
+        if self.fleet:
+            self.print_fleet_totals(total_rewards, total_distances, total_successes, num_steps)
+            return
         for i, agent in enumerate(agents):
             print(f"Agent {i + 1}:")
-            print(f"  Total Reward: {total_rewards_after[i]:.2f}")
-            print(f"  Total Success: {total_successes_after[i]}")
-            print(f"  Total Distance: {total_distances_after[i]}")
-            if total_steps_after != 0:
-                print(f"  Average Reward per Step: {total_rewards_after[i] / total_steps_after:.4f}")
-                print(f"  Average Success per Step: {total_successes_after[i] / total_steps_after:.4f}")
-                print(f"  Average Distance per Step: {total_distances_after[i] / total_steps_after:.2f}")
+            print(f"  Total Reward: {total_rewards[i]:.2f}")
+            print(f"  Total Success: {total_successes[i]}")
+            print(f"  Total Distance: {total_distances[i]}")
+            if num_steps != 0:
+                print(f"  Average Reward per Step: {total_rewards[i] / num_steps:.4f}")
+                print(f"  Average Success per Step: {total_successes[i] / num_steps:.4f}")
+                print(f"  Average Distance per Step: {total_distances[i] / num_steps:.2f}")
             else:
                 print("  Average Reward per Step: N/A")
                 print("  Average Success per Step: N/A")
                 print("  Average Distance per Step: N/A")
             print()
 
-        # Print final Q-tables for experiment 4
-        print("Final Q-Tables for Experiment 4:")
+    # Print the distribution of the per-agent totals over the fleet, and the fleet totals
+    def print_fleet_totals(self, total_rewards, total_distances, total_successes, num_steps):
+        totals = pd.DataFrame({'reward': total_rewards, 'success': total_successes, 'distance': total_distances})
+        if num_steps != 0:
+            totals['reward_per_step'] = totals['reward'] / num_steps
+        print(f"Fleet of {len(totals)} agents over {num_steps} steps:")
+        print(totals.describe().T[['mean', 'std', 'min', '50%', 'max']].to_string(float_format='{:.4f}'.format))
+        print(f"  Fleet Reward: {totals['reward'].sum():.2f}, Fleet Success: {totals['success'].sum()}, Fleet Distance: {totals['distance'].sum()}")
+        print()
+
+    # Print the fleet-level summary of a FleetMetrics collector for the last run
+    def print_fleet_metrics(self, metrics):
+        print("Fleet Metrics:")
+        print(pd.DataFrame([metrics.summary()]).to_string(index=False, float_format='{:.4f}'.format))
+        print()
+
+    # Print the Q-table of each agent (in fleet mode only the number of states each distinct Q-table has learned)
+    def print_q_tables(self, agents, environment=None):
+        if self.fleet:
+            tables = {id(agent.q_table): agent.q_table for agent in agents}.values()
+            sizes = np.array([len(table) for table in tables])
+            print(f"{len(sizes)} Q-tables, states learned: mean {sizes.mean():.1f}, min {sizes.min()}, max {sizes.max()}")
+            print()
+            return
         for i, agent in enumerate(agents):
             print(f"Agent {i + 1}:")
-            q_table_dict = {}
-            for state, actions in agent.q_table.items():
-                agent_pos, pickup_pos, dropoff_pos = state
-                state_str = f"Agent: {agent_pos}"
-                q_table_dict[state_str] = actions
-
-            q_table_df = pd.DataFrame.from_dict(q_table_dict, orient='index')
-            q_table_df.index.name = 'State'
-            q_table_df = q_table_df.apply(lambda x: x.apply(lambda y: '{:.3f}'.format(y)))
-            q_table_df.sort_index(inplace=True)
-            print(q_table_df.to_string(index=True))
-            print()
+            self.print_q_table(agent, environment)
+
+    # Print one agent's Q-table; states are labelled by agent position and carried block when the environment is given to decode them
+    def print_q_table(self, agent, environment=None):
+        q_table_df = self.q_table_frame(agent, environment)
+        print(q_table_df.to_string(index=True, float_format='{:.3f}'.format))
+        print()
+
+    # Build an agent's Q-table as a DataFrame straight from the Q-value array, one row per seen state, sorted by label
+    # (states that share a label, such as the same position under different layouts, keep the latest one)
+    def q_table_frame(self, agent, environment=None):
+        labels = pd.Index([self.state_label(state, environment) for state in agent.q_table.states], name='State')
+        q_table_df = pd.DataFrame(agent.q_table.to_array(), index=labels, columns=list(ACTIONS))
+        q_table_df = q_table_df[~q_table_df.index.duplicated(keep='last')]
+        return q_table_df.sort_index()
+
+    # Print the learning curve summary of a MetricsCollector: one line per sampled step
+    def print_metrics(self, metrics):
+        print("Learning Curve:")
+        print(metrics.to_dataframe().to_string(index=False, float_format='{:.4f}'.format))
+        print()
+
+    # Readable label of an encoded state
+    def state_label(self, state, environment=None):
+        if environment is None:
+            return f"State {state}"
+        agent_pos, carrying, layout_id = environment.decode_state(state)
+        if carrying:
+            return f"Agent: {agent_pos}, Carrying"
+        return f"Agent: {agent_pos}"
+
+    # Print the aggregated multi-seed table produced by Experiments.aggregate_seed_results
+    def print_seed_summary(self, table):
+        seeds = table[('seeds', '')].max()
+        print(f"Aggregated Results over {seeds} Seeds (mean and confidence interval):")
+        print(table.to_string(float_format='{:.4f}'.format))
+        print()
 
     # visualize_position_freq function visualizes the frequency each agent travels across the entire experiment as separate heatmaps
-    def visualize_position_freq(self, environment):
+    # (in fleet mode as one heatmap of the whole fleet)
+    def visualize_position_freq(self, environment, name='position_frequency'):
+        if self.fleet:
+            print("Position Frequency Map for the Fleet:")
+            frequency = sum(agent.position_frequency for agent in environment.agents)
+            if self.executor is None:
+                plot_position_freq(frequency, "Position Frequency for the Fleet")
+            else:
+                self.submit(plot_position_freq, frequency, "Position Frequency for the Fleet", self.figure_path(f"{name}_fleet"))
+            return
         for i, agent in enumerate(environment.agents):            
-            plt.figure()
-            if i == 0:
-                plt.title("Position Frequency for Agent \"Black\"")
-                print("Position Frequency Map for Agent \"Black\":")
-            elif i == 1:
-                plt.title("Position Frequency for Agent \"Red\"")
-                print("Position Frequency Map for Agent \"Red\":")
-            elif i == 2:
-                plt.title("Position Frequency for Agent \"Blue\"")
-                print("Position Frequency Map for Agent \"Blue\":")
-            sns.heatmap(agent.position_frequency, annot=True, fmt='g')
-            plt.show()        
+            agent_name = self.agent_name(i)
+            print(f"Position Frequency Map for Agent {agent_name}:")
+            title = f"Position Frequency for Agent {agent_name}"
+            if self.executor is None:
+                plot_position_freq(agent.position_frequency, title)
+            else:
+                self.submit(plot_position_freq, agent.position_frequency.copy(), title, self.figure_path(f"{name}_agent_{i + 1}"))
+
+    # Visualizes the environment, interactively or as a background-rendered file in headless mode
+    def visualize_environment(self, environment, name='environment'):
+        if self.executor is None:
+            environment.visualize()
+        else:
+            agent_positions = [agent.position for agent in environment.agents]
+            self.submit(plot_environment, environment.grid_size, list(environment.pickup_locations), list(environment.dropoff_locations), agent_positions, self.figure_path(name),
+                        list(environment.obstacles))
+
+    # Path of the next figure file; the running number keeps figures in the order they were requested
+    def figure_path(self, name):
+        self.figure_count += 1
+        return os.path.join(self.output_dir, f"{self.figure_count:03d}_{name}.png")
+
+    # Queue a figure on the background pool, dropping futures that already finished (re-raising their errors)
+    def submit(self, plot, *args):
+        for future in [future for future in self.pending if future.done()]:
+            future.result()
+            self.pending.remove(future)
+        self.pending.append(self.executor.submit(plot, *args))
+
+    # Wait for all queued figures to be written and shut the background pool down
+    def close(self):
+        if self.executor is None:
+            return
+        for future in self.pending:
+            future.result()
+        self.pending = []
+        self.executor.shutdown()
+        self.executor = None
+
+    # Display name of the i-th agent: the three original agents keep their colour names, any further agents are numbered
+    def agent_name(self, i):
+        if i < len(AGENT_NAMES):
+            return f"\"{AGENT_NAMES[i]}\""
+        return str(i + 1)
 
     # visualize_attractive_paths function visualizes the most attractive paths for each grid space based on highest q-table value - NOT USED
     def visualize_attractive_paths(self, agents, environment):
@@ -173,7 +235,7 @@ class ResultPrinter:
             # Identify most promising actions for each state
             attractive_paths = {}
             for state, actions in q_values.items():
-                agent_pos, _, _ = state
+                agent_pos, _, _ = environment.decode_state(state)
                 if agent_pos not in attractive_paths:
                     attractive_paths[agent_pos] = []
                 max_q_value = max(actions.values())
@@ -0,0 +1,130 @@
+import argparse
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from Experiments import Experiments, DEFAULT_WORLD, build_world
+from Kernels import NUMBA_AVAILABLE
+
+# Hyperparameters searched by default: a (low, high) tuple is sampled uniformly, a list is sampled from.
+SEARCH_SPACE = {
+    'learning_rate': (0.05, 0.9),
+    'discount_factor': (0.3, 0.99),
+    'exploit_probability': (0.5, 1.0),
+    'warmup_steps': [0, 100, 250, 500, 1000],
+}
+
+# The compiled kernel gives the same results as the engine, so it is used whenever Numba makes it faster.
+SWEEP_BACKEND = 'kernel' if NUMBA_AVAILABLE else 'python'
+
+# Drawing n configurations from the search space with the generator.
+def sample_configs(space, n, generator):
+    configs = []
+    for _ in range(n):
+        config = {}
+        for name, values in space.items():
+            if isinstance(values, tuple):
+                config[name] = float(generator.uniform(values[0], values[1]))
+            else:
+                config[name] = values[generator.integers(len(values))]
+        configs.append(config)
+    return configs
+
+# Training the agents of the world with one configuration for num_steps steps of Q-learning with the exploit policy (Experiment 3)
+# and returning the average reward per agent per step, the score candidates are ranked by.
+def evaluate_config(config, seed, num_steps, world=DEFAULT_WORLD):
+    np.random.seed(seed)
+    random.seed(seed)
+    world = dict(world, learning_rate=config['learning_rate'], discount_factor=config['discount_factor'])
+    environment, agents, initial_agent_positions = build_world(world)
+    for agent in agents:
+        agent.exploit_probability = config['exploit_probability']
+    experiments = Experiments(warmup_steps=config['warmup_steps'], backend=SWEEP_BACKEND)
+    total_rewards, _, _ = experiments.run_experiment3(environment, agents, num_steps, initial_agent_positions, config['learning_rate'])
+    return sum(total_rewards) / (experiments.steps_run * len(agents))
+
+# Scoring every configuration with num_steps steps on every seed, in parallel; returns the mean score of each configuration.
+def evaluate_configs(executor, configs, seeds, num_steps, world):
+    futures = [[executor.submit(evaluate_config, config, seed, num_steps, world) for seed in seeds] for config in configs]
+    return [float(np.mean([future.result() for future in config_futures])) for config_futures in futures]
+
+# Successive halving: every configuration is scored with min_steps steps, the best 1/eta of them are kept and scored again with eta times
+# more steps, and so on until max_steps steps or a single configuration is left. Configurations are rescored from scratch at every rung.
+# Returns one row per (rung, configuration) with its step budget and score.
+def successive_halving(configs, min_steps, max_steps, eta=3, seeds=(0,), world=DEFAULT_WORLD, executor=None, bracket=0, first_id=0):
+    if executor is None:
+        with ProcessPoolExecutor() as executor:
+            return successive_halving(configs, min_steps, max_steps, eta, seeds, world, executor, bracket, first_id)
+
+    candidates = list(enumerate(configs, first_id))
+    num_steps = min_steps
+    rows = []
+    rung = 0
+    while True:
+        scores = evaluate_configs(executor, [config for _, config in candidates], seeds, num_steps, world)
+        for (config_id, config), score in zip(candidates, scores):
+            rows.append(dict(config, bracket=bracket, rung=rung, config_id=config_id, steps=num_steps, score=score))
+        if num_steps >= max_steps or len(candidates) <= 1:
+            return rows
+        order = np.argsort(scores)[::-1]
+        candidates = [candidates[i] for i in order[:max(1, len(candidates) // eta)]]
+        num_steps = min(num_steps * eta, max_steps)
+        rung += 1
+
+# Hyperband: successive halving in brackets that trade the number of sampled configurations against their starting budget, from many
+# configurations started with max_steps / eta ** s_max steps down to a few started with max_steps. Returns the rows of every bracket.
+def hyperband(space, min_steps, max_steps, eta=3, seeds=(0,), world=DEFAULT_WORLD, max_workers=None, seed=0):
+    generator = np.random.default_rng(seed)
+    s_max = int(math.log(max_steps / min_steps, eta) + 1e-9)
+    rows = []
+    num_sampled = 0
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for s in range(s_max, -1, -1):
+            num_configs = int(math.ceil((s_max + 1) / (s + 1) * eta ** s))
+            configs = sample_configs(space, num_configs, generator)
+            start_steps = int(max_steps / eta ** s)
+            rows += successive_halving(configs, start_steps, max_steps, eta, seeds, world, executor, bracket=s_max - s, first_id=num_sampled)
+            num_sampled += num_configs
+    return rows
+
+# The best configuration of a sweep: the highest score among the rows with the largest step budget reached.
+def best_config(results, space=SEARCH_SPACE):
+    final = results[results['steps'] == results['steps'].max()]
+    best = final['score'].idxmax()
+    return {name: final[name].loc[best].item() for name in space}
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep learning rate, discount factor, exploit probability and warmup with successive halving or Hyperband.")
+    parser.add_argument('--method', choices=['halving', 'hyperband'], default='hyperband')
+    parser.add_argument('--configs', type=int, default=27, help="Number of sampled configurations (successive halving only)")
+    parser.add_argument('--min-steps', type=int, default=1000, help="Step budget of the first rung")
+    parser.add_argument('--max-steps', type=int, default=9000, help="Step budget of the last rung")
+    parser.add_argument('--eta', type=int, default=3, help="Keep the best 1/eta of the candidates at every rung")
+    parser.add_argument('--seeds', nargs='+', type=int, default=[0], help="Seeds every candidate is scored on (scores are averaged)")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for sampling the configurations")
+    parser.add_argument('--workers', type=int, default=None, help="Number of worker processes (all cores by default)")
+    parser.add_argument('--output', default=None, help="Write every evaluation to this CSV file")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.method == 'halving':
+        configs = sample_configs(SEARCH_SPACE, args.configs, np.random.default_rng(args.seed))
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            rows = successive_halving(configs, args.min_steps, args.max_steps, args.eta, args.seeds, executor=executor)
+    else:
+        rows = hyperband(SEARCH_SPACE, args.min_steps, args.max_steps, args.eta, args.seeds, max_workers=args.workers, seed=args.seed)
+    elapsed = time.perf_counter() - start
+    results = pd.DataFrame(rows)
+    if args.output is not None:
+        results.to_csv(args.output, index=False)
+
+    final = results[results['steps'] == results['steps'].max()].sort_values('score', ascending=False)
+    print(final.to_string(index=False, float_format=lambda value: f"{value:.4f}"))
+    total_steps = (results['steps'] * len(args.seeds)).sum()
+    print(f"\n{results['config_id'].nunique()} configurations, {len(results)} evaluations, {total_steps} steps in {elapsed:.1f}s")
+    print(f"Best configuration: {best_config(results)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import os
+import numpy as np
+from Environment import ACTION_INDEX
+from Engine import Collector
+
+# One fixed-size binary record per agent move; carrying is the agent's flag after the action.
+TRAJECTORY_DTYPE = np.dtype([
+    ('run', '<u2'),
+    ('step', '<u4'),
+    ('agent', '<u2'),
+    ('state', '<u8'),
+    ('action', 'u1'),
+    ('reward', '<f4'),
+    ('carrying', '?'),
+])
+
+class TrajectoryRecorder(Collector):
+    def __init__(self, path, chunk_size=65536, append=False):
+        # Streaming every transition into a preallocated chunk of records that is appended to the file at path whenever it fills up.
+        # Every experiment run the recorder is attached to gets its own run number, so a whole schedule can share one file.
+        self.path = path
+        self.chunk = np.empty(chunk_size, dtype=TRAJECTORY_DTYPE)
+        self.count = 0
+        self.run = -1
+        if not append and os.path.exists(path):
+            os.remove(path)
+
+    def start(self, agents):
+        self.run += 1
+
+    def collect(self, step, i, agent, state, action, reward, next_state, distance, delta):
+        self.chunk[self.count] = (self.run, step, i, state, ACTION_INDEX[action], reward, agent.carrying_block)
+        self.count += 1
+        if self.count == self.chunk.shape[0]:
+            self.flush()
+
+    def finish(self):
+        self.flush()
+
+    # Appending the buffered records to the file.
+    def flush(self):
+        if self.count == 0:
+            return
+        with open(self.path, 'ab') as f:
+            f.write(self.chunk[:self.count].tobytes())
+        self.count = 0
+
+
+# Memory-mapping a recorded trajectory as a read-only structured array (fields as in TRAJECTORY_DTYPE).
+def load_trajectory(path):
+    if os.path.getsize(path) == 0:
+        return np.empty(0, dtype=TRAJECTORY_DTYPE)
+    return np.memmap(path, dtype=TRAJECTORY_DTYPE, mode='r')
@@ -1,97 +1,265 @@
+import argparse
 import numpy as np
 import pandas as pd
 import random
+import matplotlib
 from Environment import Environment
 from Agent import Agent
-from Experiments import Experiments
+from Experiments import Experiments, DEFAULT_WORLD, build_world, check_world
 from Results import ResultPrinter
+from Trajectory import TrajectoryRecorder
+from Metrics import MetricsCollector, ConvergenceMonitor, FleetMetrics
+from Checkpoint import save_checkpoint, load_checkpoint
+from QTable import share_q_table
+from Planner import initialize_q_table
+from Fleet import load_world
 
-def main():
-    # Defining the agents and the environment
-    grid_size = (5, 5)
-    pickup_locations = [(0, 4), (1, 3), (4, 1)]
-    dropoff_locations = [(0, 0), (2, 0), (3, 4)]
-    environment = Environment(grid_size, pickup_locations, dropoff_locations)
+EXPERIMENTS = ['1a', '1b', '1c', '2', '3', '4']
+
+# Parsing a grid location given on the command line as "row,column".
+def parse_location(text):
+    x, y = text.split(',')
+    return int(x), int(y)
 
-    agents = [
-        Agent((0, 2), learning_rate=0.3, discount_factor=0.5),
-        Agent((2, 2), learning_rate=0.3, discount_factor=0.5),
-        Agent((4, 2), learning_rate=0.3, discount_factor=0.5)
-    ]
+def parse_args():
+    parser = argparse.ArgumentParser(description="Path Discovery in a 3-Agent Transportation World Using Reinforcement Learning")
+    parser.add_argument('--seeds', nargs='+', type=int, default=None, help="Seed values to run (a random seed is generated when omitted)")
+    parser.add_argument('--experiments', nargs='+', choices=EXPERIMENTS, default=EXPERIMENTS, help="Experiments to run, in order")
+    parser.add_argument('--learning-rates', nargs='+', type=float, default=[0.15, 0.45], help="Learning rates for Experiment 3")
+    parser.add_argument('--steps', type=int, default=9000, help="Number of steps per experiment")
+    parser.add_argument('--headless', action='store_true', help="Render figures to files in the background instead of showing them")
+    parser.add_argument('--output-dir', default='figures', help="Directory for the figures in headless mode")
+    parser.add_argument('--trajectory', default=None, help="Record every step of every run to this binary trajectory file")
+    parser.add_argument('--metrics', default=None, help="Write the learning curves of all runs to this .parquet or .csv file")
+    parser.add_argument('--agents', type=int, default=None, help="Fleet mode: run this many agents, the ones beyond the world's start positions placed at random")
+    parser.add_argument('--world', default=None, help="Fleet mode: read the world (grid, sites, capacities, obstacles, agents) from this JSON file")
+    parser.add_argument('--obstacles', nargs='+', type=parse_location, default=[], help="Cells no agent can enter, as row,column pairs (e.g. 1,1 3,2)")
+    parser.add_argument('--synchronous', action='store_true', help="Move all agents simultaneously each step instead of in turn")
+    parser.add_argument('--shared-q-table', action='store_true', help="Let all agents learn one common Q-table")
+    parser.add_argument('--plan-init', action='store_true', help="Initialize the Q-tables with the values planned by value iteration")
+    parser.add_argument('--warmup-steps', type=int, default=500, help="Number of random exploration steps at the start of every experiment")
+    parser.add_argument('--n-step', type=int, default=1, help="Use n-step returns in the Q-learning experiments")
+    parser.add_argument('--trace-lambda', type=float, default=None, help="Use Q(lambda)/SARSA(lambda) with replacing traces and this lambda")
+    parser.add_argument('--replay-batch', type=int, default=0, help="Replay a batch of this many stored transitions after every step")
+    parser.add_argument('--prioritized-replay', action='store_true', help="Sample replayed transitions by TD error")
+    parser.add_argument('--backend', choices=['python', 'kernel'], default='python', help="Run plain Q-learning experiments with the compiled kernel (uses Numba when installed)")
+    parser.add_argument('--layout-change-probability', type=float, default=0.0, help="Move the pickup locations to random cells with this probability at every terminal state")
+    parser.add_argument('--carry-over', action='store_true', help="Start the Q-values of a new layout from those of the layout it replaces")
+    parser.add_argument('--evict-layouts', action='store_true', help="Clear and reuse the Q-table rows of layouts the world has moved away from")
+    parser.add_argument('--tolerance', type=float, default=None, help="Stop an experiment early once its Q-updates stay below this tolerance")
+    parser.add_argument('--convergence-window', type=int, default=500, help="Number of steps the Q-updates must stay below the tolerance")
+    parser.add_argument('--convergence-criterion', choices=['max', 'mean'], default='max', help="Compare the largest or the mean Q-update in the window")
+    parser.add_argument('--save-checkpoint', default=None, help="Directory to checkpoint the agents to after every experiment")
+    parser.add_argument('--resume', default=None, help="Checkpoint directory to resume from (Q-tables, position frequencies and RNG state)")
+    parser.add_argument('--warm-start', default=None, help="Checkpoint directory to load the Q-tables from before the first experiment")
+    parser.add_argument('--seed-workers', type=int, default=None, help="Number of processes running seeds in parallel when several seeds are given (all cores by default)")
+    parser.add_argument('--render-workers', type=int, default=1, help="Number of background processes rendering figures in headless mode")
+    args = parser.parse_args()
+    # Rejecting a world the selected experiments cannot run on (e.g. obstacles on the cells Experiment 4 moves the pickup locations to)
+    # before any training starts.
+    try:
+        check_world(world_description(args), experiment_specs(args))
+    except ValueError as error:
+        parser.error(str(error))
+    return args
 
-    initial_agent_positions = [(0, 2), (2, 2), (4, 2)]
+# The world description given by the arguments: the world file, or the default world with the obstacles, with the requested number of agents.
+def world_description(args):
+    world = load_world(args.world) if args.world is not None else dict(DEFAULT_WORLD, obstacles=args.obstacles)
+    if args.agents is not None:
+        world['num_agents'] = args.agents
+    return world
 
-    for agent in agents:
-        environment.add_agent(agent)
+# The experiment specs selected by the arguments, in the order main.py runs them (Experiment 3 once per learning rate).
+def experiment_specs(args):
+    specs = []
+    for experiment in args.experiments:
+        if experiment == '3':
+            specs.extend({'experiment': '3', 'learning_rate': learning_rate} for learning_rate in args.learning_rates)
+        else:
+            specs.append({'experiment': experiment})
+    return specs
 
-    environment.visualize()  
+# The Experiments runner configured by the arguments.
+def build_experiments(args, collectors=()):
+    return Experiments(collectors, synchronous=args.synchronous, warmup_steps=args.warmup_steps,
+                       n_step=args.n_step, trace_lambda=args.trace_lambda,
+                       replay_batch=args.replay_batch, prioritized_replay=args.prioritized_replay, backend=args.backend,
+                       layout_change_probability=args.layout_change_probability, carry_over=args.carry_over, evict_layouts=args.evict_layouts)
 
-    num_steps = 9000
-    experiments = Experiments()
+# Running several seeds at once, one worker process per seed, and printing the per-seed totals and their aggregate over the seeds.
+def run_parallel_seeds(seeds, args, result_printer):
+    experiments = build_experiments(args)
+    results = experiments.run_seeds(seeds, experiment_specs(args), args.steps, world_description(args), max_workers=args.seed_workers)
+    columns = ['seed', 'experiment', 'phase', 'agent', 'steps', 'total_reward', 'total_success', 'total_distance', 'reward_per_step']
+    print(results[columns].to_string(index=False, float_format='{:.4f}'.format))
+    print()
+    result_printer.print_seed_summary(experiments.aggregate_seed_results(results))
 
-    seed_input = input("Enter a seed value (or press Enter to generate a random seed): ")
-    if seed_input == "":
-        seed = random.randint(1, 10000)
-        print(f"Generated Random Seed: {seed}")
+def run(seed, args, result_printer, collectors):
+    # Defining the agents and the environment (in fleet mode from the world description, with a seeded random placement of the extra agents)
+    if args.agents is not None or args.world is not None:
+        np.random.seed(seed)
+        environment, agents, initial_agent_positions = build_world(world_description(args))
     else:
-        seed = int(seed_input)
-        print(f"Using Provided Seed: {seed}")
+        grid_size = (5, 5)
+        pickup_locations = [(0, 4), (1, 3), (4, 1)]
+        dropoff_locations = [(0, 0), (2, 0), (3, 4)]
+        environment = Environment(grid_size, pickup_locations, dropoff_locations, obstacles=args.obstacles)
+
+        agents = [
+            Agent((0, 2), learning_rate=0.3, discount_factor=0.5),
+            Agent((2, 2), learning_rate=0.3, discount_factor=0.5),
+            Agent((4, 2), learning_rate=0.3, discount_factor=0.5)
+        ]
+
+        initial_agent_positions = [(0, 2), (2, 2), (4, 2)]
+
+        for agent in agents:
+            environment.add_agent(agent)
+
+    result_printer.visualize_environment(environment, f"seed{seed}_environment")
+
+    num_steps = args.steps
+    experiments = build_experiments(args, collectors)
 
     np.random.seed(seed)
     random.seed(seed)
 
-    result_printer = ResultPrinter()
+    # Resuming (or warm-starting) from a saved checkpoint
+    if args.resume is not None:
+        load_checkpoint(args.resume, agents, environment)
+    elif args.warm_start is not None:
+        load_checkpoint(args.warm_start, agents, environment, restore_state=False)
+    if args.shared_q_table:
+        share_q_table(agents, agents[0].q_table)  # A checkpoint of a shared table holds one identical copy per agent.
+    # Seeding the Q-tables with the exact single-agent solution of the initial layout
+    if args.plan_init:
+        for agent in agents:
+            initialize_q_table(agent, environment)
+
+    # Reporting early stopping and checkpointing the agents after an experiment
+    def checkpoint(experiment):
+        for collector in collectors:
+            if isinstance(collector, ConvergenceMonitor) and collector.converged_step is not None:
+                print(f"Experiment {experiment} converged at step {collector.converged_step}")
+            if isinstance(collector, FleetMetrics):
+                result_printer.print_fleet_metrics(collector)
+        if args.save_checkpoint is not None:
+            save_checkpoint(args.save_checkpoint, agents, environment, {'seed': seed, 'experiment': experiment})
 
     # Run Experiment 1a
-    print("Experiment 1a:")
-    total_rewards_1a, total_distances_1a, total_successes_1a = experiments.run_experiment1a(environment, agents, num_steps, initial_agent_positions)
-    result_printer.print_results(agents, total_rewards_1a, total_distances_1a, total_successes_1a, num_steps)
-    # Visualize position frquencies for Experiment 1a
-    result_printer.visualize_position_freq(environment)
+    if '1a' in args.experiments:
+        print("Experiment 1a:")
+        total_rewards_1a, total_distances_1a, total_successes_1a = experiments.run_experiment1a(environment, agents, num_steps, initial_agent_positions)
+        result_printer.print_results(agents, total_rewards_1a, total_distances_1a, total_successes_1a, experiments.steps_run, environment)
+        # Visualize position frquencies for Experiment 1a
+        result_printer.visualize_position_freq(environment, f"seed{seed}_1a")
+        checkpoint('1a')
 
     # Run Experiment 1b
-    print("Experiment 1b:")
-    total_rewards_1b, total_distances_1b, total_successes_1b = experiments.run_experiment1b(environment, agents, num_steps, initial_agent_positions)
-    result_printer.print_results(agents, total_rewards_1b, total_distances_1b, total_successes_1b, num_steps)
-    # Visualize position frquencies for Experiment 1b
-    result_printer.visualize_position_freq(environment)
+    if '1b' in args.experiments:
+        print("Experiment 1b:")
+        total_rewards_1b, total_distances_1b, total_successes_1b = experiments.run_experiment1b(environment, agents, num_steps, initial_agent_positions)
+        result_printer.print_results(agents, total_rewards_1b, total_distances_1b, total_successes_1b, experiments.steps_run, environment)
+        # Visualize position frquencies for Experiment 1b
+        result_printer.visualize_position_freq(environment, f"seed{seed}_1b")
+        checkpoint('1b')
 
     # Run Experiment 1c
-    print("Experiment 1c:")
-    total_rewards_1c, total_distances_1c, total_successes_1c = experiments.run_experiment1c(environment, agents, num_steps, initial_agent_positions)
-    result_printer.print_results(agents, total_rewards_1c, total_distances_1c, total_successes_1c, num_steps)
-    # Visualize position frquencies for Experiment 1c
-    result_printer.visualize_position_freq(environment)
+    if '1c' in args.experiments:
+        print("Experiment 1c:")
+        total_rewards_1c, total_distances_1c, total_successes_1c = experiments.run_experiment1c(environment, agents, num_steps, initial_agent_positions)
+        result_printer.print_results(agents, total_rewards_1c, total_distances_1c, total_successes_1c, experiments.steps_run, environment)
+        # Visualize position frquencies for Experiment 1c
+        result_printer.visualize_position_freq(environment, f"seed{seed}_1c")
+        checkpoint('1c')
 
     # Run Experiment 2
-    print("Experiment 2:")
-    total_rewards_2, total_distances_2, total_successes_2 = experiments.run_experiment2(environment, agents, num_steps, initial_agent_positions)
-    result_printer.print_results_experiment2(agents, total_rewards_2, total_distances_2, total_successes_2, num_steps)
-    # Visualize position frquencies for Experiment 2
-    result_printer.visualize_position_freq(environment)
+    if '2' in args.experiments:
+        print("Experiment 2:")
+        total_rewards_2, total_distances_2, total_successes_2 = experiments.run_experiment2(environment, agents, num_steps, initial_agent_positions)
+        result_printer.print_results_experiment2(agents, total_rewards_2, total_distances_2, total_successes_2, experiments.steps_run, environment)
+        # Visualize position frquencies for Experiment 2
+        result_printer.visualize_position_freq(environment, f"seed{seed}_2")
+        checkpoint('2')
 
     # Run Experiment 3 with different learning rates
-    learning_rates = [0.15, 0.45]
-    for learning_rate in learning_rates:
-        print(f"Experiment 3 (Learning Rate: {learning_rate}):")
-        total_rewards_3, total_distances_3, total_successes_3 = experiments.run_experiment3(environment, agents, num_steps, initial_agent_positions, learning_rate)
-        result_printer.print_results_experiment3(agents, total_rewards_3, total_distances_3, total_successes_3, num_steps, learning_rate)
-        # Visualize position frquencies for Experiment 3
-        result_printer.visualize_position_freq(environment)
+    if '3' in args.experiments:
+        for learning_rate in args.learning_rates:
+            print(f"Experiment 3 (Learning Rate: {learning_rate}):")
+            total_rewards_3, total_distances_3, total_successes_3 = experiments.run_experiment3(environment, agents, num_steps, initial_agent_positions, learning_rate)
+            result_printer.print_results_experiment3(agents, total_rewards_3, total_distances_3, total_successes_3, experiments.steps_run, learning_rate, environment)
+            # Visualize position frquencies for Experiment 3
+            result_printer.visualize_position_freq(environment, f"seed{seed}_3_lr{learning_rate}")
+            checkpoint(f"3 (lr={learning_rate})")
 
     # Run Experiment 4
-    print("Experiment 4:")
-    (
-        total_rewards_before_4, total_distances_before_4, total_successes_before_4, total_steps_before_4,
-        total_rewards_after_4, total_distances_after_4, total_successes_after_4, total_steps_after_4,
-    ) = experiments.run_experiment4(environment, agents, num_steps, initial_agent_positions)
-    result_printer.print_results_experiment4(
-        agents, total_rewards_before_4, total_distances_before_4, total_successes_before_4, total_steps_before_4,
-        total_rewards_after_4, total_distances_after_4, total_successes_after_4, total_steps_after_4,
-    )
-
-    # Visualize position frquencies for Experiment 4
-    result_printer.visualize_position_freq(environment)
+    if '4' in args.experiments:
+        print("Experiment 4:")
+        (
+            total_rewards_before_4, total_distances_before_4, total_successes_before_4, total_steps_before_4,
+            total_rewards_after_4, total_distances_after_4, total_successes_after_4, total_steps_after_4,
+        ) = experiments.run_experiment4(environment, agents, num_steps, initial_agent_positions)
+        result_printer.print_results_experiment4(
+            agents, total_rewards_before_4, total_distances_before_4, total_successes_before_4, total_steps_before_4,
+            total_rewards_after_4, total_distances_after_4, total_successes_after_4, total_steps_after_4, environment,
+        )
+
+        # Visualize position frquencies for Experiment 4
+        result_printer.visualize_position_freq(environment, f"seed{seed}_4")
+        checkpoint('4')
+
+def main():
+    args = parse_args()
+
+    if args.seeds is None:
+        seeds = [random.randint(1, 10000)]
+        print(f"Generated Random Seed: {seeds[0]}")
+    else:
+        seeds = args.seeds
+        print(f"Using Provided Seeds: {', '.join(str(seed) for seed in seeds)}")
+
+    # In headless mode figures never open a window: they are rendered with Agg to files by a background process pool.
+    fleet = args.agents is not None or args.world is not None
+    if args.headless:
+        matplotlib.use('Agg')
+        result_printer = ResultPrinter(output_dir=args.output_dir, max_workers=args.render_workers, fleet=fleet)
+    else:
+        result_printer = ResultPrinter(fleet=fleet)
+
+    # Optional per-step trajectory log (one run number per experiment, in the order they are run)
+    collectors = []
+    if args.trajectory is not None:
+        collectors.append(TrajectoryRecorder(args.trajectory))
+    # Optional early stopping once the Q-values stop changing (never during the random warmup)
+    if args.tolerance is not None:
+        collectors.append(ConvergenceMonitor(args.tolerance, args.convergence_window, args.convergence_criterion, min_steps=args.warmup_steps))
+    # Optional windowed learning-curve statistics, exported once at the end
+    metrics = None
+    if args.metrics is not None:
+        metrics = MetricsCollector()
+        collectors.append(metrics)
+    # Fleet-level metrics (throughput, blocked moves, fairness) after every experiment in fleet mode
+    if fleet:
+        collectors.append(FleetMetrics())
+
+    # Several seeds run in parallel, one process each, unless a feature needs the seeds to share this process (collectors writing
+    # one log, checkpoints, or Q-tables loaded, shared or planned here).
+    per_run_features = [args.trajectory, args.metrics, args.tolerance, args.save_checkpoint, args.resume, args.warm_start]
+    parallel = len(seeds) > 1 and all(feature is None for feature in per_run_features) and not args.shared_q_table and not args.plan_init
+
+    try:
+        if parallel:
+            run_parallel_seeds(seeds, args, result_printer)
+        else:
+            for seed in seeds:
+                print(f"Seed: {seed}")
+                run(seed, args, result_printer, collectors)
+        if metrics is not None:
+            metrics.export(args.metrics)
+    finally:
+        result_printer.close()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+from Agent import Agent
+from BatchEnvironment import BatchEnvironment
+from Environment import ACTIONS, Environment
+
+PICKUP_LOCATIONS = [(0, 4), (1, 3), (4, 1)]
+DROPOFF_LOCATIONS = [(0, 0), (2, 0), (3, 4)]
+INITIAL_AGENT_POSITIONS = [(0, 2), (2, 2), (4, 2)]
+NUM_WORLDS = 4
+NUM_STEPS = 3000
+
+WORLDS = {
+    'default': {},
+    'obstacles-and-site-capacities': dict(obstacles=[(1, 1), (3, 2)], pickup_capacity={(0, 4): 3, (1, 3): 2, (4, 1): 4}, dropoff_capacity={(0, 0): 2, (2, 0): 1, (3, 4): 3}),
+}
+
+def build_environments(world):
+    environments = []
+    for _ in range(NUM_WORLDS):
+        environment = Environment((5, 5), PICKUP_LOCATIONS, DROPOFF_LOCATIONS, **world)
+        for position in INITIAL_AGENT_POSITIONS:
+            environment.add_agent(Agent(position, learning_rate=0.3, discount_factor=0.5))
+        environment.reset_environment(INITIAL_AGENT_POSITIONS)
+        environments.append(environment)
+    return environments
+
+# Random available actions, favouring pickup and dropoff whenever they are available so the worlds reach terminal states.
+def random_actions(environments, rng):
+    actions = np.zeros((NUM_WORLDS, len(INITIAL_AGENT_POSITIONS)), dtype=int)
+    for n, environment in enumerate(environments):
+        for i, agent in enumerate(environment.agents):
+            available = environment.get_available_actions(agent)
+            action = available[-1] if len(available) > 4 and rng.random() < 0.7 else available[rng.integers(len(available))]
+            actions[n, i] = ACTIONS.index(action)
+    return actions
+
+# Stepping a batch and one Environment per world with the same actions and checking they never diverge, including across terminal resets.
+@pytest.mark.parametrize('synchronous', [False, True], ids=['turn-based', 'synchronous'])
+@pytest.mark.parametrize('world', WORLDS.values(), ids=WORLDS.keys())
+def test_batch_matches_environment(world, synchronous):
+    environments = build_environments(world)
+    batch = BatchEnvironment.from_environment(environments[0], NUM_WORLDS, INITIAL_AGENT_POSITIONS)
+    rng = np.random.default_rng(0)
+    terminal_states = 0
+    for step in range(NUM_STEPS):
+        mask = batch.get_available_actions_mask()
+        for n, environment in enumerate(environments):
+            for i, agent in enumerate(environment.agents):
+                assert [ACTIONS[k] for k in np.flatnonzero(mask[n, i])] == list(environment.get_available_actions(agent))
+        actions = random_actions(environments, rng)
+        if synchronous:
+            rewards = batch.step_synchronous(actions)
+            expected = [environment.step_synchronous([ACTIONS[k] for k in actions[n]]) for n, environment in enumerate(environments)]
+        else:
+            rewards = batch.step(actions)
+            expected = [[environment.execute_action(agent, ACTIONS[actions[n, i]]) for i, agent in enumerate(environment.agents)]
+                        for n, environment in enumerate(environments)]
+        np.testing.assert_array_equal(rewards, expected)
+        for n, environment in enumerate(environments):
+            assert [tuple(position) for position in batch.positions[n]] == [agent.position for agent in environment.agents]
+            assert batch.carrying[n].tolist() == [agent.carrying_block for agent in environment.agents]
+            np.testing.assert_array_equal(batch.grid[n], environment.grid)
+
+        terminal = batch.reset_terminal_worlds()
+        for n, environment in enumerate(environments):
+            assert environment.is_terminal_state() == terminal[n]
+            if terminal[n]:
+                environment.reset(INITIAL_AGENT_POSITIONS)
+                terminal_states += 1
+    assert terminal_states > 0
@@ -0,0 +1,51 @@
+import numpy as np
+from Experiments import DEFAULT_WORLD, Experiments, build_world
+from Checkpoint import save_checkpoint, load_checkpoint
+
+# Training a world for a few thousand steps so that the agents have non-trivial Q-tables to checkpoint.
+def trained_world(seed=1, num_steps=3000):
+    np.random.seed(seed)
+    environment, agents, initial_agent_positions = build_world(DEFAULT_WORLD)
+    Experiments().run_experiment1a(environment, agents, num_steps, initial_agent_positions)
+    return environment, agents, initial_agent_positions
+
+# Loading a checkpoint into memory (not memory-mapped) and returning the Q-values of every agent.
+def saved_q_values(path):
+    environment, agents, _ = build_world(DEFAULT_WORLD)
+    load_checkpoint(path, agents, environment, mmap_mode=None)
+    return [np.asarray(agent.q_table.values) for agent in agents]
+
+# Q-values of the agents up to the last visited state, as stored in a checkpoint.
+def live_q_values(agents):
+    values = []
+    for agent in agents:
+        visited = agent.q_table.visited
+        size = int(np.flatnonzero(visited)[-1]) + 1 if visited.any() else 0
+        values.append(np.array(agent.q_table.values[:size]))
+    return values
+
+def test_save_and_load_round_trip(tmp_path):
+    environment, agents, _ = trained_world()
+    save_checkpoint(str(tmp_path), agents, environment)
+    for saved, live in zip(saved_q_values(str(tmp_path)), live_q_values(agents)):
+        np.testing.assert_array_equal(saved, live)
+
+# Resuming from a checkpoint maps its Q-values copy-on-write; saving back into the same directory must not zero them.
+def test_resume_then_save_into_same_directory(tmp_path):
+    environment, agents, _ = trained_world()
+    save_checkpoint(str(tmp_path), agents, environment)
+    expected = live_q_values(agents)
+    assert any(np.abs(values).sum() > 0 for values in expected)
+
+    environment, agents, initial_agent_positions = build_world(DEFAULT_WORLD)
+    load_checkpoint(str(tmp_path), agents, environment)
+    save_checkpoint(str(tmp_path), agents, environment)
+    for saved, values in zip(saved_q_values(str(tmp_path)), expected):
+        np.testing.assert_array_equal(saved, values)
+
+    # Training on after the resume and saving again keeps the updated values as well.
+    Experiments().run_experiment1c(environment, agents, 1000, initial_agent_positions)
+    expected = live_q_values(agents)
+    save_checkpoint(str(tmp_path), agents, environment)
+    for saved, values in zip(saved_q_values(str(tmp_path)), expected):
+        np.testing.assert_array_equal(saved, values)
@@ -0,0 +1,40 @@
+import random
+import numpy as np
+import pytest
+from Experiments import DEFAULT_WORLD, Experiments, build_world
+from Engine import change_layout
+
+def trained_world(seed=1, num_steps=2000):
+    np.random.seed(seed)
+    random.seed(seed)
+    environment, agents, initial_agent_positions = build_world(DEFAULT_WORLD)
+    Experiments().run_experiment1a(environment, agents, num_steps, initial_agent_positions)
+    return environment, agents
+
+@pytest.mark.parametrize('evict', [True, False])
+@pytest.mark.parametrize('change', [
+    {'pickup_locations': [(4, 2)]},  # Too few blocks for the dropoff locations.
+    {'pickup_locations': [(4, 2), (3, 3), (2, 4)], 'obstacles': [(3, 3)]},  # A new site on an obstacle.
+], ids=['too-little-stock', 'site-on-obstacle'])
+def test_rejected_change_keeps_layouts_and_q_tables(change, evict):
+    environment, agents = trained_world()
+    layouts = dict(environment.layouts)
+    layout_id = environment.layout_id
+    q_values = [agent.q_table.values.copy() for agent in agents]
+    visited = [agent.q_table.visited.copy() for agent in agents]
+    with pytest.raises(ValueError):
+        change_layout(environment, carry_over=True, evict=evict, **change)
+    assert environment.layouts == layouts
+    assert environment.layout_id == layout_id
+    for agent, values, seen in zip(agents, q_values, visited):
+        np.testing.assert_array_equal(agent.q_table.values, values)
+        np.testing.assert_array_equal(agent.q_table.visited, seen)
+
+def test_change_with_eviction_carries_the_block_over():
+    environment, agents = trained_world()
+    size = environment.states_per_layout
+    q_values = [agent.q_table.values[:size].copy() for agent in agents]
+    change_layout(environment, pickup_locations=[(4, 2), (3, 3), (2, 4)], carry_over=True, evict=True)
+    assert environment.layout_id == 0 and len(environment.layouts) == 1  # The retired id is reused by the new layout.
+    for agent, values in zip(agents, q_values):
+        np.testing.assert_array_equal(agent.q_table.values[:size], values)
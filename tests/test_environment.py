@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+from Agent import Agent
+from Environment import Environment
+
+def build_environment(obstacles=()):
+    environment = Environment((5, 5), [(0, 4), (1, 3), (4, 1)], [(0, 0), (2, 0), (3, 4)], obstacles=obstacles)
+    for position in [(0, 2), (2, 2), (4, 2)]:
+        environment.add_agent(Agent(position, learning_rate=0.3, discount_factor=0.5))
+    return environment
+
+# Everything a layout change touches, to check that a rejected change leaves the environment as it was.
+def layout_state(environment):
+    return (list(environment.pickup_locations), list(environment.dropoff_locations), list(environment.obstacles), dict(environment.layouts),
+            environment.layout_id, environment.walls.copy(), environment.next_cell.copy(), environment.stock.copy(), environment.grid.copy())
+
+def assert_same_state(state, expected):
+    for value, expected_value in zip(state, expected):
+        if isinstance(value, np.ndarray):
+            np.testing.assert_array_equal(value, expected_value)
+        else:
+            assert value == expected_value
+
+def test_rejects_too_little_stock():
+    with pytest.raises(ValueError):
+        Environment((5, 5), [(0, 4)], [(0, 0), (2, 0)], pickup_capacity=5, dropoff_capacity=5)
+    with pytest.raises(ValueError):
+        Environment((5, 5), [(0, 4), (1, 3)], [(0, 0)], pickup_capacity={(0, 4): 1, (1, 3): 1}, dropoff_capacity=5)
+
+def test_rejects_site_on_obstacle():
+    with pytest.raises(ValueError):
+        build_environment(obstacles=[(1, 3)])
+
+@pytest.mark.parametrize('change', [
+    {'obstacles': [(1, 1), (1, 3)]},  # A pickup location becomes an obstacle.
+    {'obstacles': [(2, 2)]},  # An agent stands on the new obstacle.
+    {'pickup_locations': [(4, 2)]},  # Too few blocks for the dropoff locations.
+    {'pickup_locations': [(3, 3), (4, 2), (2, 4)], 'obstacles': [(3, 3)]},
+], ids=['site-on-obstacle', 'agent-on-obstacle', 'too-little-stock', 'new-site-on-obstacle'])
+def test_failed_layout_change_leaves_environment_unchanged(change):
+    environment = build_environment(obstacles=[(1, 1)])
+    expected = layout_state(environment)
+    with pytest.raises(ValueError):
+        environment.change_layout(**change)
+    assert_same_state(layout_state(environment), expected)
+
+def test_layout_change_applies_obstacles_and_sites():
+    environment = build_environment()
+    environment.change_layout(pickup_locations=[(4, 2), (3, 3), (2, 4)], obstacles=[(1, 1)])
+    assert environment.layout_id == 1
+    assert environment.walls[1, 1] and environment.pickup_cells == {(4, 2), (3, 3), (2, 4)}
+    assert environment.grid[3, 3] == 5 and environment.grid[0, 4] == 0
+
+def test_per_site_capacities_follow_relocated_sites():
+    environment = Environment((5, 5), [(0, 4), (1, 3), (4, 1)], [(0, 0), (2, 0), (3, 4)],
+                              pickup_capacity={(0, 4): 10, (1, 3): 9, (4, 1): 8}, dropoff_capacity=8)
+    environment.change_layout(pickup_locations=[(4, 2), (3, 3), (2, 4)])
+    assert environment.pickup_capacity == {(4, 2): 10, (3, 3): 9, (2, 4): 8}
+    assert environment.grid[4, 2] == 10 and environment.grid[3, 3] == 9 and environment.grid[2, 4] == 8
+
+def test_per_site_capacities_need_one_new_location_per_site():
+    environment = Environment((5, 5), [(0, 4), (1, 3), (4, 1)], [(0, 0)], pickup_capacity={(0, 4): 10})
+    with pytest.raises(ValueError):
+        environment.change_layout(pickup_locations=[(4, 2), (3, 3)])
+    assert environment.pickup_locations == [(0, 4), (1, 3), (4, 1)]
@@ -0,0 +1,15 @@
+import pytest
+from Experiments import DEFAULT_SPECS, DEFAULT_WORLD, check_world
+
+def test_check_world_accepts_the_default_world():
+    check_world(DEFAULT_WORLD, DEFAULT_SPECS)
+
+# Experiment 4 moves the pickup locations; a world it cannot move them in is rejected before any training.
+@pytest.mark.parametrize('world', [
+    dict(DEFAULT_WORLD, obstacles=[(3, 3)]),
+    dict(DEFAULT_WORLD, pickup_locations=[(0, 4), (1, 3)], pickup_capacity={(0, 4): 10, (1, 3): 10}),
+], ids=['obstacle-on-target', 'fewer-sites-than-targets'])
+def test_check_world_rejects_experiment4_targets(world):
+    check_world(world, [{'experiment': '1a'}])
+    with pytest.raises(ValueError):
+        check_world(world, DEFAULT_SPECS)
@@ -0,0 +1,61 @@
+import random
+import numpy as np
+import pytest
+from Experiments import Experiments, build_world
+from Engine import Collector
+from Metrics import FleetMetrics
+from Fleet import spawn_positions
+from Benchmark import fleet_world
+
+def obstacle_fleet_world(num_agents):
+    world = fleet_world((12, 12), num_agents)
+    world['obstacles'] = [(5, y) for y in range(2, 10)]
+    return world
+
+class NoStacking(Collector):
+    # Checking after every step that no two agents share a cell and no agent stands on an obstacle.
+    def __init__(self, environment):
+        self.environment = environment
+        self.steps = 0
+
+    def end_step(self, step):
+        positions = [agent.position for agent in self.environment.agents]
+        assert len(set(positions)) == len(positions)
+        assert not any(self.environment.walls[position] for position in positions)
+        assert sum(self.environment.occupancy) == len(positions)
+        self.steps += 1
+        return False
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_spawned_agents_avoid_sites_obstacles_and_each_other(seed):
+    np.random.seed(seed)
+    environment, agents, initial_agent_positions = build_world(obstacle_fleet_world(60))
+    blocked = environment.pickup_cells | environment.dropoff_cells | set(environment.obstacles)
+    assert len(set(initial_agent_positions)) == len(agents) == 60
+    assert not blocked & set(initial_agent_positions)
+    more = spawn_positions(environment, 20)
+    assert not (blocked | set(initial_agent_positions)) & set(more)
+    assert len(set(more)) == 20
+
+def test_spawn_positions_rejects_an_overfull_grid():
+    np.random.seed(0)
+    environment, _, _ = build_world(obstacle_fleet_world(0))
+    free_cells = environment.num_cells - len(environment.obstacles) - len(environment.pickup_cells | environment.dropoff_cells)
+    assert len(spawn_positions(environment, free_cells)) == free_cells
+    with pytest.raises(ValueError):
+        spawn_positions(environment, free_cells + 1)
+
+@pytest.mark.parametrize('synchronous', [False, True], ids=['in-turn', 'synchronous'])
+def test_fleet_run_never_stacks_agents(synchronous):
+    np.random.seed(0)
+    random.seed(0)
+    environment, agents, initial_agent_positions = build_world(obstacle_fleet_world(40))
+    check = NoStacking(environment)
+    metrics = FleetMetrics()
+    totals = Experiments([check, metrics], synchronous=synchronous).run_experiment1c(environment, agents, 1500, initial_agent_positions)
+    assert check.steps == 1500
+    summary = metrics.summary()
+    assert summary['agents'] == 40 and summary['steps'] == 1500
+    assert summary['total_reward'] == pytest.approx(sum(totals[0]))
+    assert 0.0 < summary['blocked_rate'] < 1.0
+    assert 0.0 < summary['fairness'] <= 1.0
@@ -0,0 +1,41 @@
+import random
+import numpy as np
+import pytest
+from Experiments import DEFAULT_WORLD, Experiments, build_world
+
+OBSTACLE_WORLD = dict(DEFAULT_WORLD, obstacles=[(1, 1), (1, 2), (3, 1), (3, 2), (2, 4)],
+                      pickup_capacity={(0, 4): 3, (4, 1): 8}, dropoff_capacity={(0, 0): 2, (2, 0): 7})
+
+# Running Experiment 1a and then 1c and 3 on the same agents with the given backend, returning everything the two backends must agree on.
+def run(backend, seed, world, num_steps=2000):
+    np.random.seed(seed)
+    random.seed(seed)
+    environment, agents, initial_agent_positions = build_world(world)
+    experiments = Experiments(backend=backend)
+    totals = [
+        experiments.run_experiment1a(environment, agents, num_steps, initial_agent_positions),
+        experiments.run_experiment1c(environment, agents, num_steps, initial_agent_positions),
+        experiments.run_experiment3(environment, agents, num_steps, initial_agent_positions, 0.15),
+    ]
+    return {
+        'totals': totals,
+        'q_tables': [agent.q_table.to_array() for agent in agents],
+        'position_frequencies': [agent.position_frequency.copy() for agent in agents],
+        'positions': [agent.position for agent in agents],
+        'grid': environment.grid.copy(),
+        'dropoff_counts': dict(environment.dropoff_counts),
+    }
+
+@pytest.mark.parametrize('seed, world', [(1, DEFAULT_WORLD), (2, DEFAULT_WORLD), (3, DEFAULT_WORLD), (1, OBSTACLE_WORLD)],
+                         ids=['seed1', 'seed2', 'seed3', 'obstacles'])
+def test_kernel_matches_engine(seed, world):
+    engine = run('python', seed, world)
+    kernel = run('kernel', seed, world)
+    assert kernel['totals'] == engine['totals']
+    for kernel_values, engine_values in zip(kernel['q_tables'], engine['q_tables']):
+        np.testing.assert_array_equal(kernel_values, engine_values)
+    for kernel_frequency, engine_frequency in zip(kernel['position_frequencies'], engine['position_frequencies']):
+        np.testing.assert_array_equal(kernel_frequency, engine_frequency)
+    assert kernel['positions'] == engine['positions']
+    np.testing.assert_array_equal(kernel['grid'], engine['grid'])
+    assert kernel['dropoff_counts'] == engine['dropoff_counts']
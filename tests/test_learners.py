@@ -0,0 +1,62 @@
+import random
+import numpy as np
+import pytest
+from Experiments import DEFAULT_WORLD, build_world
+from Engine import Collector, ExperimentEngine, PolicySchedule, TotalsCollector
+from Learners import QLearner, SarsaLearner, NStepQLearner, SarsaLambdaLearner, WatkinsQLambdaLearner
+
+# Running one engine run of 3000 steps with the given learner from a fixed seed; returns the totals and the agents' Q-tables.
+def run(learner, seed=5, num_steps=3000, policy='exploit'):
+    np.random.seed(seed)
+    random.seed(seed)
+    environment, agents, initial_agent_positions = build_world(DEFAULT_WORLD)
+    totals = TotalsCollector()
+    ExperimentEngine(learner, PolicySchedule(policy, 500), collectors=[totals]).run(environment, agents, num_steps, initial_agent_positions)
+    return totals.results(), [agent.q_table.to_array() for agent in agents], [agent.q_table.states for agent in agents]
+
+def assert_same_runs(run, expected_run):
+    totals, q_tables, states = run
+    expected_totals, expected_q_tables, expected_states = expected_run
+    assert totals == expected_totals
+    assert states == expected_states
+    for q_values, expected_q_values in zip(q_tables, expected_q_tables):
+        np.testing.assert_allclose(q_values, expected_q_values, rtol=1e-12, atol=1e-12)
+
+def test_n_step_one_is_one_step_q_learning():
+    assert_same_runs(run(NStepQLearner(1, 0.3)), run(QLearner(0.3)))
+
+def test_sarsa_lambda_zero_is_one_step_sarsa():
+    assert_same_runs(run(SarsaLambdaLearner(0.0)), run(SarsaLearner()))
+
+# Watkins's Q(lambda) chooses every action one step ahead, so its runs draw differently from QLearner's. Fed the same transitions,
+# both rules must leave the same Q-values when lambda is 0.
+def test_watkins_lambda_zero_is_one_step_q_learning():
+    np.random.seed(5)
+    random.seed(5)
+    environment, agents, initial_agent_positions = build_world(DEFAULT_WORLD)
+    transitions = []
+    class Recorder(Collector):
+        def collect(self, step, i, agent, state, action, reward, next_state, distance, delta):
+            transitions.append((i, state, action, reward, next_state))
+    ExperimentEngine(QLearner(0.3), PolicySchedule('exploit', 500), collectors=[Recorder()]).run(environment, agents, 2000, initial_agent_positions)
+
+    one_step = build_world(DEFAULT_WORLD)[1]
+    watkins_agents = build_world(DEFAULT_WORLD)[1]
+    learner = WatkinsQLambdaLearner(0.0, 0.3)
+    learner.reset(environment, watkins_agents)
+    by_agent = [[transition[1:] for transition in transitions if transition[0] == i] for i in range(len(agents))]
+    for agent, watkins_agent, traces, agent_transitions in zip(one_step, watkins_agents, learner.traces, by_agent):
+        for (state, action, reward, next_state), following in zip(agent_transitions, agent_transitions[1:]):
+            agent.update_q_table(state, action, reward, next_state, 0.3)
+            learner.learn(watkins_agent, traces, state, action, reward, next_state, following[1])
+        np.testing.assert_allclose(watkins_agent.q_table.to_array(), agent.q_table.to_array(), rtol=1e-12, atol=1e-12)
+
+# The last n - 1 transitions of a run are updated with the shorter return available instead of being dropped.
+@pytest.mark.parametrize('n', [2, 3, 5])
+def test_n_step_windows_are_flushed_at_the_end_of_a_run(n):
+    learner = NStepQLearner(n, 0.3)
+    np.random.seed(5)
+    random.seed(5)
+    environment, agents, initial_agent_positions = build_world(DEFAULT_WORLD)
+    ExperimentEngine(learner, PolicySchedule('exploit', 500)).run(environment, agents, 1000, initial_agent_positions)
+    assert all(len(pending) == 0 for pending in learner.pending)
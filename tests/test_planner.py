@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from Agent import Agent
+from Environment import ACTIONS, Environment
+from Planner import value_iteration
+
+def single_agent_environment(grid_size, pickup_locations, dropoff_locations, **options):
+    environment = Environment(grid_size, pickup_locations, dropoff_locations, **options)
+    position = pickup_locations[0]
+    environment.add_agent(Agent(position, learning_rate=0.3, discount_factor=0.5))
+    environment.reset_environment([position])
+    return environment
+
+# A 1x2 corridor with the pickup location on the left and the dropoff location on the right, solved by hand with discount 0.5:
+# the best an agent carrying a block can do is to shuttle on and off the dropoff location, collecting 10 every other step, so
+# V(left, carrying) = 10 / (1 - 0.25) = 40/3 and V(right, carrying) = 0.5 * 40/3 = 20/3. An agent without a block picks one up
+# (V = 0.5 * 40/3 = 20/3), or on the right walks back onto the pickup location for 1 (V = 1 + 0.5 * 20/3 = 13/3).
+def test_value_iteration_reaches_known_optimum():
+    environment = single_agent_environment((1, 2), [(0, 0)], [(0, 1)], pickup_capacity=5, dropoff_capacity=5, mask_invalid_moves=True)
+    values, q_values, policy, iterations = value_iteration(environment, 0.5)
+    np.testing.assert_allclose(values, [20 / 3, 40 / 3, 13 / 3, 20 / 3], atol=1e-6)
+    assert [ACTIONS[action] for action in policy] == ['pickup', 'right', 'left', 'left']
+    assert iterations < 10000
+
+# On a full world, the planned action values must satisfy the Bellman optimality equation with the rewards and next states the
+# Environment itself produces, for every reachable state and available action.
+@pytest.mark.parametrize('mask_invalid_moves', [False, True])
+def test_value_iteration_satisfies_bellman_equation(mask_invalid_moves):
+    discount_factor = 0.9
+    environment = single_agent_environment((5, 5), [(0, 4), (1, 3), (4, 1)], [(0, 0), (2, 0), (3, 4)],
+                                           mask_invalid_moves=mask_invalid_moves, obstacles=[(1, 1), (3, 2)])
+    values, q_values, policy, iterations = value_iteration(environment, discount_factor, tolerance=1e-10)
+    agent = environment.agents[0]
+    for state in range(environment.states_per_layout):
+        position, carrying, _ = environment.decode_state(state)
+        if environment.walls[position]:
+            continue
+        available = []
+        for action in ACTIONS:
+            environment.reset([position])
+            agent.carrying_block = carrying
+            if action not in environment.get_available_actions(agent):
+                continue
+            available.append(ACTIONS.index(action))
+            reward = environment.execute_action(agent, action)
+            expected = reward + discount_factor * values[environment.get_state(agent)]
+            assert q_values[state, ACTIONS.index(action)] == pytest.approx(expected, abs=1e-6)
+        assert values[state] == pytest.approx(q_values[state, available].max(), abs=1e-6)
+        assert policy[state] in available
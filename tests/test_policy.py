@@ -0,0 +1,54 @@
+import numpy as np
+from Environment import ACTIONS, ACTION_INDEX, Environment
+from Agent import Agent
+from BatchEnvironment import BatchEnvironment
+from Policy import MASK_INDICES, select_action, select_actions
+
+PICKUP_LOCATIONS = [(0, 4), (1, 3), (4, 1)]
+DROPOFF_LOCATIONS = [(0, 0), (2, 0), (3, 4)]
+INITIAL_AGENT_POSITIONS = [(0, 2), (2, 2), (4, 2)]
+
+# The vectorized selection must pick, row by row, exactly the action the scalar one picks from the same two uniforms.
+def test_select_actions_matches_select_action():
+    generator = np.random.default_rng(0)
+    num_decisions = 5000
+    q_values = generator.integers(0, 3, (num_decisions, len(ACTIONS))).astype(float)  # Few distinct values, so ties are common.
+    masks = generator.integers(1, 1 << len(ACTIONS), num_decisions)
+    mask_table = np.array([[i in MASK_INDICES[mask] for i in range(len(ACTIONS))] for mask in masks])
+    explore = generator.random(num_decisions)
+    pick = generator.random(num_decisions)
+    for epsilon in (0.0, 0.2, 1.0):
+        expected = [select_action(q_values[k], masks[k], epsilon, explore[k], pick[k]) for k in range(num_decisions)]
+        np.testing.assert_array_equal(select_actions(q_values, mask_table, epsilon, explore, pick), expected)
+
+def seeded_agents(seed):
+    agents = [Agent(position, learning_rate=0.3, discount_factor=0.5) for position in INITIAL_AGENT_POSITIONS]
+    for i, agent in enumerate(agents):
+        agent.seed(seed + i)
+    return agents
+
+# A batch of one world chooses the same actions as the agents do in the matching Environment when all agents act on the same snapshot.
+def test_batch_choose_actions_matches_agents():
+    environment = Environment((5, 5), PICKUP_LOCATIONS, DROPOFF_LOCATIONS)
+    agents = seeded_agents(3)
+    for agent in agents:
+        environment.add_agent(agent)
+    environment.reset_environment(INITIAL_AGENT_POSITIONS)
+    batch_agents = seeded_agents(3)
+    batch = BatchEnvironment(1, (5, 5), PICKUP_LOCATIONS, DROPOFF_LOCATIONS, INITIAL_AGENT_POSITIONS)
+    for step in range(3000):
+        policy = 'random' if step < 500 else 'exploit'
+        states = [environment.get_state(agent) for agent in agents]
+        actions = [agent.choose_action(environment, policy) for agent in agents]
+        batch_actions = batch.choose_actions(batch_agents, policy)
+        assert [ACTION_INDEX[action] for action in actions] == batch_actions[0].tolist()
+        rewards = environment.step_synchronous(actions)
+        batch_rewards = batch.step_synchronous(batch_actions)
+        for agent, batch_agent, state, action, reward in zip(agents, batch_agents, states, actions, rewards):
+            next_state = environment.get_state(agent)
+            agent.update_q_table(state, action, reward, next_state, agent.learning_rate)
+            batch_agent.update_q_table(state, action, reward, next_state, batch_agent.learning_rate)
+        np.testing.assert_array_equal(batch_rewards[0], rewards)
+        if environment.is_terminal_state():
+            environment.reset(INITIAL_AGENT_POSITIONS)
+        batch.reset_terminal_worlds()
@@ -0,0 +1,16 @@
+import random
+import numpy as np
+import pytest
+from Experiments import DEFAULT_WORLD, Experiments, build_world
+
+# NStepQLearner indexes a state only once its n-step return is known, so replay used to read Q-table rows that did not exist yet
+# (IndexError in Experiment 4 for these seeds, when the relocated layout's states lie past the end of the table).
+@pytest.mark.parametrize('seed', [4, 6])
+def test_n_step_with_replay(seed):
+    np.random.seed(seed)
+    random.seed(seed)
+    environment, agents, initial_agent_positions = build_world(DEFAULT_WORLD)
+    Experiments(n_step=3, replay_batch=8).run_experiment4(environment, agents, 9000, initial_agent_positions)
+    for agent in agents:
+        assert np.isfinite(agent.q_table.values).all()
+        assert agent.q_table.values.shape[0] > environment.layout_offset
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+from Agent import Agent
+from Environment import Environment, resolve_moves
+
+# Cells are plain integers here; resolve_moves does not need them to be neighbours.
+@pytest.mark.parametrize('current, proposed, expected', [
+    ([0, 1], [1, 0], [0, 1]),  # Swapping cells: both stay.
+    ([0, 1], [1, 1], [0, 1]),  # Moving into a cell that stays occupied fails.
+    ([0, 2], [1, 1], [1, 2]),  # Contested cell: the lowest-numbered agent moves.
+    ([2, 0, 4], [1, 1, 1], [1, 0, 4]),
+    ([0, 1], [1, 2], [1, 2]),  # Following an agent into the cell it vacates.
+    ([0, 1, 2], [1, 2, 0], [1, 2, 0]),  # A cycle of three moves as a whole.
+    ([0, 1, 3], [1, 2, 2], [1, 2, 3]),  # Agent 1 wins cell 2, so agent 0 can follow it.
+    ([3, 1, 0], [2, 2, 1], [2, 1, 0]),  # Agent 1 loses cell 2 and stays, so agent 2 cannot follow it.
+], ids=['swap', 'into-occupied', 'contest', 'contest-of-three', 'follow', 'cycle', 'follow-winner', 'follow-loser'])
+def test_resolve_moves(current, proposed, expected):
+    np.testing.assert_array_equal(resolve_moves(current, proposed), expected)
+
+# One row of agents per world, every world resolved on its own.
+def test_resolve_moves_per_world():
+    current = [[0, 1], [0, 2], [0, 1]]
+    proposed = [[1, 0], [1, 1], [1, 2]]
+    np.testing.assert_array_equal(resolve_moves(current, proposed), [[0, 1], [1, 2], [1, 2]])
+
+def environment_with_agents(positions):
+    environment = Environment((5, 5), [(0, 4), (1, 3), (4, 1)], [(0, 0), (2, 0), (3, 4)])
+    for position in positions:
+        environment.add_agent(Agent(position, learning_rate=0.3, discount_factor=0.5))
+    environment.reset_environment(positions)
+    return environment
+
+@pytest.mark.parametrize('positions, actions, expected', [
+    ([(2, 1), (2, 2)], ['right', 'left'], [(2, 1), (2, 2)]),  # Swap.
+    ([(2, 1), (2, 2)], ['right', 'pickup'], [(2, 1), (2, 2)]),  # Into a cell that stays occupied.
+    ([(2, 3), (2, 1)], ['left', 'right'], [(2, 2), (2, 1)]),  # Contest won by agent 0, whichever side it comes from.
+    ([(2, 1), (2, 3)], ['right', 'left'], [(2, 2), (2, 3)]),
+    ([(2, 1), (2, 2)], ['right', 'right'], [(2, 2), (2, 3)]),  # Following.
+], ids=['swap', 'into-occupied', 'contest-from-right', 'contest-from-left', 'follow'])
+def test_step_synchronous_conflicts(positions, actions, expected):
+    environment = environment_with_agents(positions)
+    environment.step_synchronous(actions)
+    assert [agent.position for agent in environment.agents] == expected
+    assert sum(environment.occupancy) == len(expected)
+    for position in expected:
+        assert environment.occupancy[environment.cell_of(position)] == 1